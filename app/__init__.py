@@ -29,19 +29,20 @@
 import logging
 from flask import Flask
 from flask_cors import CORS
-from .routes import api_bp
-from .routes.home import home_bp
+from .config.logging_config import configure_logging
+from .config.resources import configure_threads, effective_threads
 
 def create_app():
-    # Cấu hình logging
-    logging.basicConfig(
-        level=logging.INFO,  # Cho phép INFO trở lên
-        format='%(asctime)s [%(name)s] %(levelname)s: %(message)s',
-        handlers=[
-            logging.StreamHandler(),  # Ghi ra console
-            logging.FileHandler('app.log')  # Ghi vào tệp app.log
-        ]
-    )
+    # Chia core cho torch/FAISS/BLAS trước khi routes nạp các thư viện này
+    configure_threads()
+
+    # Import trễ: routes khởi tạo index/MongoDB khi import, các CLI không cần
+    from .routes import api_bp, assets_bp, load_built_templates, metrics_bp, init_request_timing
+    from .routes.home import home_bp
+    from .core.metrics import record_thread_budget
+
+    # Cấu hình logging (ghi bất đồng bộ qua hàng đợi, xoay vòng tệp app.log)
+    configure_logging()
     
     app = Flask(__name__)
     
@@ -51,6 +52,9 @@ def create_app():
     # Debug: Confirm secret key is set
     logger = logging.getLogger(__name__)
     logger.info(f"Secret Key Set: {app.secret_key}")
+    threads = effective_threads()
+    logger.info(f"Thread budget: {threads}")
+    record_thread_budget(threads)
     
     # Enable CORS
     CORS(app)
@@ -58,6 +62,13 @@ def create_app():
     # Register blueprints
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(home_bp)
+    app.register_blueprint(metrics_bp)
+    # JS/CSS tách khỏi template, tên có hash, cache vĩnh viễn
+    app.register_blueprint(assets_bp)
+    load_built_templates()
+    
+    # Đo thời gian từng bước (Prometheus + Server-Timing)
+    init_request_timing(app)
     
     return app
 
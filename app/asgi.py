@@ -0,0 +1,31 @@
+"""ASGI serving mode: async LLM routes in front of the Flask app.
+
+Ví dụ:
+    uvicorn app.asgi:create_asgi_app --factory --host 0.0.0.0 --port 5000 --workers 2
+
+/api/query và /api/query_related chạy trên event loop (chờ Gemini không giữ thread);
+mọi route còn lại (đăng nhập, trang HTML, admin, /metrics) vẫn do Flask xử lý qua WSGI.
+"""
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount
+
+from . import create_app
+
+
+def create_asgi_app() -> Starlette:
+    flask_app = create_app()
+    from .routes.api_async import routes
+
+    app = Starlette(
+        routes=[*routes, Mount("/", app=WSGIMiddleware(flask_app))],
+        # Giống flask_cors mặc định (cho phép mọi origin)
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])]
+    )
+    app.state.flask_app = flask_app
+    return app
+
+
+__all__ = ["create_asgi_app"]
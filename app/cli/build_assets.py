@@ -0,0 +1,145 @@
+"""Tách JS/CSS inline trong templates thành file tĩnh có hash nội dung, kèm bản nén sẵn.
+
+Ví dụ:
+    python -m app.cli.build_assets
+    python -m app.cli.build_assets --check   # báo lỗi nếu bản build đã cũ so với templates
+
+Kết quả:
+    app/static/dist/<tên>.<hash>.js|css (+ .gz, + .br nếu có `pip install brotli`)
+    app/templates/dist/<template>.html   template gọn, tham chiếu các file trên
+    app/static/dist/manifest.json        hash template nguồn -> file đã sinh
+
+Khối <script>/<style> chứa cú pháp Jinja được giữ nguyên inline. Khối giống hệt
+nhau giữa các trang dùng chung một file nên trình duyệt chỉ tải một lần.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from typing import Dict, List
+
+from ..config.settings import Config
+from ..core.assets import (
+    DIST_DIR, DIST_TEMPLATE_DIR, MANIFEST_PATH, TEMPLATE_DIR, built_assets, source_hash, source_templates, stale_templates
+)
+
+try:
+    import brotli  # tùy chọn: thêm bản .br
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Quét tuần tự: comment HTML hoặc một khối <script>/<style> (comment bên trong script thuộc về script)
+BLOCK_PATTERN = re.compile(
+    r"<!--(?P<comment>.*?)-->|<(?P<tag>script|style)\b(?P<attrs>[^>]*)>(?P<body>.*?)</(?P=tag)\s*>",
+    re.S | re.I
+)
+JINJA_PATTERN = re.compile(r"\{\{|\{%|\{#")
+SCRIPT_TYPES = ("text/javascript", "application/javascript", "module", "text/css")
+MIN_EXTRACT_BYTES = 512  # khối nhỏ hơn để inline, không đáng một request
+
+
+def write_asset(stem: str, ext: str, body: str, written: Dict[str, str]) -> str:
+    """Write one content-hashed asset (plus precompressed copies) once; return its file name."""
+    data = body.strip().encode("utf-8") + b"\n"
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    if digest in written:
+        return written[digest]
+    name = f"{stem}.{digest}.{ext}"
+    path = os.path.join(DIST_DIR, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    with open(f"{path}.gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(f"{path}.br", "wb") as f:
+            f.write(brotli.compress(data))
+    written[digest] = name
+    return name
+
+
+def asset_tag(tag: str, attrs: str, name: str) -> str:
+    url = "{{ url_for('assets.asset', filename='%s') }}" % name
+    if tag.lower() == "script":
+        return f'<script{attrs} src="{url}"></script>'
+    media = re.search(r"\bmedia\s*=\s*(['\"]).*?\1", attrs)
+    return f'<link rel="stylesheet" href="{url}"{" " + media.group(0) if media else ""}>'
+
+
+def build_template(name: str, written: Dict[str, str]) -> List[str]:
+    """Write ``templates/dist/<name>`` with its inline blocks moved to assets; return the assets it uses."""
+    with open(os.path.join(TEMPLATE_DIR, name), "r", encoding="utf-8") as f:
+        html = f.read()
+    stem = os.path.splitext(name)[0]
+    assets: List[str] = []
+
+    def replace(match: "re.Match") -> str:
+        if match.group("tag") is None:
+            # Bỏ comment HTML, trừ conditional comment của IE
+            return match.group(0) if match.group("comment").lstrip().startswith("[if") else ""
+        tag, attrs, body = match.group("tag"), match.group("attrs"), match.group("body")
+        script_type = re.search(r"\btype\s*=\s*(['\"])(.*?)\1", attrs)
+        if script_type and script_type.group(2).lower() not in SCRIPT_TYPES:
+            return match.group(0)  # vd. template HTML hay JSON nhúng được đọc bằng id
+        if "src=" in attrs.lower() or JINJA_PATTERN.search(body) or len(body.strip().encode("utf-8")) < MIN_EXTRACT_BYTES:
+            return match.group(0)
+        asset = write_asset(stem, "js" if tag.lower() == "script" else "css", body, written)
+        assets.append(asset)
+        return asset_tag(tag, attrs.rstrip(), asset)
+
+    built = BLOCK_PATTERN.sub(replace, html)
+    with open(os.path.join(DIST_TEMPLATE_DIR, name), "w", encoding="utf-8") as f:
+        f.write(built)
+    logger.info(f"{name}: {len(html.encode('utf-8')) // 1024} KB -> {len(built.encode('utf-8')) // 1024} KB, {len(assets)} assets")
+    return assets
+
+
+def build() -> Dict:
+    templates = source_templates()
+    os.makedirs(DIST_DIR, exist_ok=True)
+    os.makedirs(DIST_TEMPLATE_DIR, exist_ok=True)
+    written: Dict[str, str] = {}
+    manifest = {"templates": {}}
+    for name in templates:
+        manifest["templates"][name] = {
+            "source_sha256": source_hash(os.path.join(TEMPLATE_DIR, name)),
+            "assets": build_template(name, written),
+        }
+
+    # Giữ lại file của lần build trước: trang HTML cũ trình duyệt còn giữ (hoặc worker
+    # chưa deploy xong) vẫn tải được asset của nó; các bản cũ hơn thì xóa
+    keep = set(written.values()) | built_assets()
+    for filename in os.listdir(DIST_DIR):
+        base = re.sub(r"\.(gz|br)$", "", filename)
+        if filename != "manifest.json" and base not in keep:
+            os.remove(os.path.join(DIST_DIR, filename))
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract inline JS/CSS into fingerprinted static assets")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if the build is out of date")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+
+    if args.check:
+        stale = stale_templates()
+        print(f"Stale templates: {stale}" if stale else "Assets are up to date")
+        return 1 if stale else 0
+
+    manifest = build()
+    total = len({a for entry in manifest["templates"].values() for a in entry["assets"]})
+    print(f"Built {len(manifest['templates'])} templates, {total} assets -> {DIST_DIR}"
+          f"{'' if brotli else ' (brotli not installed, gzip only)'}; serving: ASSETS_ENABLED={int(Config.ASSETS_ENABLED)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
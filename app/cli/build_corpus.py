@@ -0,0 +1,57 @@
+"""Build FAISS index, metadata và BM25 từ thư mục tài liệu nguồn (PDF/TXT/JSONL).
+
+Ví dụ:
+    python -m app.cli.build_corpus data/pdfs --work-dir build/banan --workers 16
+    python -m app.cli.build_corpus data/pdfs --work-dir build/banan --finalize-only
+
+Chạy lại cùng lệnh sau khi bị ngắt sẽ tiếp tục từ shard cuối cùng đã ghi.
+"""
+import argparse
+import logging
+import sys
+from typing import List
+
+from ..config.settings import Config
+from ..core.pipeline.corpus_builder import CorpusBuilder
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Streaming, resumable corpus build")
+    parser.add_argument("input_dir")
+    parser.add_argument("--work-dir", required=True, help="Directory for shards and checkpoint")
+    parser.add_argument("--doc-type", default="banan")
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL)
+    parser.add_argument("--workers", type=int, default=None, help="Embedding processes (0 = in-process)")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--shard-size", type=int, default=4096)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--index-path", default=Config.INDEX_PATH)
+    parser.add_argument("--metadata-path", default=Config.METADATA_PATH)
+    parser.add_argument("--summarized-path", default=Config.SUMMARIZED_METADATA_PATH)
+    parser.add_argument("--bm25-path", default=Config.BM25_PATH)
+    parser.add_argument("--finalize-only", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+
+    builder = CorpusBuilder(
+        work_dir=args.work_dir,
+        doc_type=args.doc_type,
+        model_name=args.model,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        batch_size=args.batch_size,
+        shard_size=args.shard_size,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap
+    )
+    if not args.finalize_only:
+        builder.embed(args.input_dir)
+    total = builder.finalize(args.index_path, args.metadata_path, args.summarized_path, args.bm25_path)
+    print(f"Built {total} chunks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Build ngân hàng câu hỏi liên quan (FAISS + JSON) từ danh mục bệnh và câu hỏi cũ của người dùng.
+
+Ví dụ:
+    python -m app.cli.build_question_bank
+    python -m app.cli.build_question_bank --recorded logs/requests.jsonl* --questions extra_questions.txt
+
+Nguồn:
+- Danh mục bệnh (CATALOGUE_PATH): sinh câu hỏi theo mẫu cho mỗi bệnh / cây chủ.
+- File ghi request (RECORD_PATH.<pid> của mỗi worker và các bản xoay vòng): câu hỏi thật của người dùng.
+- File text tùy chọn, mỗi dòng một câu hỏi.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+from typing import Dict, Iterator, List
+
+from ..config.settings import Config
+from ..core.repositories.question_bank_repository import QuestionBankRepository, is_agriculture_question
+from ..core.text.vietnamese import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DISEASE_TEMPLATES = [
+    "Triệu chứng của bệnh {name} là gì?",
+    "Nguyên nhân gây ra bệnh {name}?",
+    "Cách điều trị bệnh {name} hiệu quả?",
+    "Làm thế nào để phòng ngừa bệnh {name}?",
+]
+HOST_TEMPLATE = "Bệnh {name} trên cây {host} xử lý như thế nào?"
+
+
+def catalogue_questions(path: str) -> Iterator[Dict]:
+    if not os.path.exists(path):
+        logger.warning(f"Catalogue file not found: {path}")
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for entry in data.get("data", []) if isinstance(data, dict) else data:
+        name = (entry.get("common_name") or "").strip()
+        if not name:
+            continue
+        for template in DISEASE_TEMPLATES:
+            yield {"question": template.format(name=name), "source": "catalogue"}
+        for host in (entry.get("host") or [])[:3]:
+            yield {"question": HOST_TEMPLATE.format(name=name, host=host), "source": "catalogue"}
+
+
+def recorded_questions(paths: List[str]) -> Iterator[Dict]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    question = (json.loads(line).get("question") or "").strip()
+                except json.JSONDecodeError:
+                    continue
+                # Câu hỏi thật của người dùng: chỉ giữ câu đúng chủ đề, độ dài vừa phải
+                if 10 <= len(question) <= 200 and is_agriculture_question(question):
+                    yield {"question": question, "source": "user"}
+
+
+def text_questions(paths: List[str]) -> Iterator[Dict]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield {"question": line.strip(), "source": os.path.basename(path)}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the related-question bank")
+    parser.add_argument("--catalogue", default=Config.CATALOGUE_PATH)
+    parser.add_argument("--recorded", nargs="*", default=None,
+                        help="Recorded request JSONL files (default: RECORD_PATH and its rotations)")
+    parser.add_argument("--questions", nargs="*", default=[], help="Extra text files, one question per line")
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--index-path", default=Config.QUESTION_BANK_INDEX_PATH)
+    parser.add_argument("--path", default=Config.QUESTION_BANK_PATH)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+
+    recorded = args.recorded if args.recorded is not None else sorted(glob.glob(f"{Config.RECORD_PATH}*"))
+    questions: List[Dict] = []
+    seen = set()
+    for item in [*catalogue_questions(args.catalogue), *text_questions(args.questions), *recorded_questions(recorded)]:
+        key = normalize_text(item["question"])
+        if key not in seen:
+            seen.add(key)
+            questions.append(item)
+    if not questions:
+        print("No questions found, nothing to build")
+        return 1
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    vectors = model.encode(
+        [q["question"] for q in questions], batch_size=args.batch_size, convert_to_numpy=True, show_progress_bar=True
+    )
+    QuestionBankRepository.save(questions, vectors, args.index_path, args.path)
+    sources: Dict[str, int] = {}
+    for q in questions:
+        sources[q["source"]] = sources.get(q["source"], 0) + 1
+    print(f"Question bank written: {len(questions)} questions {sources} -> {args.index_path}, {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
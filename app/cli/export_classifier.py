@@ -0,0 +1,118 @@
+"""Xuất mô hình phân loại lá (PyTorch) thành file model + file nhãn mà POST /api/diagnose nạp.
+
+Ví dụ:
+    python -m app.cli.export_classifier build/leaf_model.pt --classes-dir data/plantvillage/train
+    python -m app.cli.export_classifier build/leaf_model.pt --classes build/classes.tsv --input-size 256
+    python -m app.cli.export_classifier build/leaf_model.pt --classes-dir data/train --model-path source/leaf_classifier.pt
+
+Đầu vào là file TorchScript (torch.jit.save) hoặc một nn.Module lưu bằng torch.save.
+Thứ tự lớp phải đúng thứ tự đầu ra của model: --classes-dir đọc các thư mục con theo
+thứ tự sắp xếp như torchvision ImageFolder; --classes đọc mỗi dòng một lớp, dạng
+"tên" hoặc "tên<TAB>catalogue_id" để chỉ rõ mục trong danh mục bệnh.
+
+Kết quả ghi vào CLASSIFIER_MODEL_PATH (.onnx cần `pip install onnxruntime` khi phục vụ,
+.pt là TorchScript) và CLASSIFIER_LABELS_PATH. Cả hai chỉ được thay sau khi LeafClassifier
+nạp thử thành công. source/leaf_classifier.json đi kèm repo liệt kê 38 lớp PlantVillage theo
+thứ tự ImageFolder; xuất model huấn luyện trên tập khác sẽ ghi đè nó.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+from ..config.settings import Config
+from ..core.imaging import IMAGENET_MEAN, IMAGENET_STD
+from ..handlers.leaf_classifier_handler import LeafClassifier
+
+
+def read_classes(classes_path: str = None, classes_dir: str = None) -> List[Dict]:
+    if classes_dir:
+        return [{"name": name} for name in sorted(e.name for e in os.scandir(classes_dir) if e.is_dir())]
+    labels = []
+    with open(classes_path, "r", encoding="utf-8") as f:
+        for line in f:
+            name, _, catalogue_id = line.rstrip("\n").partition("\t")
+            if not name.strip():
+                continue
+            label = {"name": name.strip()}
+            catalogue_id = catalogue_id.strip()
+            if catalogue_id:
+                label["catalogue_id"] = int(catalogue_id) if catalogue_id.isdigit() else catalogue_id
+            labels.append(label)
+    return labels
+
+
+def load_model(path: str):
+    import torch
+    try:
+        return torch.jit.load(path, map_location="cpu").eval()
+    except RuntimeError:
+        # Không phải TorchScript: nn.Module lưu nguyên bằng torch.save
+        model = torch.load(path, map_location="cpu", weights_only=False)
+    if not isinstance(model, torch.nn.Module):
+        raise ValueError(f"{path} holds a {type(model).__name__}, not a model; save the nn.Module or a TorchScript file")
+    return model.eval()
+
+
+def export_model(model, path: str, input_size: int) -> None:
+    import torch
+    dummy = torch.zeros(1, 3, input_size, input_size)
+    if path.endswith(".onnx"):
+        torch.onnx.export(
+            model, dummy, path,
+            input_names=["input"], output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},  # batch động cho MicroBatcher
+            opset_version=17
+        )
+    else:
+        scripted = model if isinstance(model, torch.jit.ScriptModule) else torch.jit.trace(model, dummy)
+        torch.jit.save(scripted, path)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export a leaf classifier and its labels card for /api/diagnose")
+    parser.add_argument("model", help="TorchScript file or torch.save'd nn.Module")
+    classes = parser.add_mutually_exclusive_group(required=True)
+    classes.add_argument("--classes", help="One class per line, optionally 'name<TAB>catalogue_id'")
+    classes.add_argument("--classes-dir", help="ImageFolder training directory (class = sub-directory, sorted)")
+    parser.add_argument("--model-path", default=Config.CLASSIFIER_MODEL_PATH, help=".onnx or TorchScript .pt")
+    parser.add_argument("--labels-path", default=Config.CLASSIFIER_LABELS_PATH)
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--mean", type=float, nargs=3, default=list(IMAGENET_MEAN))
+    parser.add_argument("--std", type=float, nargs=3, default=list(IMAGENET_STD))
+    parser.add_argument("--outputs", choices=("logits", "probabilities"), default="logits")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+
+    card = {
+        "labels": read_classes(args.classes, args.classes_dir),
+        "input_size": args.input_size,
+        "mean": args.mean,
+        "std": args.std,
+        "outputs": args.outputs,
+    }
+    target_dir = os.path.dirname(os.path.abspath(args.model_path))
+    os.makedirs(target_dir, exist_ok=True)
+    # Ghi vào thư mục tạm cạnh đích, nạp thử, rồi mới thay file đang phục vụ
+    with tempfile.TemporaryDirectory(dir=target_dir, prefix=".classifier.") as staging:
+        model_tmp = os.path.join(staging, os.path.basename(args.model_path))
+        labels_tmp = os.path.join(staging, os.path.basename(args.labels_path))
+        try:
+            export_model(load_model(args.model), model_tmp, args.input_size)
+            with open(labels_tmp, "w", encoding="utf-8") as f:
+                json.dump(card, f, ensure_ascii=False, indent=2)
+            LeafClassifier(model_tmp, labels_tmp)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Export failed: {e}")
+            return 1
+        os.replace(model_tmp, args.model_path)
+        os.replace(labels_tmp, args.labels_path)
+    print(f"Exported {len(card['labels'])} classes: {args.model_path}, {args.labels_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Thêm / xóa tài liệu trong index mà không cần build lại toàn bộ.
+
+Ví dụ:
+    python -m app.cli.ingest add bulletins.jsonl
+    python -m app.cli.ingest delete banan_101 banan_102
+    python -m app.cli.ingest compact
+
+Mỗi dòng của file JSONL là một tài liệu: {"id": ..., "text": ..., "summary": ..., "metadata": {...}}
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Dict, Iterator, List
+
+from ..core.repositories.index_repository import IndexRepository
+from ..core.services.ingestion_service import IngestionService
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e})")
+
+
+def run(service: IngestionService, args: argparse.Namespace) -> None:
+    if args.command == "add":
+        batch, added = [], 0
+        for doc in read_jsonl(args.path):
+            batch.append(doc)
+            if len(batch) >= args.batch_size:
+                added += len(service.add_documents(batch))
+                batch = []
+        if batch:
+            added += len(service.add_documents(batch))
+        print(f"Added {added} documents")
+    elif args.command == "delete":
+        deleted = service.delete_documents(args.ids)
+        print(f"Tombstoned {len(deleted)} documents: {', '.join(deleted)}")
+    elif args.command == "compact":
+        print(f"Removed {service.compact(force=not args.if_needed)} documents")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Incremental document ingestion")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add = subparsers.add_parser("add", help="Append documents from a JSONL file")
+    add.add_argument("path")
+    add.add_argument("--batch-size", type=int, default=256)
+
+    delete = subparsers.add_parser("delete", help="Tombstone documents by ID")
+    delete.add_argument("ids", nargs="+")
+
+    compact = subparsers.add_parser("compact", help="Drop tombstoned documents now")
+    compact.add_argument("--if-needed", action="store_true", help="Only compact above the tombstone ratio")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+
+    service = IngestionService(IndexRepository(), persist=False)
+    # Giữ khóa ghi tới khi persist: worker không ghi xen vào giữa các batch
+    with service.index_repo.writing():
+        run(service, args)
+        service.index_repo.persist()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
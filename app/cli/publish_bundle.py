@@ -0,0 +1,55 @@
+"""Đóng gói FAISS index, metadata và BM25 thành một bundle có version rồi chuyển CURRENT sang nó.
+
+Ví dụ:
+    python -m app.cli.build_corpus data/pdfs --work-dir build/banan --index-path build/index.faiss \
+        --metadata-path build/metadata.pkl --summarized-path build/summarized.pkl --bm25-path build/bm25.pkl
+    python -m app.cli.publish_bundle --index-path build/index.faiss --metadata-path build/metadata.pkl \
+        --summarized-path build/summarized.pkl --bm25-path build/bm25.pkl
+    python -m app.cli.publish_bundle --list
+
+Các worker đang chạy tự nạp bundle mới ở lần kiểm tra kế tiếp (INDEX_WATCH_INTERVAL),
+hoặc ngay lập tức qua POST /api/admin/reload hay `kill -USR2 <pid worker>`.
+"""
+import argparse
+import logging
+import sys
+from typing import List
+
+from ..config.settings import Config
+from ..core.repositories.index_bundle import list_bundles, publish_bundle, resolve_bundle
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Publish a versioned index bundle for hot reload")
+    parser.add_argument("--bundle-dir", default=Config.INDEX_BUNDLE_DIR)
+    parser.add_argument("--index-path", default=Config.INDEX_PATH)
+    parser.add_argument("--metadata-path", default=Config.METADATA_PATH)
+    parser.add_argument("--summarized-path", default=Config.SUMMARIZED_METADATA_PATH)
+    parser.add_argument("--bm25-path", default=Config.BM25_PATH)
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL, help="Embedding model the index was built with")
+    parser.add_argument("--version", default=None, help="Bundle name (default: timestamp)")
+    parser.add_argument("--keep", type=int, default=3, help="Published bundles to keep, 0 = all")
+    parser.add_argument("--list", action="store_true", help="List published bundles and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+
+    if args.list:
+        current = resolve_bundle(args.bundle_dir).version
+        for version in list_bundles(args.bundle_dir):
+            print(f"{'*' if version == current else ' '} {version}")
+        return 0
+
+    try:
+        version = publish_bundle(
+            args.bundle_dir, args.index_path, args.metadata_path, args.summarized_path, args.bm25_path,
+            version=args.version, keep=args.keep, embedding_model=args.model
+        )
+    except (OSError, ValueError) as e:
+        print(f"Publishing failed: {e}")
+        return 1
+    print(f"Bundle {version} is now CURRENT in {args.bundle_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
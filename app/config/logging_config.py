@@ -1,11 +1,85 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 
-def configure_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s [%(name)s] %(levelname)s: %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('app.log')
-        ]
-    )
\ No newline at end of file
+# (QueueHandler, QueueListener) đang chạy trong process này
+_listeners = []
+
+
+class ProcessFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler writing to ``<path>.<pid>``.
+
+    Gunicorn workers sharing one rotating file rename it under each other
+    and lose lines; with one file per process each worker rotates its own.
+    The file is opened on the first record, after any fork.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        self.base_path = path
+        super().__init__(self.process_path(), delay=True, **kwargs)
+
+    def process_path(self) -> str:
+        return f"{self.base_path}.{os.getpid()}"
+
+    def reopen(self) -> None:
+        """Switch to this process's file (called in the child after a fork)."""
+        self.acquire()
+        try:
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(self.process_path())
+        finally:
+            self.release()
+
+
+def start_queue_listener(*handlers: logging.Handler) -> logging.handlers.QueueHandler:
+    """Return a QueueHandler whose records are written by ``handlers`` on a background thread."""
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    _listeners.append((queue_handler, listener))
+    return queue_handler
+
+def stop_queue_listeners():
+    while _listeners:
+        _listeners.pop()[1].stop()
+
+def _restart_after_fork():
+    # Thread ghi log không sống sót qua fork (gunicorn --preload): tạo hàng đợi và listener mới cho worker
+    for i, (queue_handler, listener) in enumerate(_listeners):
+        for handler in listener.handlers:
+            if isinstance(handler, ProcessFileHandler):
+                handler.reopen()
+        queue_handler.queue = queue.Queue(-1)
+        restarted = logging.handlers.QueueListener(queue_handler.queue, *listener.handlers, respect_handler_level=True)
+        restarted.start()
+        _listeners[i] = (queue_handler, restarted)
+
+atexit.register(stop_queue_listeners)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+def configure_logging(path: str = 'app.log', max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+    # Ghi log qua hàng đợi: luồng xử lý request không phải chờ I/O tệp
+    formatter = logging.Formatter('%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handlers = [
+        logging.StreamHandler(),
+        ProcessFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(start_queue_listener(*handlers))
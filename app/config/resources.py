@@ -0,0 +1,201 @@
+import logging
+import math
+import os
+import shlex
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+from .settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Biến môi trường được đọc khi thư viện nạp lần đầu (torch/OpenMP và các bản BLAS)
+OPENMP_ENV = ("OMP_NUM_THREADS",)
+BLAS_ENV = ("OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+_budget: Optional["ThreadBudget"] = None
+
+
+@dataclass
+class ThreadBudget:
+    """Threads each library may use in one worker process."""
+    cores: int
+    workers: int
+    per_worker: int
+    torch: int
+    faiss: int
+    blas: int
+    classifier: int
+    shard: int  # FAISS threads trong mỗi process shard
+
+
+def _cgroup_cores() -> Optional[float]:
+    """CPU quota of the container, if one is set (cgroup v2, then v1)."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cores() -> int:
+    """Cores this process may run on: CPU_CORES, else min(affinity, container quota)."""
+    if Config.CPU_CORES > 0:
+        return Config.CPU_CORES
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    quota = _cgroup_cores()
+    if quota is not None:
+        cores = min(cores, max(1, math.ceil(quota)))
+    return max(1, cores)
+
+
+def _workers_flag(args: List[str]) -> Optional[int]:
+    """Value of ``-w``/``--workers`` in a gunicorn or uvicorn argument list (the last one wins, like argparse)."""
+    value = None
+    for i, arg in enumerate(args):
+        if arg in ("-w", "--workers") and i + 1 < len(args):
+            value = args[i + 1]
+        elif arg.startswith("--workers="):
+            value = arg.split("=", 1)[1]
+        elif arg.startswith("-w") and not arg.startswith("--") and len(arg) > 2:
+            value = arg[2:]
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def web_workers() -> int:
+    """
+    Worker processes sharing this machine.
+
+    ``WEB_WORKERS`` wins; otherwise the count the server will use, in its own
+    precedence: for gunicorn ``-w`` on the command line, then
+    ``GUNICORN_CMD_ARGS``, then ``WEB_CONCURRENCY``; for uvicorn (ASGI mode)
+    ``--workers``, then ``WEB_CONCURRENCY``; else one. Workers set only in a
+    gunicorn config file are not visible here: that case is logged and one
+    worker is assumed.
+    """
+    if Config.WEB_WORKERS > 0:
+        return Config.WEB_WORKERS
+    argv0 = sys.argv[0] if sys.argv else ""
+    gunicorn = "gunicorn" in sys.modules or "gunicorn" in os.path.basename(argv0)
+    # Worker uvicorn được spawn với sys.argv của process cha; "python -m uvicorn" có argv0 .../uvicorn/__main__.py
+    uvicorn = not gunicorn and ("uvicorn" in sys.modules or "uvicorn" in argv0)
+    if gunicorn or uvicorn:
+        workers = _workers_flag(sys.argv[1:])
+        if workers is None and gunicorn:
+            workers = _workers_flag(shlex.split(os.environ.get("GUNICORN_CMD_ARGS", "")))
+        if workers is not None:
+            return max(1, workers)
+    if os.environ.get("WEB_CONCURRENCY", "").isdigit():
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    config_file = any(arg in ("-c", "--config") or arg.startswith("--config=") for arg in sys.argv[1:])
+    if gunicorn and (config_file or os.path.exists("gunicorn.conf.py")):
+        logger.warning(
+            "Running under gunicorn but the worker count is not in -w, GUNICORN_CMD_ARGS or WEB_CONCURRENCY; "
+            "assuming 1 worker for the thread budget, set WEB_WORKERS if a config file starts more"
+        )
+    return 1
+
+
+def compute_budget(cores: Optional[int] = None, workers: Optional[int] = None) -> ThreadBudget:
+    """
+    Split the cores evenly across worker processes.
+
+    Every stage gets the worker's share unless its ``*_THREADS`` setting
+    overrides it. The stages of one request run one after another, so
+    sharing the share does not oversubscribe; the workers do, which is
+    what the split prevents. Retrieval shards of one worker search in
+    parallel and split the FAISS share between them.
+    """
+    cores = cores or available_cores()
+    workers = max(1, workers or web_workers())
+    per_worker = max(1, cores // workers)
+    faiss_threads = Config.FAISS_THREADS or per_worker
+    return ThreadBudget(
+        cores=cores,
+        workers=workers,
+        per_worker=per_worker,
+        torch=Config.TORCH_THREADS or per_worker,
+        faiss=faiss_threads,
+        blas=Config.BLAS_THREADS or per_worker,
+        classifier=Config.CLASSIFIER_THREADS or per_worker,
+        shard=max(1, faiss_threads // Config.RETRIEVAL_SHARDS) if Config.RETRIEVAL_SHARDS > 0 else faiss_threads,
+    )
+
+
+def current_budget() -> ThreadBudget:
+    """The budget applied by configure_threads, or a freshly computed one."""
+    return _budget or compute_budget()
+
+
+def configure_threads(budget: Optional[ThreadBudget] = None) -> ThreadBudget:
+    """
+    Apply the thread budget to torch, FAISS and BLAS in this process.
+
+    Call before the routes are imported: libraries not loaded yet pick the
+    budget up from the environment (variables the operator already set are
+    kept), those already loaded are set directly.
+    """
+    global _budget
+    budget = budget or compute_budget()
+    _budget = budget
+    # Ghi nhận trước: import faiss bên dưới cũng nạp numpy (khi đó đã có biến môi trường)
+    numpy_loaded = "numpy" in sys.modules
+    for name in OPENMP_ENV:
+        os.environ.setdefault(name, str(budget.torch))
+    for name in BLAS_ENV:
+        os.environ.setdefault(name, str(budget.blas))
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(budget.torch)
+    try:
+        import faiss
+        faiss.omp_set_num_threads(budget.faiss)
+    except ImportError:
+        pass
+    if numpy_loaded:
+        try:
+            # numpy đã nạp: BLAS bỏ qua biến môi trường, đặt lại qua threadpoolctl
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=budget.blas, user_api="blas")
+        except ImportError:
+            logger.warning("numpy was imported before configure_threads and threadpoolctl is missing; BLAS keeps its default threads")
+    return budget
+
+
+def effective_threads() -> Dict[str, object]:
+    """Budget plus the thread counts the loaded libraries actually report."""
+    report: Dict[str, object] = asdict(current_budget())
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        report["torch_effective"] = torch.get_num_threads()
+    faiss = sys.modules.get("faiss")
+    if faiss is not None:
+        report["faiss_effective"] = faiss.omp_get_max_threads()
+    if "numpy" in sys.modules:
+        try:
+            from threadpoolctl import threadpool_info
+            report["blas_effective"] = {
+                info.get("internal_api"): info.get("num_threads") for info in threadpool_info() if info.get("user_api") == "blas"
+            }
+        except ImportError:
+            pass
+    return report
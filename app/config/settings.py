@@ -8,6 +8,67 @@ class Config:
     INDEX_PATH = "source/index_plant.faiss"
     METADATA_PATH = "source/faiss_metadata_30_05.pkl"
     SUMMARIZED_METADATA_PATH = "source/summarized_faiss_metadata.pkl"
+    BM25_PATH = "source/bm25_indices.pkl"
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    CATALOGUE_PATH = os.getenv("CATALOGUE_PATH", "source/plant_desease.json")
+    BM25_BIGRAMS = os.getenv("BM25_BIGRAMS", "1") == "1"
+    BM25_FOLD_VARIANTS = os.getenv("BM25_FOLD_VARIANTS", "1") == "1"
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL", "3600"))  # seconds, 0 = disabled
+    COMPACTION_TOMBSTONE_RATIO = float(os.getenv("COMPACTION_TOMBSTONE_RATIO", "0.05"))
+    INDEX_LOCK_PATH = os.getenv("INDEX_LOCK_PATH", "source/index.lock")  # khóa ghi index dùng chung mọi worker/CLI
+    RECORD_PATH = os.getenv("RECORD_PATH", "logs/requests.jsonl")
+    RECORD_SAMPLE_RATE = float(os.getenv("RECORD_SAMPLE_RATE", "0.1"))  # 0 = disabled
+    RECORD_MAX_BYTES = int(os.getenv("RECORD_MAX_BYTES", str(50 * 1024 * 1024)))
+    RECORD_BACKUP_COUNT = int(os.getenv("RECORD_BACKUP_COUNT", "10"))
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4096"))  # 0 = disabled
+    RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "900"))  # seconds
+    RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL", "")  # vd. redis://localhost:6379/0, cần `pip install redis`
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+    QUESTION_BANK_INDEX_PATH = os.getenv("QUESTION_BANK_INDEX_PATH", "source/question_bank.faiss")
+    QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "source/question_bank.json")
+    RELATED_QUESTIONS_SOURCE = os.getenv("RELATED_QUESTIONS_SOURCE", "bank")  # "bank" | "llm"
+    LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "8"))  # per worker
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+    LLM_ADMISSION_DEADLINE = float(os.getenv("LLM_ADMISSION_DEADLINE", "30"))  # seconds
+    ANSWER_FALLBACK = os.getenv("ANSWER_FALLBACK", "1") == "1"  # trả lời trích xuất khi LLM không khả dụng
+    ANSWER_SPECULATIVE_TIMEOUT = float(os.getenv("ANSWER_SPECULATIVE_TIMEOUT", "0"))  # seconds, 0 = chờ LLM
+    RETRIEVAL_THREADS = int(os.getenv("RETRIEVAL_THREADS", "4"))  # thread pool cho retrieval ở chế độ ASGI
+    RETRIEVAL_SHARDS = int(os.getenv("RETRIEVAL_SHARDS", "0"))  # số process shard, 0 = truy vấn trong process
+    SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "2.0"))  # seconds, quá hạn thì dùng index trong process
+    RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL", "")  # vd. http://127.0.0.1:5100, rỗng = retrieval trong process
+    RETRIEVAL_SERVICE_TIMEOUT = float(os.getenv("RETRIEVAL_SERVICE_TIMEOUT", "5"))  # seconds
+    RETRIEVAL_SERVICE_POOL = int(os.getenv("RETRIEVAL_SERVICE_POOL", "16"))  # kết nối giữ lại mỗi worker
+    RETRIEVAL_LOCAL_FALLBACK = os.getenv("RETRIEVAL_LOCAL_FALLBACK", "1") == "1"  # service lỗi thì nạp index trong process
+    MMR_ENABLED = os.getenv("MMR_ENABLED", "1") == "1"  # đa dạng hóa kết quả hybrid bằng MMR
+    MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1 = chỉ xét độ liên quan, 0 = chỉ xét độ đa dạng
+    MMR_SOURCE_CAP = int(os.getenv("MMR_SOURCE_CAP", "2"))  # tối đa đoạn từ cùng một nguồn, 0 = không giới hạn
+    MMR_CANDIDATES = int(os.getenv("MMR_CANDIDATES", "50"))  # số ứng viên sau fusion đưa vào MMR
+    MMR_DUPLICATE_THRESHOLD = float(os.getenv("MMR_DUPLICATE_THRESHOLD", "0.95"))  # cosine, từ mức này coi là trùng lặp
+    INDEX_BUNDLE_DIR = os.getenv("INDEX_BUNDLE_DIR", "source/bundles")  # bundle có version + CURRENT, không có thì dùng các file ở trên
+    INDEX_WATCH_INTERVAL = int(os.getenv("INDEX_WATCH_INTERVAL", "30"))  # seconds, kiểm tra bundle mới, 0 = tắt
+    INDEX_DRAIN_TIMEOUT = float(os.getenv("INDEX_DRAIN_TIMEOUT", "30"))  # seconds chờ truy vấn trên bản cũ kết thúc
+    SEARCH_WINDOW = int(os.getenv("SEARCH_WINDOW", "50"))  # /api/search: số kết quả tối đa phân trang được cho một truy vấn
+    CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", "source/leaf_classifier.onnx")  # .onnx (cần `pip install onnxruntime`) hoặc TorchScript .pt
+    CLASSIFIER_LABELS_PATH = os.getenv("CLASSIFIER_LABELS_PATH", "source/leaf_classifier.json")  # danh sách lớp + input_size/mean/std
+    CLASSIFIER_THREADS = int(os.getenv("CLASSIFIER_THREADS", "0"))  # intra-op threads của ONNX Runtime, 0 = theo ngân sách thread
+    CLASSIFIER_BATCH_SIZE = int(os.getenv("CLASSIFIER_BATCH_SIZE", "16"))  # ảnh tối đa mỗi lượt suy luận
+    CLASSIFIER_BATCH_WAIT_MS = float(os.getenv("CLASSIFIER_BATCH_WAIT_MS", "8"))  # chờ gom thêm ảnh cho một batch
+    CLASSIFIER_MAX_QUEUE = int(os.getenv("CLASSIFIER_MAX_QUEUE", "128"))  # ảnh chờ tối đa, vượt thì trả 503
+    CLASSIFIER_TIMEOUT = float(os.getenv("CLASSIFIER_TIMEOUT", "10"))  # seconds
+    CLASSIFIER_CACHE_SIZE = int(os.getenv("CLASSIFIER_CACHE_SIZE", "4096"))  # kết quả theo perceptual hash, 0 = tắt
+    CLASSIFIER_HASH_DISTANCE = int(os.getenv("CLASSIFIER_HASH_DISTANCE", "4"))  # số bit dHash (trên 64) còn coi là cùng một ảnh, 0 = chỉ khớp tuyệt đối
+    CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.3"))  # dưới mức này không tra cứu tài liệu
+    CLASSIFIER_MAX_IMAGE_MB = int(os.getenv("CLASSIFIER_MAX_IMAGE_MB", "10"))
+    CPU_CORES = int(os.getenv("CPU_CORES", "0"))  # 0 = tự phát hiện (CPU affinity, quota cgroup của container)
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0"))  # số process worker trên máy, chia đều số core; 0 = theo gunicorn -w / GUNICORN_CMD_ARGS / WEB_CONCURRENCY
+    TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))  # intra-op threads của torch mỗi worker, 0 = theo ngân sách
+    FAISS_THREADS = int(os.getenv("FAISS_THREADS", "0"))  # OpenMP threads của FAISS mỗi worker, 0 = theo ngân sách
+    BLAS_THREADS = int(os.getenv("BLAS_THREADS", "0"))  # threads của BLAS (numpy) mỗi worker, 0 = theo ngân sách
+    ASSETS_ENABLED = os.getenv("ASSETS_ENABLED", "1") == "1"  # dùng template đã build bởi app.cli.build_assets nếu còn mới
+    COLLECTIONS_PATH = os.getenv("COLLECTIONS_PATH", "source/collections.json")  # khai báo các collection ngoài banan/banan_sum
+    COLLECTION_MEMORY_MB = int(os.getenv("COLLECTION_MEMORY_MB", "2048"))  # per worker, 0 = không giới hạn
+    COLLECTION_IDLE_SECONDS = int(os.getenv("COLLECTION_IDLE_SECONDS", "1800"))  # giải phóng collection không dùng, 0 = giữ mãi
 
     def __init__(self):
         self.validate()  # Gọi validate khi khởi tạo
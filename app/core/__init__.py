@@ -1,11 +1,13 @@
 from .models import Document
-from .services import QueryService, GeminiService
-from .repositories import IndexRepository, MetadataRepository
+from .services import QueryService, GeminiService, CatalogueService
+from .repositories import IndexRepository, MetadataRepository, CatalogueRepository
 
 __all__ = [
     "Document",
     "QueryService",
     "GeminiService",
+    "CatalogueService",
     "IndexRepository",
-    "MetadataRepository"
+    "MetadataRepository",
+    "CatalogueRepository"
 ]
\ No newline at end of file
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from .metrics import ADMISSION_DECISIONS
+from ..config.settings import Config
+
+# Độ ưu tiên: số nhỏ được phục vụ trước
+PRIORITY_AUTHENTICATED = 0
+PRIORITY_ANONYMOUS = 1
+
+_current_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[float]:
+    """Monotonic deadline of the admitted request on this thread, if any."""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Tighten the current deadline to at most ``seconds`` from now for the block."""
+    deadline_at = time.monotonic() + seconds
+    current = _current_deadline.get()
+    token = _current_deadline.set(deadline_at if current is None else min(current, deadline_at))
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued; ``retry_after`` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded, prioritized admission for LLM-backed requests.
+
+    At most ``max_concurrent`` requests run; up to ``max_queue`` more wait in
+    priority order. A request is rejected up front when its estimated wait
+    (queue position x EWMA service time) or the key pool's cooldown exceeds its
+    deadline, so overload turns into fast 503s instead of stuck threads.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = Config.LLM_MAX_CONCURRENT,
+        max_queue: int = Config.LLM_MAX_QUEUE,
+        deadline: float = Config.LLM_ADMISSION_DEADLINE,
+        initial_service_time: float = 5.0
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.service_time = initial_service_time
+        self._active = 0
+        self._waiters: List[list] = []  # heap of [priority, seq, state]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _estimated_wait(self, priority: int) -> float:
+        ahead = sum(1 for entry in self._waiters if entry[0] <= priority and entry[2]["status"] == "waiting")
+        return (ahead // self.max_concurrent + 1) * self.service_time
+
+    def _reject(self, priority: int, reason: str, retry_after: float) -> AdmissionRejected:
+        ADMISSION_DECISIONS.labels(priority=str(priority), outcome=reason).inc()
+        return AdmissionRejected(reason, max(1.0, retry_after))
+
+    @staticmethod
+    def _set_status(state: Dict, status: str) -> None:
+        state["status"] = status
+        # Người chờ async được đánh thức qua event loop của nó
+        if state.get("wake"):
+            state["wake"]()
+
+    def _evict_lowest(self, priority: int) -> bool:
+        """Drop the newest waiter with worse priority to make room; False if none."""
+        candidates = [entry for entry in self._waiters if entry[0] > priority and entry[2]["status"] == "waiting"]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        self._set_status(victim[2], "evicted")
+        return True
+
+    def _remove_waiter(self, state: Dict) -> None:
+        self._waiters = [entry for entry in self._waiters if entry[2] is not state]
+        heapq.heapify(self._waiters)
+
+    def _enqueue(self, priority: int, deadline_at: float, wake: Optional[Callable[[], None]] = None) -> Optional[Dict]:
+        """Take a free slot (returns None) or join the queue (returns the waiter state); caller holds the lock."""
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return None
+
+        estimate = self._estimated_wait(priority)
+        if time.monotonic() + estimate > deadline_at:
+            raise self._reject(priority, "deadline", estimate)
+        if len(self._waiters) >= self.max_queue and not self._evict_lowest(priority):
+            raise self._reject(priority, "queue_full", estimate)
+
+        state: Dict = {"status": "waiting", "wake": wake}
+        heapq.heappush(self._waiters, [priority, next(self._seq), state])
+        return state
+
+    def _acquire(self, priority: int, deadline_at: float) -> None:
+        with self._cond:
+            state = self._enqueue(priority, deadline_at)
+            if state is None:
+                return
+            while state["status"] == "waiting":
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    state["status"] = "timeout"
+                    self._remove_waiter(state)
+                    raise self._reject(priority, "timeout", self._estimated_wait(priority))
+                self._cond.wait(remaining)
+            if state["status"] == "evicted":
+                raise self._reject(priority, "evicted", self._estimated_wait(priority))
+
+    async def _acquire_async(self, priority: int, deadline_at: float) -> None:
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with self._cond:
+            state = self._enqueue(priority, deadline_at, wake=lambda: loop.call_soon_threadsafe(event.set))
+            if state is None:
+                return
+        try:
+            await asyncio.wait_for(event.wait(), max(0.0, deadline_at - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client ngắt kết nối: rời hàng đợi, hoặc trả lại slot vừa được giao
+            with self._cond:
+                admitted = state["status"] == "admitted"
+                if state["status"] == "waiting":
+                    state["status"] = "cancelled"
+                    self._remove_waiter(state)
+            if admitted:
+                self._release(None)
+            raise
+        with self._cond:
+            if state["status"] == "waiting":
+                state["status"] = "timeout"
+                self._remove_waiter(state)
+                raise self._reject(priority, "timeout", self._estimated_wait(priority))
+        if state["status"] == "evicted":
+            raise self._reject(priority, "evicted", self._estimated_wait(priority))
+
+    def _release(self, elapsed: Optional[float]) -> None:
+        with self._cond:
+            self._active -= 1
+            if elapsed is not None:
+                self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+            # Giao slot trực tiếp cho người chờ có ưu tiên cao nhất
+            while self._waiters and self._active < self.max_concurrent:
+                _, _, state = heapq.heappop(self._waiters)
+                if state["status"] == "waiting":
+                    self._active += 1
+                    self._set_status(state, "admitted")
+            self._cond.notify_all()
+
+    def _deadline_at(self, priority: int, saturation_wait: float, deadline: Optional[float]) -> float:
+        deadline = self.deadline if deadline is None else deadline
+        if saturation_wait > deadline:
+            raise self._reject(priority, "keys_cooling_down", saturation_wait)
+        return time.monotonic() + deadline
+
+    @contextmanager
+    def admit(self, priority: int = PRIORITY_ANONYMOUS, saturation_wait: float = 0.0, deadline: Optional[float] = None):
+        """
+        Hold an LLM slot for the duration of the block, or raise AdmissionRejected.
+
+        ``saturation_wait`` is how long until any API key is usable again;
+        requests that could not finish before their deadline are shed at once.
+        """
+        deadline_at = self._deadline_at(priority, saturation_wait, deadline)
+        self._acquire(priority, deadline_at)
+        ADMISSION_DECISIONS.labels(priority=str(priority), outcome="admitted").inc()
+        token = _current_deadline.set(deadline_at)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            _current_deadline.reset(token)
+            self._release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def admit_async(self, priority: int = PRIORITY_ANONYMOUS, saturation_wait: float = 0.0, deadline: Optional[float] = None):
+        """Async variant of admit: waiting for a slot suspends the task instead of a thread."""
+        deadline_at = self._deadline_at(priority, saturation_wait, deadline)
+        await self._acquire_async(priority, deadline_at)
+        ADMISSION_DECISIONS.labels(priority=str(priority), outcome="admitted").inc()
+        token = _current_deadline.set(deadline_at)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            _current_deadline.reset(token)
+            self._release(time.monotonic() - start)
@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Set
+
+# Đường dẫn của pipeline asset tĩnh (xem app.cli.build_assets)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_DIR = os.path.join(APP_DIR, "templates")
+DIST_TEMPLATE_DIR = os.path.join(TEMPLATE_DIR, "dist")
+DIST_DIR = os.path.join(APP_DIR, "static", "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+
+
+def source_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def source_templates() -> List[str]:
+    return sorted(name for name in os.listdir(TEMPLATE_DIR) if name.endswith(".html"))
+
+
+def read_manifest() -> Dict[str, Dict]:
+    """``{template: {"source_sha256", "assets"}}`` of the last build, empty if there is none."""
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)["templates"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def built_assets() -> Set[str]:
+    """Asset file names referenced by the current manifest."""
+    return {asset for entry in read_manifest().values() for asset in entry["assets"]}
+
+
+def stale_templates() -> List[str]:
+    """Templates whose source changed (or that were never built) since the last build."""
+    built = read_manifest()
+    return [
+        name for name in source_templates()
+        if built.get(name, {}).get("source_sha256") != source_hash(os.path.join(TEMPLATE_DIR, name))
+    ]
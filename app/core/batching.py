@@ -0,0 +1,94 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+import numpy as np
+from .metrics import MICRO_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherBusy(Exception):
+    """Raised when the batch queue is full; the caller should shed the request."""
+
+
+class BatchFailed(Exception):
+    """The batched function raised; every request of that batch gets this, chained to the cause."""
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item requests into one model call.
+
+    A worker thread takes the first waiting item, then collects more until
+    ``max_batch`` items are queued or ``max_wait_ms`` has passed since, and
+    runs ``fn`` on the stacked array. Under light load a request waits at
+    most ``max_wait_ms``; under heavy load batches fill instantly.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[np.ndarray], np.ndarray],
+        max_batch: int = 16,
+        max_wait_ms: float = 8.0,
+        max_queue: int = 128,
+        name: str = "batcher"
+    ):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # Khởi động trễ: thread không sống sót qua fork của gunicorn
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, item: np.ndarray) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            raise BatcherBusy(f"{self.name} queue is full ({self._queue.maxsize})")
+        return future
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Lấy ngay phần đang chờ, chỉ ngủ khi hàng đợi trống
+                batch.append(self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            MICRO_BATCH_SIZE.labels(batcher=self.name).observe(len(batch))
+            try:
+                outputs = self.fn(np.stack([item for item, _ in batch]))
+            except Exception as e:
+                logger.exception(f"{self.name}: batch of {len(batch)} failed: {e}")
+                # Không trả thẳng lỗi gốc: ValueError của model không phải lỗi của request
+                failure = BatchFailed(f"{self.name} failed on a batch of {len(batch)}: {type(e).__name__}: {e}")
+                failure.__cause__ = e
+                for _, future in batch:
+                    future.set_exception(failure)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
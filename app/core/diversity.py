@@ -0,0 +1,62 @@
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+def mmr_select(
+    relevance: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.7,
+    groups: Optional[Sequence] = None,
+    per_group: int = 0,
+    duplicate_threshold: float = 1.0
+) -> List[int]:
+    """
+    Maximal marginal relevance over ``n`` candidates; returns the chosen positions in pick order.
+
+    Each step picks ``argmax(lambda * rel - (1 - lambda) * max cosine to the picked set)``.
+    Relevance is min-max scaled to [0, 1] so ``lambda_mult`` weighs it against
+    cosine similarity. Candidates at least ``duplicate_threshold`` similar to a
+    picked one are dropped, and at most ``per_group`` candidates (0 = no cap)
+    are taken from the same group (e.g. source PDF) unless only capped groups remain.
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+    relevance = np.asarray(relevance, dtype=np.float32)
+    spread = float(relevance.max() - relevance.min())
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+
+    unit = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(unit, axis=1, keepdims=True)
+    unit = unit / np.where(norms == 0, 1.0, norms)
+    similarity = unit @ unit.T
+
+    group_ids = None
+    if groups is not None and per_group > 0:
+        _, group_ids = np.unique([str(group) for group in groups], return_inverse=True)
+    group_counts = np.zeros(n, dtype=np.int32)
+    candidate = np.ones(n, dtype=bool)  # chưa chọn và không trùng lặp với câu đã chọn
+    under_cap = np.ones(n, dtype=bool)
+    # Chưa chọn gì thì không có phạt trùng lặp
+    max_similarity = np.zeros(n, dtype=np.float32)
+    picked: List[int] = []
+
+    while len(picked) < k:
+        eligible = candidate & under_cap
+        if not eligible.any():
+            # Chỉ còn ứng viên từ nguồn đã đủ hạn mức: nới hạn mức thay vì trả thiếu kết quả
+            eligible = candidate
+            if not eligible.any():
+                break
+        scores = np.where(eligible, lambda_mult * relevance - (1 - lambda_mult) * max_similarity, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        candidate[best] = False
+        candidate &= similarity[best] < duplicate_threshold
+        max_similarity = np.maximum(max_similarity, similarity[best])
+        if group_ids is not None:
+            group_counts[group_ids[best]] += 1
+            if group_counts[group_ids[best]] >= per_group:
+                under_cap &= group_ids != group_ids[best]
+    return picked
@@ -0,0 +1,71 @@
+import logging
+import os
+import tempfile
+from contextlib import contextmanager, suppress
+from typing import IO, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có khóa liên process, chỉ dùng khi chạy một worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _open_lock_file(path: str) -> IO:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return open(path, "a+")
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Exclusive lock shared by every process that opens ``path`` (``flock``).
+
+    Not re-entrant: a second ``file_lock`` on the same path in the same
+    process blocks, so callers keep their own depth counter.
+    """
+    if fcntl is None:
+        yield
+        return
+    with _open_lock_file(path) as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def try_file_lock(path: str) -> Optional[IO]:
+    """Take ``path``'s lock without waiting; the returned file holds it until closed, None if taken."""
+    f = _open_lock_file(path)
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    Yield a unique temporary path next to ``path``; it replaces ``path`` if
+    the block succeeds and is removed otherwise. Concurrent writers never
+    share a temporary file.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o644)  # mkstemp tạo file 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,79 @@
+import io
+from typing import BinaryIO, Sequence, Tuple
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Chặn ảnh "bom giải nén": header khai báo kích thước khổng lồ
+MAX_PIXELS = 40_000_000
+# Chuẩn hóa ImageNet, dùng khi file mô tả model không khai báo mean/std
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def read_limited(stream: BinaryIO, max_bytes: int) -> bytes:
+    """Read an upload without ever holding more than ``max_bytes + 1`` bytes; ValueError if it is larger."""
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f"Image larger than {max_bytes // (1024 * 1024)} MB")
+    return data
+
+
+def decode_image(data: bytes, size: int) -> Image.Image:
+    """
+    Decode an upload to RGB at roughly twice ``size``.
+
+    Only the header is parsed before the size check. JPEGs are then decoded
+    directly at a reduced DCT scale (``draft``), so a 12 MP photo never
+    materializes at full resolution.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f"Image too large: {image.width}x{image.height}")
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)  # ảnh điện thoại thường lưu hướng xoay trong EXIF
+        return image.convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unreadable image: {e}")
+
+
+def to_tensor(
+    image: Image.Image,
+    size: int,
+    mean: Sequence[float] = IMAGENET_MEAN,
+    std: Sequence[float] = IMAGENET_STD
+) -> np.ndarray:
+    """Center-crop and resize to ``size`` x ``size``; returns a normalized float32 CHW array."""
+    image = ImageOps.fit(image, (size, size), Image.BILINEAR)
+    array = np.asarray(image, dtype=np.float32) / 255.0
+    array = (array - np.asarray(mean, dtype=np.float32)) / np.asarray(std, dtype=np.float32)
+    return np.ascontiguousarray(array.transpose(2, 0, 1))
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> str:
+    """
+    Difference hash (dHash) plus a coarse 2x2 color signature, as hex.
+
+    Re-encoded, resized or recompressed copies of the same photo land within
+    a few bits of each other (see ``hash_distance``), which is what repeated
+    uploads from chat apps look like. dHash only sees luminance gradients, so
+    the color part keeps a yellowed leaf from matching a green one.
+    """
+    gray = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BOX), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    value = int("".join("1" if bit else "0" for bit in bits), 2)
+    # 16 mức mỗi kênh: đủ phân biệt màu bệnh, gần như không đổi khi nén lại JPEG
+    colors = np.asarray(image.resize((2, 2), Image.BOX), dtype=np.uint8) >> 4
+    return f"{value:0{hash_size * hash_size // 4}x}-" + "".join(f"{c:x}" for c in colors.flatten())
+
+
+def hash_signature(image_hash: str) -> Tuple[int, Tuple[int, ...]]:
+    gradient, colors = image_hash.split("-")
+    return int(gradient, 16), tuple(int(c, 16) for c in colors)
+
+
+def hash_distance(a: Tuple[int, Tuple[int, ...]], b: Tuple[int, Tuple[int, ...]]) -> int:
+    """Differing dHash bits between two signatures; effectively infinite if their colors differ by more than one level."""
+    if any(abs(x - y) > 1 for x, y in zip(a[1], b[1])):
+        return 1 << 16
+    return (a[0] ^ b[0]).bit_count()
@@ -0,0 +1,176 @@
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from ..config.settings import Config
+
+# Bucket (giây) cho các bước truy vấn và cho lời gọi LLM
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "plant_stage_seconds", "Latency of a request processing stage", ["stage"], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "plant_http_request_seconds", "HTTP request latency", ["endpoint", "method", "status"], buckets=LLM_BUCKETS
+)
+GEMINI_ATTEMPT_SECONDS = Histogram(
+    "plant_gemini_attempt_seconds", "Latency of a single Gemini attempt",
+    ["model", "key_index", "outcome"], buckets=LLM_BUCKETS
+)
+GEMINI_ATTEMPTS = Counter(
+    "plant_gemini_attempts_total", "Gemini attempts", ["model", "key_index", "outcome"]
+)
+GEMINI_PROMPT_TOKENS = Counter("plant_gemini_prompt_tokens_total", "Prompt tokens sent to Gemini", ["model"])
+GEMINI_RESPONSE_TOKENS = Counter("plant_gemini_response_tokens_total", "Response tokens returned by Gemini", ["model"])
+RESULT_CACHE_LOOKUPS = Counter("plant_result_cache_lookups_total", "Retrieval cache lookups", ["strategy", "source"])
+ADMISSION_DECISIONS = Counter(
+    "plant_admission_decisions_total", "Admission control decisions for LLM-backed requests", ["priority", "outcome"]
+)
+SHARD_ERRORS = Counter("plant_shard_errors_total", "Failed shard requests", ["shard", "reason"])
+SHARD_FALLBACKS = Counter(
+    "plant_shard_fallbacks_total", "Sharded queries answered by the in-process index instead", ["reason"]
+)
+RETRIEVAL_SERVICE_REQUESTS = Counter(
+    "plant_retrieval_service_requests_total", "Calls from web workers to the retrieval service", ["endpoint", "outcome"]
+)
+INDEX_RELOADS = Counter("plant_index_reloads_total", "Index hot-reload attempts", ["outcome"])
+COLLECTION_EVENTS = Counter(
+    "plant_collection_events_total", "Collection loads and evictions", ["collection", "event"]
+)
+COLLECTION_MEMORY_BYTES = Gauge(
+    "plant_collection_memory_bytes", "Estimated memory held by lazily loaded collections", multiprocess_mode="livesum"
+)
+THREAD_BUDGET = Gauge(
+    "plant_thread_budget", "Threads per worker process assigned to each library", ["library"], multiprocess_mode="max"
+)
+MICRO_BATCH_SIZE = Histogram(
+    "plant_micro_batch_size", "Items per micro-batched model call", ["batcher"], buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+DIAGNOSIS_CACHE_LOOKUPS = Counter(
+    "plant_diagnosis_cache_lookups_total", "Image diagnosis lookups by perceptual hash", ["source"]
+)
+
+
+class RequestTimings:
+    """Stage timings collected for one request, rendered as a Server-Timing header."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.entries: List[Tuple[str, float, Optional[str]]] = []
+        self.models_used: List[str] = []
+
+    def add(self, name: str, seconds: float, description: Optional[str] = None) -> None:
+        self.entries.append((name, seconds, description))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per stage; repeated stages are summed."""
+        totals: Dict[str, float] = {}
+        for name, seconds, _ in self.entries:
+            totals[name] = totals.get(name, 0.0) + seconds * 1000
+        return {name: round(ms, 3) for name, ms in totals.items()}
+
+    def server_timing(self) -> str:
+        seen: Dict[str, int] = {}
+        parts = []
+        for name, seconds, description in self.entries:
+            seen[name] = seen.get(name, 0) + 1
+            metric = name if seen[name] == 1 else f"{name}_{seen[name]}"
+            part = f"{metric};dur={seconds * 1000:.2f}"
+            if description:
+                part += f';desc="{description}"'
+            parts.append(part)
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> RequestTimings:
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def record_stage(name: str, seconds: float, description: Optional[str] = None) -> None:
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds, description)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a named stage (Prometheus histogram + Server-Timing entry)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_gemini_attempt(
+    model: str,
+    key_index: int,
+    outcome: str,
+    seconds: float,
+    prompt_tokens: int = 0,
+    response_tokens: int = 0
+) -> None:
+    labels = {"model": model, "key_index": str(key_index), "outcome": outcome}
+    GEMINI_ATTEMPT_SECONDS.labels(**labels).observe(seconds)
+    GEMINI_ATTEMPTS.labels(**labels).inc()
+    if prompt_tokens:
+        GEMINI_PROMPT_TOKENS.labels(model=model).inc(prompt_tokens)
+    if response_tokens:
+        GEMINI_RESPONSE_TOKENS.labels(model=model).inc(response_tokens)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add("gemini", seconds, f"{model} k{key_index} {outcome}")
+        if outcome == "ok":
+            timings.models_used.append(model)
+
+
+def record_thread_budget(report: Dict) -> None:
+    """Export the effective thread counts from ``effective_threads()``; measured values win over the budget."""
+    for library in ("torch", "faiss", "blas", "classifier", "shard"):
+        value = report.get(f"{library}_effective", report.get(library))
+        if isinstance(value, dict):
+            value = max(value.values(), default=report.get(library))
+        if isinstance(value, int):
+            THREAD_BUDGET.labels(library=library).set(value)
+
+
+def scrape_authorized(headers) -> bool:
+    """
+    True if the request carries ADMIN_TOKEN, as ``X-Admin-Token`` or
+    ``Authorization: Bearer`` (Prometheus ``authorization.credentials``).
+    Without ADMIN_TOKEN configured nobody may scrape.
+    """
+    if not Config.ADMIN_TOKEN:
+        return False
+    token = headers.get("X-Admin-Token", "")
+    authorization = headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):]
+    return hmac.compare_digest(token.encode("utf-8"), Config.ADMIN_TOKEN.encode("utf-8"))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus exposition; aggregates across gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
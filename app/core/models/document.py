@@ -12,4 +12,36 @@ class Document:
     legal_issues: str = "No issues"
     court_reasoning: str = "No reasoning"
     decision: str = "No decision"
-    relevant_laws: str = "No laws"
\ No newline at end of file
+    relevant_laws: str = "No laws"
+
+    @classmethod
+    def from_row(cls, metadata: Dict, row: int, score: Optional[float] = None, distance: Optional[float] = None) -> "Document":
+        """Build a Document from one row of a metadata dict (ids/texts/metadata)."""
+        return cls.from_dict({
+            "id": metadata["ids"][row],
+            "text": metadata["texts"][row],
+            "metadata": metadata["metadata"][row],
+            "score": score,
+            "distance": distance
+        })
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Document":
+        """Inverse of to_dict; the summary fields are read from the metadata."""
+        meta = data["metadata"]
+        return cls(
+            id=data["id"],
+            text=data["text"],
+            metadata=meta,
+            score=data.get("score"),
+            distance=data.get("distance"),
+            case_summary=meta.get("case_summary"),
+            legal_issues=meta.get("legal_issues"),
+            court_reasoning=meta.get("court_reasoning"),
+            decision=meta.get("decision"),
+            relevant_laws=meta.get("relevant_laws")
+        )
+
+    def to_dict(self) -> Dict:
+        """Compact wire form (retrieval service responses)."""
+        return {"id": self.id, "text": self.text, "metadata": self.metadata, "score": self.score, "distance": self.distance}
@@ -0,0 +1,4 @@
+from .corpus_builder import CorpusBuilder
+from .sources import Chunk, SourcePage, iter_chunks, iter_source_pages, split_text
+
+__all__ = ["CorpusBuilder", "Chunk", "SourcePage", "iter_chunks", "iter_source_pages", "split_text"]
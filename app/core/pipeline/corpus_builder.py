@@ -0,0 +1,246 @@
+import glob
+import itertools
+import json
+import logging
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+import faiss
+import numpy as np
+from .sources import Chunk, iter_chunks, iter_source_pages
+from ..repositories.bm25_index import IncrementalBM25, save_bm25_bundle
+from ..repositories.metadata_repository import MetadataRepository
+from ..text.tokenizer import get_tokenizer
+from ...config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "checkpoint.json"
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Model của từng tiến trình worker (nạp một lần trong initializer)
+_worker_model = None
+
+
+def _init_worker(model_name: str, num_threads: int) -> None:
+    global _worker_model
+    if num_threads:
+        try:
+            import torch
+            torch.set_num_threads(num_threads)
+        except ImportError:
+            pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    vectors = _worker_model.encode(texts, convert_to_numpy=True, batch_size=len(texts))
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def lead_summary(text: str, max_chars: int = 500) -> str:
+    """Extractive summary: leading sentences up to ``max_chars``."""
+    summary = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        if summary and len(summary) + len(sentence) + 1 > max_chars:
+            break
+        summary = f"{summary} {sentence}".strip()
+    return summary[:max_chars]
+
+
+class CorpusBuilder:
+    """
+    Streaming, resumable corpus build.
+
+    Stage 1 (``embed``) streams source pages, chunks them and embeds batches
+    across a process pool, writing ``shard_XXXXX.npy``/``.pkl`` pairs to
+    ``work_dir`` and recording progress in ``checkpoint.json`` after each
+    shard. Re-running with the same parameters skips the chunks already
+    written. Stage 2 (``finalize``) merges the shards into the FAISS index,
+    metadata pickles and BM25 bundle that IndexRepository loads.
+    """
+
+    def __init__(
+        self,
+        work_dir: str,
+        doc_type: str = "banan",
+        model_name: str = Config.EMBEDDING_MODEL,
+        workers: Optional[int] = None,
+        threads_per_worker: int = 1,
+        batch_size: int = 64,
+        shard_size: int = 4096,
+        chunk_size: int = 1000,
+        overlap: int = 150
+    ):
+        self.work_dir = work_dir
+        self.doc_type = doc_type
+        self.model_name = model_name
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        os.makedirs(work_dir, exist_ok=True)
+
+    @property
+    def _params(self) -> Dict:
+        return {
+            "doc_type": self.doc_type,
+            "model_name": self.model_name,
+            "chunk_size": self.chunk_size,
+            "overlap": self.overlap,
+            "shard_size": self.shard_size,
+        }
+
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.work_dir, CHECKPOINT_FILE)
+
+    def load_checkpoint(self) -> Dict:
+        path = self._checkpoint_path()
+        if not os.path.exists(path):
+            return {"params": self._params, "shards": 0, "chunks": 0, "done": False}
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("params") != self._params:
+            raise ValueError(
+                f"Checkpoint in {self.work_dir} was written with different parameters "
+                f"({checkpoint.get('params')}); use a fresh work directory"
+            )
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict) -> None:
+        tmp_path = self._checkpoint_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self._checkpoint_path())
+
+    def _shard_base(self, shard_no: int) -> str:
+        return os.path.join(self.work_dir, f"shard_{shard_no:05d}")
+
+    def _clear_shards(self) -> None:
+        """Remove shard files left by an earlier run so a fresh build cannot merge them."""
+        stale = glob.glob(os.path.join(self.work_dir, "shard_*"))
+        for path in stale:
+            os.remove(path)
+        if stale:
+            logger.info(f"Removed {len(stale)} stale shard files from {self.work_dir}")
+
+    def _write_shard(self, shard_no: int, chunks: List[Chunk], vectors: np.ndarray) -> None:
+        base = self._shard_base(shard_no)
+        np.save(base + ".tmp.npy", vectors)
+        os.replace(base + ".tmp.npy", base + ".npy")
+        with open(base + ".pkl.tmp", "wb") as f:
+            pickle.dump({
+                "ids": [c.id for c in chunks],
+                "metadata": [c.metadata for c in chunks],
+                "texts": [c.text for c in chunks],
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(base + ".pkl.tmp", base + ".pkl")
+
+    def _embed(self, executor: Optional[ProcessPoolExecutor], texts: List[str]) -> np.ndarray:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if executor is None:
+            return np.vstack([_encode_batch(batch) for batch in batches])
+        return np.vstack(list(executor.map(_encode_batch, batches)))
+
+    def embed(self, input_dir: str) -> Dict:
+        checkpoint = self.load_checkpoint()
+        if checkpoint["done"]:
+            logger.info("Embedding stage already complete, nothing to do")
+            return checkpoint
+
+        if not checkpoint["shards"]:
+            self._clear_shards()
+
+        chunks: Iterator[Chunk] = iter_chunks(iter_source_pages(input_dir), self.doc_type, self.chunk_size, self.overlap)
+        chunks = itertools.islice(chunks, checkpoint["chunks"], None)
+        if checkpoint["chunks"]:
+            logger.info(f"Resuming after {checkpoint['chunks']} chunks ({checkpoint['shards']} shards)")
+
+        executor = None
+        if self.workers > 0:
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads_per_worker)
+            )
+        else:
+            _init_worker(self.model_name, self.threads_per_worker)
+
+        try:
+            while True:
+                shard = list(itertools.islice(chunks, self.shard_size))
+                if not shard:
+                    break
+                vectors = self._embed(executor, [c.text for c in shard])
+                self._write_shard(checkpoint["shards"], shard, vectors)
+                checkpoint["shards"] += 1
+                checkpoint["chunks"] += len(shard)
+                self._save_checkpoint(checkpoint)
+                logger.info(f"Shard {checkpoint['shards']} written ({checkpoint['chunks']} chunks total)")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        checkpoint["done"] = True
+        self._save_checkpoint(checkpoint)
+        return checkpoint
+
+    def _iter_shards(self, count: int) -> Iterator:
+        # Chỉ các shard checkpoint ghi nhận; file số lớn hơn là rác của lần chạy khác
+        for shard_no in range(count):
+            base = self._shard_base(shard_no)
+            with open(base + ".pkl", "rb") as f:
+                yield np.load(base + ".npy"), pickle.load(f)
+
+    def finalize(
+        self,
+        index_path: str = Config.INDEX_PATH,
+        metadata_path: str = Config.METADATA_PATH,
+        summarized_path: str = Config.SUMMARIZED_METADATA_PATH,
+        bm25_path: str = Config.BM25_PATH
+    ) -> int:
+        checkpoint = self.load_checkpoint()
+        if not checkpoint["done"]:
+            raise RuntimeError("Embedding stage is not complete; run embed() first")
+
+        metadata = {"ids": [], "metadata": [], "texts": []}
+        faiss_index = None
+        for vectors, shard_meta in self._iter_shards(checkpoint["shards"]):
+            if faiss_index is None:
+                faiss_index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            start = len(metadata["ids"])
+            faiss_index.add_with_ids(vectors, np.arange(start, start + len(vectors), dtype=np.int64))
+            for key in metadata:
+                metadata[key].extend(shard_meta[key])
+        if faiss_index is None:
+            raise RuntimeError(f"No shards found in {self.work_dir}")
+
+        summarized = {
+            "ids": list(metadata["ids"]),
+            "metadata": [dict(m) for m in metadata["metadata"]],
+            "texts": [lead_summary(text) for text in metadata["texts"]],
+        }
+        # Ghi model vào artifact để CollectionRegistry không phải đoán
+        metadata["embedding_model"] = summarized["embedding_model"] = self.model_name
+
+        tokenizer = get_tokenizer()
+        bm25_indices = {
+            "banan": IncrementalBM25(tokenizer.tokenize_many(metadata["texts"])),
+            "banan_sum": IncrementalBM25(tokenizer.tokenize_many(summarized["texts"])),
+        }
+
+        tmp_path = index_path + ".tmp"
+        faiss.write_index(faiss_index, tmp_path)
+        os.replace(tmp_path, index_path)
+        metadata_repo = MetadataRepository()
+        metadata_repo.save_metadata(metadata_path, metadata)
+        metadata_repo.save_metadata(summarized_path, summarized)
+        save_bm25_bundle(bm25_path, bm25_indices, tokenizer, {"banan": metadata["texts"], "banan_sum": summarized["texts"]})
+
+        logger.info(f"Corpus finalized: {faiss_index.ntotal} chunks -> {index_path}")
+        return faiss_index.ntotal
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md", ".jsonl")
+
+
+@dataclass
+class SourcePage:
+    """One page (or record) of a source document, before chunking."""
+    source: str
+    page: int
+    text: str
+    metadata: Dict = field(default_factory=dict)
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    metadata: Dict
+
+
+def _iter_pdf(path: str, source: str) -> Iterator[SourcePage]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("pypdf is required to read PDF sources (pip install pypdf)")
+    reader = PdfReader(path)
+    for page_no, page in enumerate(reader.pages):
+        text = page.extract_text() or ""
+        if text.strip():
+            yield SourcePage(source=source, page=page_no, text=text)
+
+
+def _iter_jsonl(path: str, source: str) -> Iterator[SourcePage]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield SourcePage(
+                source=record.get("source", source),
+                page=record.get("page", line_no),
+                text=record.get("text", ""),
+                metadata=record.get("metadata", {})
+            )
+
+
+def iter_source_pages(input_dir: str) -> Iterator[SourcePage]:
+    """Stream pages from every supported file under ``input_dir`` in a stable order."""
+    paths: List[str] = []
+    for root, _, files in os.walk(input_dir):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(SUPPORTED_EXTENSIONS))
+
+    for path in sorted(paths):
+        source = os.path.relpath(path, input_dir)
+        ext = os.path.splitext(path)[1].lower()
+        try:
+            if ext == ".pdf":
+                yield from _iter_pdf(path, source)
+            elif ext == ".jsonl":
+                yield from _iter_jsonl(path, source)
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    yield SourcePage(source=source, page=0, text=f.read())
+        except RuntimeError:
+            raise
+        except Exception as e:
+            logger.warning(f"Skipping unreadable source {path}: {e}")
+
+
+def split_text(text: str, chunk_size: int = 1000, overlap: int = 150) -> List[str]:
+    """Split on paragraph/sentence/word boundaries into chunks of at most ``chunk_size`` chars."""
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for separator in ("\n\n", "\n", ". ", " "):
+                cut = window.rfind(separator)
+                if cut > chunk_size // 2:
+                    end = start + cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def iter_chunks(
+    pages: Iterator[SourcePage],
+    doc_type: str,
+    chunk_size: int = 1000,
+    overlap: int = 150
+) -> Iterator[Chunk]:
+    """Deterministically number chunks so an interrupted build can skip what it already wrote."""
+    counter = 0
+    for page in pages:
+        for text in split_text(page.text, chunk_size, overlap):
+            counter += 1
+            metadata = {"source": page.source, "page": page.page, "type": doc_type, **page.metadata}
+            yield Chunk(id=f"{doc_type}_{counter}", text=text, metadata=metadata)
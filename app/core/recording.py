@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import random
+import time
+from typing import Dict, List, Optional
+from .metrics import current_timings
+from ..config.logging_config import ProcessFileHandler, start_queue_listener
+from ..config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RequestRecorder:
+    """
+    Append sampled requests as JSONL for later replay.
+
+    Records go through a QueueHandler, so the request thread only enqueues;
+    a background listener writes them to a size-rotated ``<path>.<pid>`` file.
+    """
+
+    def __init__(
+        self,
+        path: str = Config.RECORD_PATH,
+        sample_rate: float = Config.RECORD_SAMPLE_RATE,
+        max_bytes: int = Config.RECORD_MAX_BYTES,
+        backup_count: int = Config.RECORD_BACKUP_COUNT
+    ):
+        self.sample_rate = sample_rate
+        self._logger = logging.getLogger("plant.recorder")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if sample_rate <= 0 or self._logger.handlers:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = ProcessFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(start_queue_listener(file_handler))
+        logger.info(f"Recording {sample_rate:.0%} of requests to {path}.<pid>")
+
+    def should_record(self) -> bool:
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def record(
+        self,
+        endpoint: str,
+        question: str,
+        strategy: str,
+        k: int,
+        doc_type: str,
+        retrieved_ids: List[str],
+        status: int = 200,
+        extra: Optional[Dict] = None
+    ) -> None:
+        if not self.should_record():
+            return
+        timings = current_timings()
+        entry = {
+            "ts": time.time(),
+            "endpoint": endpoint,
+            "question": question,
+            "strategy": strategy,
+            "k": k,
+            "doc_type": doc_type,
+            "retrieved_ids": retrieved_ids,
+            "status": status,
+            "timings_ms": timings.as_dict() if timings else {},
+            "models": list(timings.models_used) if timings else [],
+            "total_ms": round((time.perf_counter() - timings.start) * 1000, 3) if timings else None,
+        }
+        if extra:
+            entry.update(extra)
+        self._logger.info(json.dumps(entry, ensure_ascii=False))
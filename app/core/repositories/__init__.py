@@ -1,4 +1,5 @@
 from .index_repository import IndexRepository
 from .metadata_repository import MetadataRepository
+from .catalogue_repository import CatalogueRepository
 
-__all__ = ["IndexRepository", "MetadataRepository"]
\ No newline at end of file
+__all__ = ["IndexRepository", "MetadataRepository", "CatalogueRepository"]
\ No newline at end of file
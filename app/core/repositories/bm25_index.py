@@ -0,0 +1,112 @@
+import copy
+import hashlib
+import logging
+import os
+import pickle
+from typing import Dict, Iterable, List, Optional
+from rank_bm25 import BM25Okapi
+from ..filesystem import atomic_path
+from ..text.tokenizer import indexed_length
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalBM25(BM25Okapi):
+    """BM25Okapi that can append documents without re-tokenizing the corpus.
+
+    rank_bm25 does not keep the per-term document counts after construction,
+    so they are rebuilt from ``doc_freqs`` on the first append and kept up to
+    date afterwards; IDF is then recomputed from those counts. Document lengths
+    leave out the tokenizer's folded field.
+    """
+
+    def __init__(self, corpus: List[List[str]], **kwargs):
+        super().__init__(corpus, **kwargs)
+        self._nd: Optional[Dict[str, int]] = None
+
+    def _initialize(self, corpus):
+        corpus = list(corpus)
+        nd = super()._initialize(corpus)
+        self.doc_len = [indexed_length(doc) for doc in corpus]
+        self.avgdl = sum(self.doc_len) / self.corpus_size
+        return nd
+
+    def copy(self) -> "IncrementalBM25":
+        """Copy that can be appended to without touching this index (the per-document dicts are shared)."""
+        clone = copy.copy(self)
+        clone.doc_freqs = list(self.doc_freqs)
+        clone.doc_len = list(self.doc_len)
+        clone.idf = dict(self.idf)
+        clone._nd = dict(self._nd) if self._nd is not None else None
+        return clone
+
+    def _document_counts(self) -> Dict[str, int]:
+        if self._nd is None:
+            nd: Dict[str, int] = {}
+            for freqs in self.doc_freqs:
+                for word in freqs:
+                    nd[word] = nd.get(word, 0) + 1
+            self._nd = nd
+        return self._nd
+
+    def add_documents(self, tokenized_docs: Iterable[List[str]]) -> None:
+        nd = self._document_counts()
+        for doc in tokenized_docs:
+            freqs: Dict[str, int] = {}
+            for word in doc:
+                freqs[word] = freqs.get(word, 0) + 1
+            self.doc_freqs.append(freqs)
+            self.doc_len.append(indexed_length(doc))
+            for word in freqs:
+                nd[word] = nd.get(word, 0) + 1
+            self.corpus_size += 1
+
+        self.avgdl = sum(self.doc_len) / self.corpus_size
+        self.idf = {}
+        self._calc_idf(nd)
+
+
+def corpus_fingerprint(texts: List[str]) -> str:
+    """Content hash of a corpus: catches edited texts that keep the document count."""
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def save_bm25_bundle(path: str, indices: Dict[str, IncrementalBM25], tokenizer, corpora: Dict[str, List[str]]) -> None:
+    """Pickle BM25 indices with the tokenizer settings and the texts' fingerprints they were built from."""
+    bundle = {
+        "signature": tokenizer.signature(),
+        "doc_counts": {name: bm25.corpus_size for name, bm25 in indices.items()},
+        "fingerprints": {name: corpus_fingerprint(corpora[name]) for name in indices},
+        "indices": indices,
+    }
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+    logger.info(f"BM25 bundle saved to {path}")
+
+
+def load_bm25_bundle(path: str, tokenizer, corpora: Dict[str, List[str]]) -> Optional[Dict[str, IncrementalBM25]]:
+    """Load a BM25 bundle, or return None if missing or stale (tokenizer or corpus texts changed)."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            bundle = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load BM25 bundle {path}: {e}")
+        return None
+    doc_counts = {name: len(texts) for name, texts in corpora.items()}
+    if (
+        bundle.get("signature") != tokenizer.signature()
+        or bundle.get("doc_counts") != doc_counts
+        # Đếm khớp mới cần băm: bundle cũ không có fingerprint cũng bị build lại
+        or bundle.get("fingerprints") != {name: corpus_fingerprint(texts) for name, texts in corpora.items()}
+    ):
+        logger.info(f"BM25 bundle {path} is stale, rebuilding")
+        return None
+    logger.info(f"BM25 bundle loaded from {path}")
+    return bundle["indices"]
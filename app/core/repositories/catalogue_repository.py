@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional
+from ..text.vietnamese import simple_tokens
+from ...config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Trọng số theo trường: tên bệnh quan trọng hơn mô tả
+FIELD_WEIGHTS = {
+    "common_name": 3.0,
+    "scientific_name": 2.5,
+    "host": 1.5,
+    "description": 1.0,
+}
+
+
+class PrefixTrie:
+    """Character trie over folded tokens, used for type-ahead expansion."""
+    _END = "$"
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def insert(self, token: str) -> None:
+        node = self.root
+        for ch in token:
+            node = node.setdefault(ch, {})
+        node[self._END] = token
+
+    def complete(self, prefix: str, limit: int = 50) -> List[str]:
+        """Return up to ``limit`` tokens starting with ``prefix`` (shortest first)."""
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+
+        results = []
+        queue = [node]
+        while queue and len(results) < limit:
+            next_queue = []
+            for current in queue:
+                for ch, child in current.items():
+                    if ch == self._END:
+                        results.append(child)
+                    else:
+                        next_queue.append(child)
+            queue = next_queue
+        return results[:limit]
+
+
+class CatalogueRepository:
+    _instance = None
+
+    def __new__(cls, path: Optional[str] = None):
+        if cls._instance is None:
+            cls._instance = super(CatalogueRepository, cls).__new__(cls)
+            cls._instance._initialize(path or Config.CATALOGUE_PATH)
+        return cls._instance
+
+    def _initialize(self, path: str):
+        self.entries: List[Dict] = []
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.trie = PrefixTrie()
+        self.folded_names: List[str] = []
+
+        if not os.path.exists(path):
+            logger.warning(f"Catalogue file not found: {path}, search index is empty")
+            return
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entries = data.get("data", []) if isinstance(data, dict) else data
+        self.build(entries)
+        logger.info(f"Catalogue index built: {len(self.entries)} diseases, {len(self.postings)} tokens")
+
+    @staticmethod
+    def _field_texts(entry: Dict) -> Dict[str, str]:
+        names = [entry.get("common_name") or ""] + list(entry.get("other_name") or [])
+        descriptions = [
+            d.get("description", "") if isinstance(d, dict) else str(d)
+            for d in entry.get("description") or []
+        ]
+        return {
+            "common_name": " ".join(names),
+            "scientific_name": entry.get("scientific_name") or "",
+            "host": " ".join(entry.get("host") or []),
+            "description": " ".join(descriptions),
+        }
+
+    def build(self, entries: List[Dict]) -> None:
+        self.entries = list(entries)
+        self.postings = defaultdict(dict)
+        self.trie = PrefixTrie()
+        self.folded_names = []
+
+        for doc_idx, entry in enumerate(self.entries):
+            fields = self._field_texts(entry)
+            self.folded_names.append(" ".join(simple_tokens(entry.get("common_name") or "")))
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for token in simple_tokens(text):
+                    doc_postings = self.postings[token]
+                    doc_postings[doc_idx] = doc_postings.get(doc_idx, 0.0) + weight
+
+        for token in self.postings:
+            self.trie.insert(token)
+
+    def get_entry(self, doc_idx: int) -> Dict:
+        return self.entries[doc_idx]
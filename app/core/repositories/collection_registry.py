@@ -0,0 +1,318 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+import faiss
+import numpy as np
+from .bm25_index import IncrementalBM25, load_bm25_bundle, save_bm25_bundle
+from .metadata_repository import MetadataRepository
+from ..metrics import COLLECTION_EVENTS, COLLECTION_MEMORY_BYTES
+from ..text.tokenizer import get_tokenizer
+from ...config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Collection mặc định do IndexRepository phục vụ (ghi được, không bao giờ bị giải phóng)
+DEFAULT_COLLECTIONS = ("banan", "banan_sum")
+
+# Model embedding dùng chung giữa các collection, nạp lần đầu khi cần
+_models: Dict[str, object] = {}
+_model_bytes: Dict[str, int] = {}  # 0 cho model IndexRepository đã giữ sẵn
+_models_lock = threading.Lock()
+
+
+def _model_memory(model) -> int:
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    except AttributeError:
+        return 0
+
+
+def load_embedding_model(name: str):
+    with _models_lock:
+        model = _models.get(name)
+        if model is None:
+            from .index_repository import IndexRepository
+            if name == Config.EMBEDDING_MODEL and IndexRepository._instance is not None:
+                model = IndexRepository._instance.get_embeddings()
+                _model_bytes[name] = 0
+            else:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(name)
+                _model_bytes[name] = _model_memory(model)
+            _models[name] = model
+        return model
+
+
+def release_embedding_model(name: str) -> int:
+    """Drop the registry's reference to a model; returns the bytes it accounted for."""
+    with _models_lock:
+        _models.pop(name, None)
+        return _model_bytes.pop(name, 0)
+
+
+def embedding_model_bytes(name: str) -> int:
+    return _model_bytes.get(name, 0)
+
+
+class CollectionUnavailable(ValueError):
+    """The collection is registered but failed to load; it is no longer offered."""
+
+
+@dataclass
+class CollectionSpec:
+    """Artifacts of one named collection, as declared in ``Config.COLLECTIONS_PATH``."""
+    name: str
+    index_path: str
+    metadata_path: str
+    bm25_path: str = ""
+    embedding_model: str = ""  # rỗng: dùng model ghi trong metadata, không có thì từ chối phục vụ
+    doc_type: str = ""  # giá trị metadata "type" được phục vụ, mặc định là tên collection
+
+    def __post_init__(self):
+        self.doc_type = self.doc_type or self.name
+
+
+class Collection:
+    """
+    A read-only corpus (FAISS + metadata + BM25) loaded from a CollectionSpec.
+
+    Exposes the read side of IndexRepository, so the FAISS, BM25 and hybrid
+    handlers work on it unchanged. The embedding model comes from the
+    ``embedding_model`` recorded in the metadata pickle or from the spec;
+    a collection with neither is refused rather than embedded with a guess.
+    """
+
+    def __init__(self, spec: CollectionSpec):
+        self.spec = spec
+        self.metadata = MetadataRepository().load_metadata(spec.metadata_path)
+        self.model_name = self._resolve_model()
+        self.embeddings = load_embedding_model(self.model_name)
+        for meta in self.metadata["metadata"]:
+            if meta.get("type") == "banan" and spec.doc_type != "banan":
+                # normalize_entry gán "banan" cho bản ghi thiếu type
+                meta["type"] = spec.doc_type
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self.metadata["ids"])}
+
+        index = faiss.read_index(spec.index_path)
+        dim = self.embeddings.get_sentence_embedding_dimension()
+        if index.d != dim:
+            raise ValueError(f"Collection {spec.name}: index dimension {index.d} != {self.model_name} dimension {dim}")
+        if index.ntotal != len(self.metadata["ids"]):
+            raise ValueError(f"Collection {spec.name}: {index.ntotal} vectors but {len(self.metadata['ids'])} metadata rows")
+        self.faiss_index = index
+
+        tokenizer = get_tokenizer()
+        corpora = {spec.name: self.metadata["texts"]}
+        bundle = load_bm25_bundle(spec.bm25_path, tokenizer, corpora)
+        if bundle:
+            self.bm25 = bundle[spec.name]
+        else:
+            self.bm25 = IncrementalBM25(tokenizer.tokenize_many(self.metadata["texts"]))
+            if spec.bm25_path:
+                save_bm25_bundle(spec.bm25_path, {spec.name: self.bm25}, tokenizer, corpora)
+
+        stamp = "|".join(
+            f"{path}:{os.stat(path).st_mtime_ns}" for path in (spec.index_path, spec.metadata_path) if os.path.exists(path)
+        )
+        self.version = hashlib.sha1(f"{spec.name}#{stamp}".encode("utf-8")).hexdigest()[:16]
+        self.memory_bytes = self._estimate_memory()
+
+    def _resolve_model(self) -> str:
+        recorded = self.metadata.get("embedding_model")
+        if recorded and self.spec.embedding_model and recorded != self.spec.embedding_model:
+            raise ValueError(
+                f"Collection {self.spec.name}: built with {recorded}, but the registry declares {self.spec.embedding_model}"
+            )
+        model = recorded or self.spec.embedding_model
+        if not model:
+            raise ValueError(
+                f"Collection {self.spec.name}: embedding model unknown; record it in {self.spec.metadata_path} "
+                f"(\"embedding_model\") or set embedding_model in {Config.COLLECTIONS_PATH} once confirmed"
+            )
+        return model
+
+    def _estimate_memory(self) -> int:
+        # Ước lượng: vector float32 + văn bản + postings BM25 (~100 byte mỗi cặp term/tài liệu)
+        vectors = self.faiss_index.ntotal * self.faiss_index.d * 4
+        texts = sum(len(text.encode("utf-8")) for text in self.metadata["texts"])
+        postings = sum(len(freqs) for freqs in self.bm25.doc_freqs)
+        return vectors + texts + postings * 100
+
+    def get_embeddings(self):
+        return self.embeddings
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.ascontiguousarray(self.embeddings.encode(texts, convert_to_numpy=True), dtype=np.float32)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        return self.encode([query])
+
+    def get_faiss_index(self, doc_type: str):
+        return self.faiss_index
+
+    def get_bm25_index(self, doc_type: str):
+        return self.bm25
+
+    def get_metadata(self, doc_type: str):
+        return self.metadata
+
+    def get_deleted_rows(self) -> Set[int]:
+        return set()
+
+    def get_version(self) -> str:
+        return self.version
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        return self._row_by_id.get(doc_id)
+
+    def get_vectors(self, rows: List[int]) -> np.ndarray:
+        return self.faiss_index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+
+class CollectionRegistry:
+    """
+    Named collections loaded on first use and kept in LRU order.
+
+    Loaded collections are evicted least-recently-used first once their
+    estimated size, plus the embedding models only they use, exceeds
+    ``Config.COLLECTION_MEMORY_MB``, and any collection idle for
+    ``Config.COLLECTION_IDLE_SECONDS`` is dropped on the next query. A model
+    is unloaded with the last collection using it. The default
+    "banan"/"banan_sum" collections stay with IndexRepository. A collection
+    that fails to load is remembered as failed and dropped from ``names()``
+    until the process restarts.
+    """
+    _instance = None
+
+    def __new__(cls, path: Optional[str] = None):
+        if cls._instance is None:
+            cls._instance = super(CollectionRegistry, cls).__new__(cls)
+            cls._instance._initialize(path or Config.COLLECTIONS_PATH)
+        return cls._instance
+
+    def _initialize(self, path: str):
+        self.specs: Dict[str, CollectionSpec] = {}
+        self.memory_limit = Config.COLLECTION_MEMORY_MB * 1024 * 1024
+        self.idle_seconds = Config.COLLECTION_IDLE_SECONDS
+        self._loaded: "OrderedDict[str, Collection]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._failed: Dict[str, str] = {}  # tên -> lỗi khi nạp, không thử lại
+
+        if not os.path.exists(path):
+            logger.info(f"No collection registry at {path}, serving the default collections only")
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                self.register(CollectionSpec(**entry))
+        logger.info(f"Collection registry: {sorted(self.specs)}")
+
+    def register(self, spec: CollectionSpec) -> None:
+        if spec.name in DEFAULT_COLLECTIONS:
+            raise ValueError(f"Collection name is reserved: {spec.name}")
+        with self._lock:
+            self.specs[spec.name] = spec
+            self._load_locks.setdefault(spec.name, threading.Lock())
+
+    def has(self, name: str) -> bool:
+        return name in self.specs
+
+    def names(self) -> List[str]:
+        """Collections that can be queried: the defaults plus registered ones that have not failed to load."""
+        return list(DEFAULT_COLLECTIONS) + sorted(name for name in self.specs if name not in self._failed)
+
+    def failed(self) -> Dict[str, str]:
+        return dict(self._failed)
+
+    def loaded(self) -> Dict[str, int]:
+        """Estimated bytes per loaded collection, least recently used first."""
+        with self._lock:
+            return {name: collection.memory_bytes for name, collection in self._loaded.items()}
+
+    def _total_bytes(self) -> int:
+        models = {collection.model_name for collection in self._loaded.values()}
+        return sum(c.memory_bytes for c in self._loaded.values()) + sum(embedding_model_bytes(m) for m in models)
+
+    def get(self, name: str) -> Collection:
+        """
+        Return the collection, loading it (once, even under concurrency) if needed.
+
+        Raises CollectionUnavailable if it failed to load, now or earlier.
+        """
+        spec = self.specs[name]
+        if name in self._failed:
+            raise CollectionUnavailable(self._failed[name])
+        self.evict_idle()
+        with self._lock:
+            collection = self._touch(name)
+        if collection is not None:
+            return collection
+
+        with self._load_locks[name]:
+            with self._lock:
+                collection = self._touch(name)
+            if collection is not None:
+                return collection
+            if name in self._failed:
+                raise CollectionUnavailable(self._failed[name])
+            start = time.perf_counter()
+            try:
+                collection = Collection(spec)
+            except Exception as e:
+                # Ghi nhớ lỗi: không đọc lại pickle/index cho mỗi request
+                self._failed[name] = f"Collection {name} is unavailable: {e}"
+                COLLECTION_EVENTS.labels(collection=name, event="load_failed").inc()
+                logger.error(f"Collection {name} failed to load, no longer offered: {e}")
+                raise CollectionUnavailable(self._failed[name]) from e
+            logger.info(
+                f"Collection {name} loaded in {time.perf_counter() - start:.1f}s "
+                f"({collection.faiss_index.ntotal} documents, ~{collection.memory_bytes // (1024 * 1024)} MB, "
+                f"model {collection.model_name} ~{embedding_model_bytes(collection.model_name) // (1024 * 1024)} MB)"
+            )
+            COLLECTION_EVENTS.labels(collection=name, event="load").inc()
+            with self._lock:
+                self._loaded[name] = collection
+                self._touch(name)
+                self._evict_over_limit(keep=name)
+        return collection
+
+    def _touch(self, name: str) -> Optional[Collection]:
+        collection = self._loaded.get(name)
+        if collection is not None:
+            self._loaded.move_to_end(name)
+            self._last_used[name] = time.monotonic()
+        return collection
+
+    def _evict(self, name: str, reason: str) -> None:
+        # Truy vấn đang chạy vẫn giữ tham chiếu nên kết thúc bình thường
+        collection = self._loaded.pop(name)
+        self._last_used.pop(name, None)
+        freed = collection.memory_bytes
+        if all(c.model_name != collection.model_name for c in self._loaded.values()):
+            freed += release_embedding_model(collection.model_name)
+        COLLECTION_EVENTS.labels(collection=name, event=f"evict_{reason}").inc()
+        COLLECTION_MEMORY_BYTES.set(self._total_bytes())
+        logger.info(f"Collection {name} evicted ({reason}), freed ~{freed // (1024 * 1024)} MB")
+
+    def evict_idle(self) -> None:
+        if self.idle_seconds <= 0 or not self._loaded:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for name in [n for n, used in self._last_used.items() if now - used > self.idle_seconds]:
+                self._evict(name, "idle")
+
+    def _evict_over_limit(self, keep: str) -> None:
+        for name in list(self._loaded):
+            if self._total_bytes() <= self.memory_limit or self.memory_limit <= 0:
+                break
+            if name != keep:
+                self._evict(name, "memory")
+        COLLECTION_MEMORY_BYTES.set(self._total_bytes())
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from ..filesystem import atomic_path
+from ...config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Bố cục một bundle: <bundle_dir>/<version>/{index.faiss, metadata.pkl, ...}
+# và file CURRENT chứa tên version đang phục vụ (ghi nguyên tử)
+INDEX_FILE = "index.faiss"
+METADATA_FILE = "metadata.pkl"
+SUMMARIZED_FILE = "summarized_metadata.pkl"
+BM25_FILE = "bm25.pkl"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+@dataclass
+class BundlePaths:
+    """Artifact paths of one index version; ``version`` is empty for the flat files in Config."""
+    version: str
+    index_path: str
+    metadata_path: str
+    summarized_path: str
+    bm25_path: str
+
+    def artifacts(self) -> Tuple[str, str, str, str]:
+        return self.index_path, self.metadata_path, self.summarized_path, self.bm25_path
+
+
+def _read_current(bundle_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(bundle_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def resolve_bundle(bundle_dir: Optional[str] = None) -> BundlePaths:
+    """Paths of the bundle CURRENT points to, or the flat Config paths if there is none."""
+    bundle_dir = Config.INDEX_BUNDLE_DIR if bundle_dir is None else bundle_dir
+    version = _read_current(bundle_dir) if bundle_dir else None
+    if version is None:
+        return BundlePaths("", Config.INDEX_PATH, Config.METADATA_PATH, Config.SUMMARIZED_METADATA_PATH, Config.BM25_PATH)
+    return bundle_paths(bundle_dir, version)
+
+
+def bundle_paths(bundle_dir: str, version: str) -> BundlePaths:
+    root = os.path.join(bundle_dir, version)
+    return BundlePaths(
+        version,
+        os.path.join(root, INDEX_FILE),
+        os.path.join(root, METADATA_FILE),
+        os.path.join(root, SUMMARIZED_FILE),
+        os.path.join(root, BM25_FILE)
+    )
+
+
+def read_manifest(paths: BundlePaths) -> Dict:
+    if not paths.version:
+        return {}
+    with open(os.path.join(os.path.dirname(paths.index_path), MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_bundle(paths: BundlePaths) -> None:
+    """Raise ValueError if a bundle file is missing or differs from the sha1 in its manifest."""
+    if not paths.version:
+        return
+    root = os.path.dirname(paths.index_path)
+    for name, expected in read_manifest(paths).get("files", {}).items():
+        path = os.path.join(root, name)
+        if not os.path.exists(path):
+            raise ValueError(f"Bundle {paths.version}: {name} is missing")
+        if _sha1(path) != expected:
+            raise ValueError(f"Bundle {paths.version}: {name} does not match its manifest checksum")
+
+
+def publish_bundle(
+    bundle_dir: str,
+    index_path: str,
+    metadata_path: str,
+    summarized_path: str,
+    bm25_path: Optional[str] = None,
+    version: Optional[str] = None,
+    keep: int = 3,
+    embedding_model: str = Config.EMBEDDING_MODEL,
+    move: bool = False
+) -> str:
+    """
+    Copy the artifacts into a new versioned bundle, then point CURRENT at it.
+
+    Workers watching ``bundle_dir`` pick it up on their next poll. Older
+    bundles beyond the newest ``keep`` are removed. ``move`` renames the
+    artifacts in instead of copying them (same filesystem only).
+    """
+    # Hậu tố ngẫu nhiên: hai lần publish trong cùng một giây không đụng nhau
+    version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    target = os.path.join(bundle_dir, version)
+    if os.path.exists(target):
+        raise ValueError(f"Bundle already exists: {target}")
+    os.makedirs(bundle_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=bundle_dir, prefix=f".{version}.", suffix=".tmp")
+
+    sources = {INDEX_FILE: index_path, METADATA_FILE: metadata_path, SUMMARIZED_FILE: summarized_path}
+    if bm25_path and os.path.exists(bm25_path):
+        sources[BM25_FILE] = bm25_path
+    try:
+        for name, source in sources.items():
+            if move:
+                os.replace(source, os.path.join(staging, name))
+            else:
+                shutil.copyfile(source, os.path.join(staging, name))
+        manifest = {
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "embedding_model": embedding_model,
+            "files": {name: _sha1(os.path.join(staging, name)) for name in sources},
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.chmod(staging, 0o755)  # mkdtemp tạo thư mục 0700
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Đổi CURRENT sau cùng: worker không bao giờ thấy bundle ghi dở
+    with atomic_path(os.path.join(bundle_dir, CURRENT_FILE)) as current_tmp:
+        with open(current_tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+    logger.info(f"Published index bundle {version} to {bundle_dir}")
+
+    for old in list_bundles(bundle_dir)[:-keep] if keep > 0 else []:
+        if old != version:
+            shutil.rmtree(os.path.join(bundle_dir, old), ignore_errors=True)
+    return version
+
+
+def list_bundles(bundle_dir: str) -> List[str]:
+    """Published bundle versions, oldest first."""
+    if not os.path.isdir(bundle_dir):
+        return []
+    versions = [
+        name for name in os.listdir(bundle_dir)
+        if os.path.isfile(os.path.join(bundle_dir, name, MANIFEST_FILE))
+    ]
+    return sorted(versions, key=lambda name: os.path.getmtime(os.path.join(bundle_dir, name, MANIFEST_FILE)))
@@ -1,14 +1,79 @@
 import faiss
+import gc
+import hashlib
 import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from rank_bm25 import BM25Okapi
-from nltk.tokenize import word_tokenize
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .bm25_index import IncrementalBM25, load_bm25_bundle, save_bm25_bundle
+from .index_bundle import BundlePaths, bundle_paths, publish_bundle, read_manifest, resolve_bundle, verify_bundle
 from .metadata_repository import MetadataRepository
+from ..filesystem import atomic_path, file_lock
+from ..metrics import INDEX_RELOADS
+from ..text.tokenizer import get_tokenizer
 from ...config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+# Phiên bản index mà truy vấn hiện tại đang dùng (xem IndexRepository.pinned)
+_pinned_state: ContextVar[Optional["IndexState"]] = ContextVar("pinned_index_state", default=None)
+
+
+class IndexState:
+    """
+    One loaded version of the corpus: FAISS, both metadata stores and both BM25 indices.
+
+    Never mutated once published: ingestion, deletion, compaction and reload
+    build a new one and swap the reference. ``in_flight`` counts queries pinned to it.
+    """
+
+    def __init__(self, paths: BundlePaths):
+        self.paths = paths
+        self.metadata_dict: Dict = {}
+        self.summarized_metadata_dict: Dict = {}
+        self.deleted_rows: Set[int] = set()
+        self.row_by_id: Dict[str, int] = {}
+        self.faiss_index = None
+        self.bm25_banan: Optional[IncrementalBM25] = None
+        self.bm25_banan_sum: Optional[IncrementalBM25] = None
+        self.generation = ""
+        self.artifact_stamp = ""
+        self.version = ""
+        self.in_flight = 0
+        self._idle = threading.Condition()
+
+    def update_version(self) -> None:
+        self.version = hashlib.sha1(f"{self.artifact_stamp}#{self.generation}".encode("utf-8")).hexdigest()[:16]
+
+    def bump_generation(self) -> None:
+        # Thay đổi trong bộ nhớ chưa ghi xuống đĩa: dùng token ngẫu nhiên để
+        # không trùng version với worker khác đang giữ bản gốc
+        self.generation = uuid.uuid4().hex
+        self.update_version()
+
+    def acquire(self) -> None:
+        with self._idle:
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._idle:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: self.in_flight == 0, timeout=timeout)
+
+
 class IndexRepository:
     _instance = None
     
@@ -19,39 +84,500 @@ class IndexRepository:
         return cls._instance
     
     def _initialize(self):
+        # Import trễ: chỉ process thực sự giữ index mới nạp torch
+        from sentence_transformers import SentenceTransformer
+
         Config().validate()  # Validate GEMINI_API_KEYS
-        self.embeddings = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Load FAISS index
-        self.faiss_index = faiss.read_index(Config.INDEX_PATH)
-        logger.info(f"FAISS index loaded: {self.faiss_index.ntotal} documents")
-        
-        # Load metadata
+        self.embeddings = SentenceTransformer(Config.EMBEDDING_MODEL)
+        self._write_lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._write_depth = 0  # số lớp writing() lồng nhau của thread đang giữ _write_lock
+        self._rejected_stamp = ""  # bundle đã nạp lỗi, watcher không thử lại cho tới khi nó đổi
+        # Embedding câu hỏi gần đây: FAISS và ngân hàng câu hỏi dùng chung một lần encode
+        self._query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_lock = threading.Lock()
         self.metadata_repo = MetadataRepository()
-        self.metadata_dict = self.metadata_repo.load_metadata(Config.METADATA_PATH)
-        self.summarized_metadata_dict = self.metadata_repo.load_metadata(Config.SUMMARIZED_METADATA_PATH)
+        self._state = self._load_state(resolve_bundle())
+
+    def _load_state(self, paths: BundlePaths) -> IndexState:
+        state = IndexState(paths)
+        # Load metadata
+        state.metadata_dict = self.metadata_repo.load_metadata(paths.metadata_path)
+        state.summarized_metadata_dict = self.metadata_repo.load_metadata(paths.summarized_path)
+        state.deleted_rows = set(state.metadata_dict.get("deleted", []))
+        state.row_by_id = {doc_id: row for row, doc_id in enumerate(state.metadata_dict["ids"])}
+        
+        # Load FAISS index (ID = vị trí dòng trong metadata)
+        state.faiss_index = self._ensure_id_map(faiss.read_index(paths.index_path), state.metadata_dict["texts"])
+        logger.info(f"FAISS index loaded: {state.faiss_index.ntotal} documents ({paths.version or paths.index_path})")
         
-        # Initialize BM25 indices
-        self.bm25_banan = BM25Okapi([word_tokenize(text.lower()) for text in self.metadata_dict["texts"]])
-        self.bm25_banan_sum = BM25Okapi([word_tokenize(text.lower()) for text in self.summarized_metadata_dict["texts"]])
+        # Initialize BM25 indices (dùng bundle đã build sẵn nếu còn khớp)
+        tokenizer = get_tokenizer()
+        corpora = {"banan": state.metadata_dict["texts"], "banan_sum": state.summarized_metadata_dict["texts"]}
+        bundle = load_bm25_bundle(paths.bm25_path, tokenizer, corpora)
+        if bundle:
+            state.bm25_banan, state.bm25_banan_sum = bundle["banan"], bundle["banan_sum"]
+        else:
+            state.bm25_banan = IncrementalBM25(tokenizer.tokenize_many(state.metadata_dict["texts"]))
+            state.bm25_banan_sum = IncrementalBM25(tokenizer.tokenize_many(state.summarized_metadata_dict["texts"]))
         logger.info("BM25 indices initialized")
+        state.artifact_stamp = self._read_artifact_stamp(paths)
+        state.update_version()
+        return state
+
+    def _validate_state(self, state: IndexState) -> None:
+        """Reject a bundle that does not match this process (or its manifest checksums) before it is swapped in."""
+        verify_bundle(state.paths)
+        ids = state.metadata_dict["ids"]
+        if state.faiss_index.ntotal != len(ids) or len(state.summarized_metadata_dict["ids"]) != len(ids):
+            raise ValueError(
+                f"Bundle out of sync: {state.faiss_index.ntotal} vectors, {len(ids)} metadata rows, "
+                f"{len(state.summarized_metadata_dict['ids'])} summarized rows"
+            )
+        dim = self.embeddings.get_sentence_embedding_dimension()
+        if state.faiss_index.d != dim:
+            raise ValueError(f"Bundle dimension {state.faiss_index.d} != embedding dimension {dim}")
+        model = read_manifest(state.paths).get("embedding_model", Config.EMBEDDING_MODEL)
+        if model != Config.EMBEDDING_MODEL:
+            raise ValueError(f"Bundle was built with {model}, this process embeds with {Config.EMBEDDING_MODEL}")
+
+    @staticmethod
+    def _read_artifact_stamp(paths: BundlePaths) -> str:
+        parts = [paths.version]
+        for path in paths.artifacts():
+            try:
+                st = os.stat(path)
+                parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+            except OSError:
+                parts.append(f"{path}:-")
+        return "|".join(parts)
+
+    def _ensure_id_map(self, index, texts: List[str]):
+        """Wrap a positional index in an IndexIDMap2 keyed by metadata row."""
+        if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            return index
+        try:
+            vectors = index.reconstruct_n(0, index.ntotal)
+        except RuntimeError:
+            # Index không hỗ trợ reconstruct (vd. IVF không có direct map): tính lại từ văn bản
+            logger.warning("FAISS index cannot reconstruct vectors, re-encoding corpus texts")
+            vectors = self.encode(texts)
+        return self._build_id_map(index.d, index.metric_type, vectors)
+
+    @staticmethod
+    def _build_id_map(dim: int, metric_type: int, vectors: np.ndarray):
+        id_map = faiss.IndexIDMap2(faiss.IndexFlat(dim, metric_type))
+        if len(vectors):
+            id_map.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+        return id_map
     
     def get_embeddings(self):
         return self.embeddings
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.ascontiguousarray(self.embeddings.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """Embed one query as a (1, dim) float32 array, memoized per query text."""
+        with self._query_lock:
+            vector = self._query_embeddings.get(query)
+            if vector is not None:
+                self._query_embeddings.move_to_end(query)
+                return vector
+        vector = self.encode([query])
+        with self._query_lock:
+            self._query_embeddings[query] = vector
+            while len(self._query_embeddings) > Config.QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return vector
     
+    def encode_queries(self, queries: List[str]) -> None:
+        """Embed every uncached query in one batch and add them to the query cache."""
+        with self._query_lock:
+            missing = list(dict.fromkeys(q for q in queries if q not in self._query_embeddings))
+        if not missing:
+            return
+        vectors = self.encode(missing)
+        with self._query_lock:
+            for query, vector in zip(missing, vectors):
+                self._query_embeddings[query] = vector[None, :]
+            while len(self._query_embeddings) > Config.QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+    
+    def _current(self) -> IndexState:
+        """The state pinned by the running query, else the latest one."""
+        return _pinned_state.get() or self._state
+
+    @contextmanager
+    def pinned(self) -> Iterator[IndexState]:
+        """
+        Pin the current index version for one query: every getter called inside
+        sees the same state even if a reload swaps it meanwhile. Nested pins reuse it.
+        """
+        state = _pinned_state.get()
+        if state is not None:
+            yield state
+            return
+        state = self._state
+        state.acquire()
+        token = _pinned_state.set(state)
+        try:
+            yield state
+        finally:
+            _pinned_state.reset(token)
+            state.release()
+
     def get_faiss_index(self, doc_type: str):
-        return self.faiss_index if doc_type == "banan_sum" else self.faiss_index
+        return self._current().faiss_index
     
     def get_bm25_index(self, doc_type: str):
+        state = self._current()
         if doc_type == "banan":
-            return self.bm25_banan
+            return state.bm25_banan
         elif doc_type == "banan_sum":
-            return self.bm25_banan_sum
-        return self.bm25_banan  # Default to banan if doc_type is unknown
+            return state.bm25_banan_sum
+        return state.bm25_banan  # Default to banan if doc_type is unknown
     
     def get_metadata(self, doc_type: str):
+        state = self._current()
         if doc_type == "banan":
-            return self.metadata_dict
+            return state.metadata_dict
         elif doc_type == "banan_sum":
-            return self.summarized_metadata_dict
-        return self.metadata_dict  # Default to metadata_dict if doc_type is unknown
\ No newline at end of file
+            return state.summarized_metadata_dict
+        return state.metadata_dict  # Default to metadata_dict if doc_type is unknown
+
+    def get_deleted_rows(self) -> Set[int]:
+        return self._current().deleted_rows
+
+    def get_version(self) -> str:
+        """Stamp that changes whenever FAISS, metadata or BM25 contents change."""
+        return self._current().version
+
+    def get_bundle_version(self) -> str:
+        """Published bundle version being served ("" for the flat files in Config)."""
+        return self._state.paths.version
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        return self._current().row_by_id.get(doc_id)
+
+    def get_vectors(self, rows: List[int]) -> np.ndarray:
+        """Stored FAISS vectors for the given metadata rows, as an (n, dim) float32 array."""
+        return self._current().faiss_index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+    def artifacts_changed(self) -> bool:
+        """True if CURRENT or the artifact files changed since the last load (or rejected load)."""
+        stamp = self._read_artifact_stamp(resolve_bundle())
+        return stamp != self._state.artifact_stamp and stamp != self._rejected_stamp
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the bundle CURRENT points to (or the changed flat files) and swap it in.
+
+        Queries keep running on the old state while the new one loads; after
+        the swap this waits up to ``Config.INDEX_DRAIN_TIMEOUT`` for queries
+        pinned to the old state before dropping it. Returns True if swapped.
+        Unpersisted ingestion would be lost, so it blocks a reload unless ``force``.
+        """
+        with self._reload_lock:
+            paths = resolve_bundle()
+            stamp = self._read_artifact_stamp(paths)
+            if not force and stamp in (self._state.artifact_stamp, self._rejected_stamp):
+                INDEX_RELOADS.labels(outcome="unchanged").inc()
+                return False
+            if self._state.generation and not force:
+                INDEX_RELOADS.labels(outcome="skipped_dirty").inc()
+                logger.warning("Index has unpersisted changes, not reloading")
+                return False
+
+            start = time.perf_counter()
+            try:
+                state = self._load_state(paths)
+                self._validate_state(state)
+            except Exception:
+                self._rejected_stamp = stamp
+                INDEX_RELOADS.labels(outcome="failed").inc()
+                raise
+            with self._write_lock:
+                if self._state.generation and not force:
+                    INDEX_RELOADS.labels(outcome="skipped_dirty").inc()
+                    logger.warning("Index changed while the new bundle was loading, discarding it")
+                    return False
+                old, self._state = self._state, state
+            INDEX_RELOADS.labels(outcome="swapped").inc()
+            logger.info(
+                f"Index swapped {old.version} -> {state.version} ({paths.version or 'flat files'}, "
+                f"{state.faiss_index.ntotal} documents) after {time.perf_counter() - start:.1f}s loading"
+            )
+
+        # Ngoài _reload_lock: lần reload kế tiếp không phải chờ bản cũ xả xong
+        if old.wait_idle(Config.INDEX_DRAIN_TIMEOUT):
+            logger.info(f"Index version {old.version} drained, releasing it")
+        else:
+            logger.warning(f"Index version {old.version} still has {old.in_flight} queries, releasing when they finish")
+        del old
+        gc.collect()
+        return True
+
+    @contextmanager
+    def writing(self) -> Iterator[IndexState]:
+        """
+        Serialize writers across threads and worker processes (``Config.INDEX_LOCK_PATH``).
+
+        On entry the newest artifacts on disk are loaded if another process
+        persisted since this one last did, so a write never starts from stale
+        data. Re-entrant: hold it around a mutation and its persist() so no
+        other process can write in between.
+        """
+        with self._write_lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield self._state
+                finally:
+                    self._write_depth -= 1
+                return
+            with file_lock(Config.INDEX_LOCK_PATH):
+                self._write_depth = 1
+                try:
+                    self._refresh()
+                    yield self._state
+                finally:
+                    self._write_depth = 0
+
+    def _refresh(self) -> None:
+        """Swap in the artifacts on disk if they changed since this process loaded or wrote them."""
+        paths = resolve_bundle()
+        if self._read_artifact_stamp(paths) == self._state.artifact_stamp:
+            return
+        if self._state.generation:
+            logger.warning("Index artifacts changed on disk while this process has unpersisted changes; persisting will overwrite them")
+            return
+        state = self._load_state(paths)
+        self._validate_state(state)
+        self._state = state
+        INDEX_RELOADS.labels(outcome="swapped").inc()
+        logger.info(f"Index refreshed from disk before writing ({paths.version or 'flat files'}, {state.faiss_index.ntotal} documents)")
+
+    @staticmethod
+    def _derive(state: IndexState) -> IndexState:
+        """New state sharing ``state``'s structures; writers replace what they change instead of mutating it."""
+        derived = IndexState(state.paths)
+        derived.metadata_dict = dict(state.metadata_dict)
+        derived.summarized_metadata_dict = dict(state.summarized_metadata_dict)
+        derived.deleted_rows = state.deleted_rows
+        derived.row_by_id = state.row_by_id
+        derived.faiss_index = state.faiss_index
+        derived.bm25_banan, derived.bm25_banan_sum = state.bm25_banan, state.bm25_banan_sum
+        derived.artifact_stamp = state.artifact_stamp
+        return derived
+
+    def is_reloading(self) -> bool:
+        return self._reload_lock.locked()
+
+    def shard_snapshot(self, num_shards: int) -> Tuple[str, List[Dict]]:
+        """
+        Partition the current FAISS vectors and BM25 term frequencies by
+        ``row % num_shards`` (row ids stay global), taken under the write lock
+        so every shard sees the same version.
+        """
+        with self._write_lock:
+            state = self._state
+            rows = faiss.vector_to_array(state.faiss_index.id_map).astype(np.int64)
+            vectors = state.faiss_index.index.reconstruct_n(0, state.faiss_index.ntotal)
+            bm25_indices = {"banan": state.bm25_banan, "banan_sum": state.bm25_banan_sum}
+            doc_lens = {name: np.asarray(bm25.doc_len) for name, bm25 in bm25_indices.items()}
+            payloads = []
+            for shard_id in range(num_shards):
+                mask = rows % num_shards == shard_id
+                bm25_parts = {}
+                for name, bm25 in bm25_indices.items():
+                    shard_rows = np.arange(shard_id, bm25.corpus_size, num_shards, dtype=np.int64)
+                    bm25_parts[name] = {
+                        "rows": shard_rows,
+                        "doc_freqs": [bm25.doc_freqs[row] for row in shard_rows],
+                        "doc_len": doc_lens[name][shard_rows],
+                    }
+                payloads.append({
+                    "shard_id": shard_id,
+                    "dim": state.faiss_index.d,
+                    "metric_type": state.faiss_index.metric_type,
+                    "faiss_rows": rows[mask],
+                    "vectors": np.ascontiguousarray(vectors[mask], dtype=np.float32),
+                    "bm25": bm25_parts,
+                    "deleted": [row for row in state.deleted_rows if row % num_shards == shard_id],
+                })
+            return state.version, payloads
+
+    def add_documents(self, documents: List[Dict], persist: bool = False) -> List[str]:
+        """
+        Append documents to FAISS, both metadata stores and both BM25 indices.
+
+        Each document is a dict with ``id``, ``text``, optional ``summary``
+        (defaults to ``text``) and optional ``metadata``. With ``persist`` the
+        result is written to disk before the cross-process lock is released.
+        """
+        if not documents:
+            return []
+        seen = set()
+        for doc in documents:
+            if not doc.get("id") or not doc.get("text"):
+                raise ValueError("Each document requires non-empty 'id' and 'text'")
+            if doc["id"] in seen:
+                raise ValueError(f"Duplicate document ID in batch: {doc['id']}")
+            seen.add(doc["id"])
+            if doc["id"] in self._state.row_by_id:
+                raise ValueError(f"Document ID already exists: {doc['id']}")
+
+        texts = [doc["text"] for doc in documents]
+        summaries = [doc.get("summary") or doc["text"] for doc in documents]
+        vectors = self.encode(texts)
+        tokenizer = get_tokenizer()
+
+        with self.writing() as state:
+            # Process khác hoặc compaction có thể đã đổi state trong lúc encode
+            for doc in documents:
+                if doc["id"] in state.row_by_id:
+                    raise ValueError(f"Document ID already exists: {doc['id']}")
+            start_row = len(state.metadata_dict["ids"])
+            added = self._derive(state)
+            row_by_id = dict(state.row_by_id)
+            for name in ("metadata_dict", "summarized_metadata_dict"):
+                source = getattr(state, name)
+                setattr(added, name, dict(source, ids=list(source["ids"]), metadata=list(source["metadata"]), texts=list(source["texts"])))
+            for doc, summary in zip(documents, summaries):
+                meta = dict(doc.get("metadata") or {})
+                meta.setdefault("type", "banan")
+                meta.setdefault("source", doc.get("source", "ingested"))
+                for target, text in ((added.metadata_dict, doc["text"]), (added.summarized_metadata_dict, summary)):
+                    target["ids"].append(doc["id"])
+                    target["metadata"].append(self.metadata_repo.normalize_entry(dict(meta)))
+                    target["texts"].append(text)
+                row_by_id[doc["id"]] = len(added.metadata_dict["ids"]) - 1
+            added.row_by_id = row_by_id
+
+            # Truy vấn đang ghim state cũ vẫn đọc bản FAISS/BM25 cũ
+            added.faiss_index = faiss.clone_index(state.faiss_index)
+            added.faiss_index.add_with_ids(vectors, np.arange(start_row, start_row + len(documents), dtype=np.int64))
+            added.bm25_banan, added.bm25_banan_sum = state.bm25_banan.copy(), state.bm25_banan_sum.copy()
+            added.bm25_banan.add_documents(tokenizer.tokenize_many(texts))
+            added.bm25_banan_sum.add_documents(tokenizer.tokenize_many(summaries))
+            added.bump_generation()
+            self._state = added
+            if persist:
+                self.persist()
+
+        logger.info(f"Ingested {len(documents)} documents, index now holds {added.faiss_index.ntotal}")
+        return [doc["id"] for doc in documents]
+
+    def delete_documents(self, doc_ids: Iterable[str], persist: bool = False) -> List[str]:
+        """Tombstone documents; they stay on disk until the next compaction."""
+        deleted = []
+        with self.writing() as state:
+            deleted_rows = set(state.deleted_rows)
+            for doc_id in doc_ids:
+                row = state.row_by_id.get(doc_id)
+                if row is not None and row not in deleted_rows:
+                    deleted_rows.add(row)
+                    deleted.append(doc_id)
+            if deleted:
+                tombstoned = self._derive(state)
+                tombstoned.deleted_rows = deleted_rows
+                tombstoned.metadata_dict["deleted"] = sorted(deleted_rows)
+                tombstoned.bump_generation()
+                self._state = tombstoned
+                if persist:
+                    self.persist()
+        if deleted:
+            logger.info(f"Tombstoned {len(deleted)} documents ({len(deleted_rows)} pending compaction)")
+        return deleted
+
+    def needs_compaction(self, ratio: Optional[float] = None) -> bool:
+        ratio = Config.COMPACTION_TOMBSTONE_RATIO if ratio is None else ratio
+        state = self._state
+        total = len(state.metadata_dict["ids"])
+        return bool(state.deleted_rows) and total > 0 and len(state.deleted_rows) / total >= ratio
+
+    def compact(self, persist: bool = False) -> int:
+        """
+        Physically drop tombstoned rows and renumber the FAISS ID map.
+
+        The result is built as a new IndexState and swapped in, so queries
+        pinned to the old one finish on consistent data.
+        """
+        with self.writing() as state:
+            if not state.deleted_rows:
+                return 0
+            removed = len(state.deleted_rows)
+            keep = [row for row in range(len(state.metadata_dict["ids"])) if row not in state.deleted_rows]
+
+            vectors = (
+                np.vstack([state.faiss_index.reconstruct(row) for row in keep]).astype(np.float32)
+                if keep else np.zeros((0, state.faiss_index.d), dtype=np.float32)
+            )
+            metadata_dict = {key: [state.metadata_dict[key][row] for row in keep] for key in ("ids", "metadata", "texts")}
+            summarized = {key: [state.summarized_metadata_dict[key][row] for row in keep] for key in ("ids", "metadata", "texts")}
+            metadata_dict["deleted"] = []
+
+            tokenizer = get_tokenizer()
+            faiss_index = self._build_id_map(state.faiss_index.d, state.faiss_index.metric_type, vectors)
+            bm25_banan = IncrementalBM25(tokenizer.tokenize_many(metadata_dict["texts"]))
+            bm25_banan_sum = IncrementalBM25(tokenizer.tokenize_many(summarized["texts"]))
+
+            compacted = IndexState(state.paths)
+            compacted.metadata_dict, compacted.summarized_metadata_dict = metadata_dict, summarized
+            compacted.faiss_index = faiss_index
+            compacted.bm25_banan, compacted.bm25_banan_sum = bm25_banan, bm25_banan_sum
+            compacted.row_by_id = {doc_id: row for row, doc_id in enumerate(metadata_dict["ids"])}
+            compacted.artifact_stamp = state.artifact_stamp
+            compacted.bump_generation()
+            self._state = compacted
+            if persist:
+                self.persist()
+
+        logger.info(f"Compaction removed {removed} documents, index now holds {faiss_index.ntotal}")
+        return removed
+
+    def _write_artifacts(self, state: IndexState, paths: BundlePaths) -> None:
+        with atomic_path(paths.index_path) as tmp_path:
+            faiss.write_index(state.faiss_index, tmp_path)
+        self.metadata_repo.save_metadata(paths.metadata_path, state.metadata_dict)
+        self.metadata_repo.save_metadata(paths.summarized_path, state.summarized_metadata_dict)
+        save_bm25_bundle(
+            paths.bm25_path,
+            {"banan": state.bm25_banan, "banan_sum": state.bm25_banan_sum},
+            get_tokenizer(),
+            {"banan": state.metadata_dict["texts"], "banan_sum": state.summarized_metadata_dict["texts"]}
+        )
+
+    def _publish(self, state: IndexState) -> BundlePaths:
+        # Bundle đã publish là bất biến: ghi vào thư mục tạm rồi publish version mới
+        bundle_dir = os.path.dirname(os.path.dirname(state.paths.index_path))
+        staging = tempfile.mkdtemp(dir=bundle_dir, prefix=".persist.", suffix=".tmp")
+        try:
+            staged = BundlePaths(
+                "", *(os.path.join(staging, os.path.basename(path)) for path in state.paths.artifacts())
+            )
+            self._write_artifacts(state, staged)
+            version = publish_bundle(bundle_dir, *staged.artifacts(), move=True)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return bundle_paths(bundle_dir, version)
+
+    def persist(self) -> None:
+        """
+        Write the FAISS index, both metadata pickles and BM25 to disk.
+
+        A published bundle is never rewritten: the state is published as a
+        new bundle and CURRENT moves to it. The flat files in Config are
+        replaced atomically one by one.
+        """
+        with self.writing() as state:
+            if state.paths.version:
+                state.paths = self._publish(state)
+            else:
+                self._write_artifacts(state, state.paths)
+            # Bộ nhớ giờ khớp với file trên đĩa: version chỉ còn phụ thuộc vào artifact
+            state.generation = ""
+            state.artifact_stamp = self._read_artifact_stamp(state.paths)
+            state.update_version()
+        logger.info(f"Index, metadata and BM25 persisted ({state.paths.version or 'flat files'})")
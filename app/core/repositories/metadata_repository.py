@@ -1,5 +1,6 @@
 import pickle
 import logging
+from ..filesystem import atomic_path
 
 logger = logging.getLogger(__name__)
 
@@ -11,14 +12,25 @@ class MetadataRepository:
         
         # Validate and normalize metadata
         for i, meta in enumerate(metadata["metadata"]):
-            if "type" not in meta:
-                meta["type"] = "banan"
-            meta["case_summary"] = meta.get("case_summary", "No summary available")
-            meta["legal_issues"] = meta.get("legal_issues", "No legal issues specified")
-            meta["court_reasoning"] = meta.get("court_reasoning", "No reasoning provided")
-            meta["decision"] = meta.get("decision", "No decision available")
-            meta["relevant_laws"] = meta.get("relevant_laws", "No laws cited")
+            self.normalize_entry(meta)
             if not metadata["texts"][i]:
                 logger.warning(f"Empty text field for document ID {metadata['ids'][i]}")
         
-        return metadata
\ No newline at end of file
+        return metadata
+
+    @staticmethod
+    def normalize_entry(meta: dict) -> dict:
+        if "type" not in meta:
+            meta["type"] = "banan"
+        meta["case_summary"] = meta.get("case_summary", "No summary available")
+        meta["legal_issues"] = meta.get("legal_issues", "No legal issues specified")
+        meta["court_reasoning"] = meta.get("court_reasoning", "No reasoning provided")
+        meta["decision"] = meta.get("decision", "No decision available")
+        meta["relevant_laws"] = meta.get("relevant_laws", "No laws cited")
+        return meta
+
+    def save_metadata(self, path: str, metadata: dict) -> None:
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+        logger.info(f"Metadata saved to {path} with {len(metadata['ids'])} documents")
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+import faiss
+import numpy as np
+from ..text.vietnamese import normalize_text
+from ...config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Từ khóa chủ đề nông nghiệp dùng để lọc câu hỏi lạc đề. Âm tiết đơn trùng nghĩa khi bỏ
+# dấu (nấm/Nam/năm, cây/cay, lúa/lửa, thuốc/thuộc, chuối/chuỗi) chỉ khớp bản có dấu
+AGRICULTURE_ACCENTED_PATTERN = re.compile(
+    r"\b(nấm|cây|rầy|rệp|nhện|lúa|thuốc|chuối|sâu hại|sâu bệnh|sâu đục)\b"
+)
+# Từ khóa đã bỏ dấu, đủ rõ nghĩa để bắt cả câu hỏi gõ không dấu
+AGRICULTURE_PATTERN = re.compile(
+    r"\b(benh|trieu chung|thuoc tru|tru sau|sau benh|dieu tri|phong tru|phong ngua|nong nghiep|"
+    r"nam benh|benh nam|cay trong|trong cay|phan bon|bon phan|vi khuan|virus|hat giong|"
+    r"ca chua|ca phe|sau rieng|ray nau|ruong lua)\b"
+)
+
+
+def is_agriculture_question(text: str) -> bool:
+    if AGRICULTURE_ACCENTED_PATTERN.search(normalize_text(text, fold=False)):
+        return True
+    return bool(AGRICULTURE_PATTERN.search(normalize_text(text)))
+
+
+class QuestionBankRepository:
+    """
+    Precomputed related-question bank: a small inner-product FAISS index over
+    L2-normalized question embeddings plus the question texts (JSON).
+    """
+    _instance = None
+
+    def __new__(cls, index_path: Optional[str] = None, path: Optional[str] = None):
+        if cls._instance is None:
+            cls._instance = super(QuestionBankRepository, cls).__new__(cls)
+            cls._instance._initialize(index_path or Config.QUESTION_BANK_INDEX_PATH, path or Config.QUESTION_BANK_PATH)
+        return cls._instance
+
+    def _initialize(self, index_path: str, path: str):
+        self.questions: List[Dict] = []
+        self.folded: List[str] = []
+        self.index = None
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+        if not (os.path.exists(index_path) and os.path.exists(path)):
+            logger.warning(f"Question bank not found ({index_path}, {path}), related questions fall back to the LLM")
+            return
+
+        with open(path, "r", encoding="utf-8") as f:
+            questions = json.load(f)
+        index = faiss.read_index(index_path)
+        if index.ntotal != len(questions):
+            logger.warning(f"Question bank out of sync: {index.ntotal} vectors, {len(questions)} questions; ignoring it")
+            return
+        self._load(questions, index)
+        logger.info(f"Question bank loaded: {len(self.questions)} questions")
+
+    def _load(self, questions: List[Dict], index) -> None:
+        self.questions = questions
+        self.folded = [normalize_text(q["question"]) for q in questions]
+        self.index = index
+        # Bank nhỏ: giữ vector trong bộ nhớ để lọc đa dạng mà không phải reconstruct
+        self.vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype=np.float32)
+
+    def is_available(self) -> bool:
+        return self.index is not None and len(self.questions) > 0
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Return ``(row, cosine)`` pairs for the ``k`` nearest questions."""
+        vector = np.array(query_vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        scores, rows = self.index.search(vector, min(k, self.index.ntotal))
+        return [(int(row), float(score)) for row, score in zip(rows[0], scores[0]) if row >= 0]
+
+    @staticmethod
+    def save(questions: List[Dict], vectors: np.ndarray, index_path: str, path: str) -> None:
+        """Write a bank built offline (see ``app.cli.build_question_bank``)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+
+        for target in (index_path, path):
+            directory = os.path.dirname(target)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        faiss.write_index(index, f"{index_path}.tmp")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(questions, f, ensure_ascii=False, indent=1)
+        os.replace(f"{index_path}.tmp", index_path)
+        os.replace(f"{path}.tmp", path)
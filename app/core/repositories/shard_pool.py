@@ -0,0 +1,171 @@
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+from .index_repository import IndexRepository
+from ..metrics import SHARD_ERRORS, record_stage
+from ...config.resources import current_budget
+from ...config.settings import Config
+from ...retrieval_shard import run_shard
+
+logger = logging.getLogger(__name__)
+
+
+class ShardUnavailable(Exception):
+    """A shard timed out, died or failed a request; the caller should answer in-process."""
+
+
+class _ShardProcess:
+    """One shard process plus a reader thread matching replies to pending requests."""
+
+    def __init__(self, context, shard_id: int):
+        self.shard_id = shard_id
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=run_shard, args=(child_conn, current_budget().shard), name=f"retrieval-shard-{shard_id}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.alive = True
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count()
+        self._send_lock = threading.Lock()
+        threading.Thread(target=self._read, name=f"shard-{shard_id}-reader", daemon=True).start()
+
+    def call(self, op: str, payload=None) -> Future:
+        future: Future = Future()
+        with self._send_lock:
+            if not self.alive:
+                future.set_exception(ShardUnavailable(f"shard {self.shard_id} is down"))
+                return future
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            try:
+                self.conn.send((request_id, op, payload))
+            except (OSError, ValueError) as e:
+                self._pending.pop(request_id, None)
+                future.set_exception(ShardUnavailable(f"shard {self.shard_id}: {e}"))
+        return future
+
+    def _read(self) -> None:
+        try:
+            while True:
+                request_id, ok, value = self.conn.recv()
+                future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(ShardUnavailable(f"shard {self.shard_id}: {value}"))
+        except (EOFError, OSError):
+            pass
+        self.alive = False
+        for future in list(self._pending.values()):
+            future.set_exception(ShardUnavailable(f"shard {self.shard_id} exited"))
+        self._pending.clear()
+
+    def stop(self) -> None:
+        if self.alive:
+            self.call("stop")
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class ShardPool:
+    """
+    Row-partitioned FAISS + BM25 slices of IndexRepository served by local shard processes.
+
+    Shards are (re)built in the background from ``IndexRepository.shard_snapshot``
+    whenever the index version changes or a shard dies; until then ``ready()``
+    is False and callers answer from the in-process index.
+    """
+
+    def __init__(
+        self,
+        index_repo: IndexRepository,
+        num_shards: int = Config.RETRIEVAL_SHARDS,
+        timeout: float = Config.SHARD_TIMEOUT,
+        build_timeout: float = 600.0,
+        retry_interval: float = 30.0
+    ):
+        self.index_repo = index_repo
+        self.num_shards = num_shards
+        self.timeout = timeout
+        self.build_timeout = build_timeout
+        self.retry_interval = retry_interval
+        self.ready_version: Optional[str] = None
+        # spawn: không fork process đang giữ torch/OpenMP
+        self._context = multiprocessing.get_context("spawn")
+        self._shards: List[Optional[_ShardProcess]] = [None] * num_shards
+        self._lock = threading.Lock()
+        self._building = False
+        self._next_build_at = 0.0
+
+    def ready(self) -> bool:
+        return (
+            self.ready_version == self.index_repo.get_version()
+            and all(shard is not None and shard.alive for shard in self._shards)
+        )
+
+    def ensure_ready(self) -> bool:
+        """True if shards match the current index; otherwise start a background rebuild and return False."""
+        if self.ready():
+            return True
+        with self._lock:
+            if self._building or time.monotonic() < self._next_build_at:
+                return False
+            self._building = True
+        threading.Thread(target=self._build, name="shard-build", daemon=True).start()
+        return False
+
+    def _build(self) -> None:
+        try:
+            start = time.perf_counter()
+            version, payloads = self.index_repo.shard_snapshot(self.num_shards)
+            for shard_id, shard in enumerate(self._shards):
+                if shard is None or not shard.alive:
+                    if shard is not None:
+                        shard.stop()
+                    self._shards[shard_id] = _ShardProcess(self._context, shard_id)
+            futures = [shard.call("build", payload) for shard, payload in zip(self._shards, payloads)]
+            sizes = [future.result(timeout=self.build_timeout) for future in futures]
+            self.ready_version = version
+            logger.info(f"Retrieval shards ready (version {version}): {sizes} vectors in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            self.ready_version = None
+            self._next_build_at = time.monotonic() + self.retry_interval
+            logger.error(f"Building retrieval shards failed, retrying in {self.retry_interval}s: {e}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def search(self, request: Dict) -> List[Dict]:
+        """Scatter one request to every shard and gather all replies within ``timeout``."""
+        futures = [shard.call("search", request) for shard in self._shards]
+        deadline = time.monotonic() + self.timeout
+        replies = []
+        for shard_id, future in enumerate(futures):
+            try:
+                reply = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                SHARD_ERRORS.labels(shard=str(shard_id), reason="timeout").inc()
+                raise ShardUnavailable(f"shard {shard_id} timed out after {self.timeout}s")
+            except ShardUnavailable:
+                SHARD_ERRORS.labels(shard=str(shard_id), reason="error").inc()
+                raise
+            record_stage(f"shard_{shard_id}", reply["seconds"])
+            replies.append(reply)
+        return replies
+
+    def stop(self) -> None:
+        for shard in self._shards:
+            if shard is not None:
+                shard.stop()
+        self._shards = [None] * self.num_shards
+        self.ready_version = None
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from ..config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# (row, score, distance) - đủ để dựng lại Document từ metadata hiện tại
+CachedHit = Tuple[int, Optional[float], Optional[float]]
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of retrieval results with per-entry TTL.
+
+    Keys embed the index version, so any change to FAISS, metadata or BM25
+    makes old entries unreachable; they then age out through LRU/TTL.
+    With ``redis_url`` set, entries are also shared across gunicorn workers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = Config.RESULT_CACHE_SIZE,
+        ttl: int = Config.RESULT_CACHE_TTL,
+        redis_url: str = Config.RESULT_CACHE_REDIS_URL
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[CachedHit]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = self._connect_shared(redis_url) if redis_url and max_entries > 0 else None
+
+    @staticmethod
+    def _connect_shared(redis_url: str):
+        try:
+            import redis
+        except ImportError:
+            logger.warning("RESULT_CACHE_REDIS_URL is set but the redis package is not installed; using local cache only")
+            return None
+        client = redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.2)
+        logger.info(f"Shared retrieval cache enabled at {redis_url}")
+        return client
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(version: str, query: str, k: int, doc_type: str, strategy: str) -> str:
+        digest = hashlib.sha1(query.strip().encode("utf-8")).hexdigest()
+        return f"plant:retrieval:{version}:{strategy}:{doc_type}:{k}:{digest}"
+
+    def get(self, key: str) -> Tuple[Optional[List[CachedHit]], str]:
+        """Return ``(hits, source)`` where source is "local", "shared" or "miss"."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1], "local"
+                del self._entries[key]
+
+        if self._shared is not None:
+            try:
+                raw = self._shared.get(key)
+            except Exception as e:
+                logger.debug(f"Shared cache read failed: {e}")
+                raw = None
+            if raw is not None:
+                hits = [tuple(hit) for hit in json.loads(raw)]
+                self._store_local(key, hits, now)
+                return hits, "shared"
+        return None, "miss"
+
+    def set(self, key: str, hits: List[CachedHit]) -> None:
+        self._store_local(key, hits, time.monotonic())
+        if self._shared is not None:
+            try:
+                self._shared.set(key, json.dumps(hits), ex=self.ttl)
+            except Exception as e:
+                logger.debug(f"Shared cache write failed: {e}")
+
+    def _store_local(self, key: str, hits: List[CachedHit], now: float) -> None:
+        with self._lock:
+            self._entries[key] = (now + self.ttl, hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,111 @@
+import base64
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from .metrics import RETRIEVAL_SERVICE_REQUESTS, stage
+from .models.document import Document
+from ..config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalUnavailable(Exception):
+    """The retrieval service could not be reached or answered with an error."""
+
+
+def encode_vectors(vectors: np.ndarray) -> Dict:
+    """float32 matrix -> JSON-safe ``{"shape", "data"}`` (base64 of the raw little-endian bytes)."""
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    return {"shape": list(vectors.shape), "data": base64.b64encode(vectors.tobytes()).decode("ascii")}
+
+
+def decode_vectors(payload: Dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype="<f4").reshape(payload["shape"]).astype(np.float32)
+
+
+class RetrievalClient:
+    """
+    Pooled HTTP client for the standalone retrieval service (``app.retrieval_service``).
+
+    Connections are kept alive per worker and every call has a timeout.
+    ``encode``/``encode_query`` mirror IndexRepository, so the client can
+    stand in for it wherever only embeddings are needed. With
+    ``local_fallback`` the in-process IndexRepository is loaded on the first
+    failure and used instead.
+    """
+
+    def __init__(
+        self,
+        base_url: str = Config.RETRIEVAL_SERVICE_URL,
+        timeout: float = Config.RETRIEVAL_SERVICE_TIMEOUT,
+        pool_size: int = Config.RETRIEVAL_SERVICE_POOL,
+        local_fallback: bool = Config.RETRIEVAL_LOCAL_FALLBACK
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.local_fallback = local_fallback
+        self.session = requests.Session()
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+        self._query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_lock = threading.Lock()
+
+    def _post(self, endpoint: str, payload: Dict) -> Dict:
+        try:
+            with stage(f"retrieval_service_{endpoint}"):
+                response = self.session.post(f"{self.base_url}/{endpoint}", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            RETRIEVAL_SERVICE_REQUESTS.labels(endpoint=endpoint, outcome="error").inc()
+            raise RetrievalUnavailable(f"{endpoint}: {e}") from e
+        RETRIEVAL_SERVICE_REQUESTS.labels(endpoint=endpoint, outcome="ok").inc()
+        return body
+
+    def local_index(self):
+        """In-process IndexRepository (loads the embedding model on first use)."""
+        from .repositories.index_repository import IndexRepository
+        return IndexRepository()
+
+    def query_batch(self, queries: List[Dict]) -> List[List[Document]]:
+        """Each query is ``{"query", "k", "doc_type", "strategy"}``; one round trip for all of them."""
+        body = self._post("retrieve", {"queries": queries})
+        return [[Document.from_dict(doc) for doc in docs] for docs in body["results"]]
+
+    def query(self, query: str, k: int = 5, doc_type: str = "banan", strategy: str = "hybrid") -> List[Document]:
+        return self.query_batch([{"query": query, "k": k, "doc_type": doc_type, "strategy": strategy}])[0]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        try:
+            return decode_vectors(self._post("encode", {"texts": list(texts)})["vectors"])
+        except RetrievalUnavailable as e:
+            if not self.local_fallback:
+                raise
+            logger.warning(f"Retrieval service unavailable, encoding locally: {e}")
+            RETRIEVAL_SERVICE_REQUESTS.labels(endpoint="encode", outcome="fallback").inc()
+            return self.local_index().encode(texts)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Embed one query as a (1, dim) float32 array, memoized per query text."""
+        with self._query_lock:
+            vector = self._query_embeddings.get(query)
+            if vector is not None:
+                self._query_embeddings.move_to_end(query)
+                return vector
+        vector = self.encode([query])
+        with self._query_lock:
+            self._query_embeddings[query] = vector
+            while len(self._query_embeddings) > Config.QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return vector
+
+    def health(self) -> Optional[Dict]:
+        try:
+            response = self.session.get(f"{self.base_url}/health", timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError):
+            return None
@@ -1,4 +1,7 @@
 from .gemini_service import GeminiService
 from .query_service import QueryService
+from .catalogue_service import CatalogueService
+from .search_service import SearchService
+from .diagnosis_service import DiagnosisService
 
-__all__ = ["GeminiService", "QueryService"]
\ No newline at end of file
+__all__ = ["GeminiService", "QueryService", "CatalogueService", "SearchService", "DiagnosisService"]
\ No newline at end of file
@@ -0,0 +1,39 @@
+import time
+from typing import Dict, List, Optional
+from ..repositories.catalogue_repository import CatalogueRepository
+from ...handlers.catalogue_handler import CatalogueHandler
+
+
+class CatalogueService:
+    def __init__(self, catalogue_repo: Optional[CatalogueRepository] = None):
+        self.catalogue_repo = catalogue_repo or CatalogueRepository()
+        self.handler = CatalogueHandler(self.catalogue_repo)
+
+    @staticmethod
+    def _summarize(entry: Dict) -> Dict:
+        images = entry.get("images") or []
+        descriptions = entry.get("description") or []
+        first_description = descriptions[0].get("description", "") if descriptions and isinstance(descriptions[0], dict) else ""
+        return {
+            "id": entry.get("id"),
+            "common_name": entry.get("common_name"),
+            "scientific_name": entry.get("scientific_name"),
+            "host": entry.get("host") or [],
+            "thumbnail": images[0].get("thumbnail") if images else None,
+            "snippet": first_description[:200],
+        }
+
+    def search(self, query: str, k: int = 10, prefix: bool = True, full: bool = False) -> Dict:
+        start_time = time.perf_counter()
+        hits = self.handler.search(query, k=k, prefix=prefix)
+        results: List[Dict] = []
+        for hit in hits:
+            item = dict(hit["entry"]) if full else self._summarize(hit["entry"])
+            item["score"] = hit["score"]
+            results.append(item)
+        return {
+            "query": query,
+            "results": results,
+            "suggestions": self.handler.suggest(query) if prefix else [],
+            "took_ms": round((time.perf_counter() - start_time) * 1000, 3),
+        }
@@ -0,0 +1,212 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .catalogue_service import CatalogueService
+from .query_service import QueryService
+from ..batching import BatchFailed, MicroBatcher
+from ..imaging import decode_image, hash_distance, hash_signature, perceptual_hash, to_tensor
+from ..metrics import DIAGNOSIS_CACHE_LOOKUPS, stage
+from ..retrieval_client import RetrievalUnavailable
+from ..text.vietnamese import simple_tokens
+from ...config.resources import current_budget
+from ...config.settings import Config
+from ...handlers.leaf_classifier_handler import LeafClassifier
+
+logger = logging.getLogger(__name__)
+
+
+class ClassifierUnavailable(Exception):
+    """No classifier model is installed in this deployment."""
+
+
+class ClassifierFailed(Exception):
+    """The classifier model raised while predicting; the image itself may be fine."""
+
+
+class DiagnosisService:
+    """
+    Leaf-image diagnosis on CPU, without an LLM round trip.
+
+    Uploads are decoded at reduced scale, hashed (dHash) and looked up in an
+    LRU cache, where copies within ``Config.CLASSIFIER_HASH_DISTANCE`` bits
+    count as the same photo; identical images already being classified share
+    that result. Misses go through a MicroBatcher, so concurrent uploads run
+    as one batch. Predicted classes are mapped to catalogue entries and retrieval passages.
+    """
+
+    def __init__(
+        self,
+        catalogue_service: CatalogueService,
+        query_service: Optional[QueryService] = None,
+        classifier: Optional[LeafClassifier] = None
+    ):
+        self.catalogue_service = catalogue_service
+        self.query_service = query_service
+        self.classifier = classifier
+        if classifier is None and os.path.exists(Config.CLASSIFIER_MODEL_PATH) and os.path.exists(Config.CLASSIFIER_LABELS_PATH):
+            try:
+                self.classifier = LeafClassifier(
+                    Config.CLASSIFIER_MODEL_PATH, Config.CLASSIFIER_LABELS_PATH, threads=current_budget().classifier
+                )
+            except Exception as e:
+                logger.error(f"Leaf classifier failed to load, image diagnosis is disabled: {e}")
+        elif classifier is None:
+            logger.warning(
+                f"Leaf classifier not found ({Config.CLASSIFIER_MODEL_PATH}, {Config.CLASSIFIER_LABELS_PATH}), "
+                f"image diagnosis is disabled"
+            )
+
+        self.cache_size = Config.CLASSIFIER_CACHE_SIZE
+        self.hash_distance = Config.CLASSIFIER_HASH_DISTANCE
+        # perceptual hash -> (xác suất, chữ ký đã parse để so khoảng cách)
+        self._cache: "OrderedDict[str, Tuple[np.ndarray, Tuple]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.batcher = None
+        self._catalogue_matches: List[Optional[Dict]] = []
+        if self.classifier is not None:
+            self.batcher = MicroBatcher(
+                self.classifier.predict,
+                max_batch=Config.CLASSIFIER_BATCH_SIZE,
+                max_wait_ms=Config.CLASSIFIER_BATCH_WAIT_MS,
+                max_queue=Config.CLASSIFIER_MAX_QUEUE,
+                name="leaf_classifier"
+            )
+            self._catalogue_matches = [self._match_catalogue(label) for label in self.classifier.labels]
+
+    def available(self) -> bool:
+        return self.classifier is not None
+
+    def _match_catalogue(self, label: Dict) -> Optional[Dict]:
+        """Catalogue summary for a class: by ``catalogue_id`` if given, else the best name match."""
+        repo = self.catalogue_service.catalogue_repo
+        if label.get("catalogue_id") is not None:
+            for entry in repo.entries:
+                if entry.get("id") == label["catalogue_id"]:
+                    return self.catalogue_service._summarize(entry)
+        hits = self.catalogue_service.handler.search(label["name"], k=1, prefix=False)
+        if not hits:
+            return None
+        # Chỉ nhận khi mọi từ của nhãn có trong tên bệnh: "bệnh" chung chung không đủ
+        entry = hits[0]["entry"]
+        names = [entry.get("common_name") or "", entry.get("scientific_name") or ""] + list(entry.get("other_name") or [])
+        if not set(simple_tokens(label["name"])) <= set(simple_tokens(" ".join(names))):
+            logger.warning(f"Classifier label '{label['name']}' has no catalogue entry; set catalogue_id in the labels file")
+            return None
+        return self.catalogue_service._summarize(entry)
+
+    def _cache_get(self, image_hash: str) -> Optional[np.ndarray]:
+        with self._lock:
+            key = image_hash if image_hash in self._cache else self._nearest(image_hash)
+            if key is None:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key][0]
+
+    def _nearest(self, image_hash: str) -> Optional[str]:
+        if self.hash_distance <= 0:
+            return None
+        signature = hash_signature(image_hash)
+        # Ảnh tải lên gần đây được so trước
+        for key in reversed(self._cache):
+            if hash_distance(signature, self._cache[key][1]) <= self.hash_distance:
+                return key
+        return None
+
+    def _cache_set(self, image_hash: str, probs: np.ndarray) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[image_hash] = (probs, hash_signature(image_hash))
+            self._cache.move_to_end(image_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _classify(self, key: str, image) -> Tuple[np.ndarray, str]:
+        probs = self._cache_get(key)
+        if probs is not None:
+            return probs, "cache"
+        with self._lock:
+            future = self._inflight.get(key)
+            source = "inflight" if future is not None else "miss"
+        if future is None:
+            with stage("image_preprocess"):
+                tensor = to_tensor(image, self.classifier.input_size, self.classifier.mean, self.classifier.std)
+            with self._lock:
+                # Kiểm tra lại: ảnh giống hệt có thể vừa được gửi trong lúc tiền xử lý
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self.batcher.submit(tensor)
+                    self._inflight[key] = future
+                else:
+                    source = "inflight"
+            if source == "miss":
+                # Ngoài lock: callback chạy ngay nếu batch đã xong
+                future.add_done_callback(lambda f: self._finish(key, f))
+        with stage("classifier"):
+            try:
+                return future.result(timeout=Config.CLASSIFIER_TIMEOUT), source
+            except BatchFailed as e:
+                raise ClassifierFailed(str(e)) from e
+
+    def _finish(self, key: str, future: Future) -> None:
+        # Ghi cache trước khi bỏ khỏi in-flight để không có khe hở tính lại
+        if future.exception() is None:
+            self._cache_set(key, future.result())
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _context(self, name: str, k: int) -> List[Dict]:
+        if self.query_service is None or k <= 0:
+            return []
+        try:
+            with stage("retrieval"):
+                results = self.query_service.query(name, k=k, doc_type="banan", strategy="hybrid")
+        except RetrievalUnavailable as e:
+            logger.warning(f"No retrieval context for diagnosis '{name}': {e}")
+            return []
+        return [
+            {"id": doc.id, "source": doc.metadata.get("source"), "page": doc.metadata.get("page"), "snippet": doc.text[:300]}
+            for doc in results
+        ]
+
+    def diagnose(self, data: bytes, top_k: int = 3, context_k: int = 3) -> Dict:
+        """
+        Classify one uploaded image.
+
+        Raises ClassifierUnavailable without a model, ValueError for an
+        unreadable image, BatcherBusy when the batch queue is full and
+        ClassifierFailed when the model raises.
+        """
+        if self.classifier is None:
+            raise ClassifierUnavailable("Image diagnosis is not configured")
+        with stage("image_decode"):
+            image = decode_image(data, self.classifier.input_size)
+            image_hash = perceptual_hash(image)
+        probs, source = self._classify(image_hash, image)
+        DIAGNOSIS_CACHE_LOOKUPS.labels(source=source).inc()
+
+        top = np.argsort(-probs)[:top_k]
+        predictions = [
+            {
+                "label": self.classifier.labels[i]["name"],
+                "confidence": round(float(probs[i]), 4),
+                "catalogue": self._catalogue_matches[i],
+            }
+            for i in top
+        ]
+        best = predictions[0]
+        confident = best["confidence"] >= Config.CLASSIFIER_MIN_CONFIDENCE
+        # Chỉ tra cứu tài liệu khi đủ tin cậy, tránh gợi ý sai cho ảnh không rõ
+        query = (best["catalogue"] or {}).get("common_name") or best["label"]
+        return {
+            "image_hash": image_hash,
+            "cached": source != "miss",
+            "confident": confident,
+            "predictions": predictions,
+            "context": self._context(query, context_k) if confident else [],
+        }
@@ -0,0 +1,118 @@
+import re
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..metrics import stage
+from ..models.document import Document
+from ..repositories.catalogue_repository import CatalogueRepository
+from ..repositories.index_repository import IndexRepository
+from ..text.vietnamese import normalize_text
+from ...handlers.catalogue_handler import CatalogueHandler
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+|\n+")
+_DISEASE_NAME = re.compile(r"\b(bệnh\s+[^\s,.;:?!]+(?:\s+[^\s,.;:?!]+){0,3}?)(?=\s+(?:trên|ở|do|là|gây|có|hại)\b|[,.;:?!]|$)", re.IGNORECASE)
+
+# Tín hiệu từ khóa (đã bỏ dấu) cho từng mục của câu trả lời
+SECTION_CUES: Dict[str, re.Pattern] = {
+    "Triệu chứng": re.compile(r"\b(trieu chung|bieu hien|vet|dom|heo|vang|chay|thoi|kho|loet|xuat hien)\b"),
+    "Cách điều trị": re.compile(r"\b(phun|thuoc|xu ly|dieu tri|phong tru|tieu huy|cat bo|bon|lieu luong|hoat chat)\b"),
+    "Bệnh liên quan": re.compile(r"\b(benh khac|di kem|cung voi|nham lan|tuong tu|lien quan|ket hop)\b"),
+    "Lưu ý quan trọng": re.compile(r"\b(luu y|chu y|khong nen|tranh|cach ly|bao ho|an toan|thoi diem|moi truong)\b"),
+}
+
+SECTION_PRIORITY = ["Bệnh liên quan", "Lưu ý quan trọng", "Cách điều trị", "Triệu chứng"]
+
+# Ghi chú cuối câu trả lời theo lý do không dùng được LLM
+FALLBACK_NOTES: Dict[str, str] = {
+    "overloaded": "_Câu trả lời được tổng hợp tự động từ tài liệu tham khảo do hệ thống AI tạm thời quá tải._",
+    "timeout": "_Câu trả lời được tổng hợp tự động từ tài liệu tham khảo do hệ thống AI phản hồi quá chậm._",
+    "unavailable": "_Câu trả lời được tổng hợp tự động từ tài liệu tham khảo do hệ thống AI không phản hồi._",
+}
+
+
+class ExtractiveAnswerService:
+    """
+    Compose a structured answer from retrieved documents without any network call.
+
+    Sentences from the top documents are ranked per section by embedding
+    similarity to the question plus section keyword cues.
+    """
+
+    def __init__(
+        self,
+        index_repo: IndexRepository,
+        catalogue_repo: Optional[CatalogueRepository] = None,
+        max_sentences: int = 120,
+        per_section: int = 2,
+        cue_weight: float = 0.35
+    ):
+        self.index_repo = index_repo
+        self.catalogue_handler = CatalogueHandler(catalogue_repo or CatalogueRepository())
+        self.max_sentences = max_sentences
+        self.per_section = per_section
+        self.cue_weight = cue_weight
+
+    def _sentences(self, documents: List[Document]) -> List[str]:
+        sentences, seen = [], set()
+        for doc in documents:
+            for sentence in _SENTENCE_SPLIT.split(doc.text or ""):
+                sentence = " ".join(sentence.split())
+                key = normalize_text(sentence)
+                if 20 <= len(sentence) <= 400 and key not in seen:
+                    seen.add(key)
+                    sentences.append(sentence)
+                    if len(sentences) >= self.max_sentences:
+                        return sentences
+        return sentences
+
+    def _disease_name(self, question: str, sentences: List[str]) -> Optional[str]:
+        hits = self.catalogue_handler.search(question, k=1)
+        if hits:
+            return hits[0]["entry"].get("common_name")
+        for text in [question] + sentences[:10]:
+            match = _DISEASE_NAME.search(text)
+            if match:
+                return match.group(1).strip()
+        return None
+
+    def _rank(self, question: str, sentences: List[str]) -> List[Tuple[str, float, str]]:
+        query_vector = self.index_repo.encode_query(question)[0]
+        vectors = self.index_repo.encode(sentences)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        similarity = vectors @ query_vector / np.where(norms == 0, 1.0, norms)
+        return [(sentence, float(score), normalize_text(sentence)) for sentence, score in zip(sentences, similarity)]
+
+    def answer(self, question: str, documents: List[Document], reason: str = "overloaded") -> str:
+        """Draft plus the note for ``reason`` (a key of FALLBACK_NOTES)."""
+        return self.with_note(self.draft(question, documents), reason)
+
+    @staticmethod
+    def with_note(draft: str, reason: str) -> str:
+        return f"{draft}\n\n{FALLBACK_NOTES[reason]}"
+
+    def draft(self, question: str, documents: List[Document]) -> str:
+        """The structured answer without the closing note, for callers that learn the reason later."""
+        with stage("extractive_answer"):
+            sentences = self._sentences(documents)
+            disease = self._disease_name(question, sentences)
+            ranked = self._rank(question, sentences) if sentences else []
+
+            # Mỗi câu thuộc về mục có nhiều tín hiệu nhất; hòa thì ưu tiên mục cụ thể hơn
+            candidates: Dict[str, List[Tuple[float, str]]] = {section: [] for section in SECTION_CUES}
+            for sentence, similarity, folded in ranked:
+                hits = {section: len(cue.findall(folded)) for section, cue in SECTION_CUES.items()}
+                section = max(SECTION_PRIORITY, key=lambda name: (hits[name], -SECTION_PRIORITY.index(name)))
+                if hits[section]:
+                    candidates[section].append((similarity + self.cue_weight * min(hits[section], 3) / 3, sentence))
+            sections = {
+                section: [sentence for _, sentence in sorted(scored, reverse=True)[:self.per_section]]
+                for section, scored in candidates.items()
+            }
+
+        lines = [f"- **Tên bệnh**: {disease or 'Chưa xác định được từ dữ liệu tham khảo'}"]
+        for section, picked in sections.items():
+            if picked:
+                lines.append(f"- **{section}**:")
+                lines.extend(f"  - {sentence}" for sentence in picked)
+            else:
+                lines.append(f"- **{section}**: Không có thông tin trong tài liệu tham khảo.")
+        return "\n".join(lines)
@@ -1,3 +1,4 @@
+from typing import Optional
 from ...handlers.gemini_handler import GeminiHandler, Strategy, KeyRotationStrategy
 
 class GeminiService:
@@ -8,10 +9,37 @@ class GeminiService:
             key_strategy=KeyRotationStrategy.SMART_COOLDOWN
         )
     
-    def generate_content(self, prompt: str, model_name: str = "gemini-2.0-flash-thinking-exp-01-21") -> str:
+    def generate_content(self, prompt: str, profile: str = "answer", model_name: Optional[str] = None) -> str:
+        """Generate text with a named profile from config.yaml ("answer", "related_questions")."""
+        return self.try_generate_content(prompt, profile, model_name) or "No response from model"
+
+    def try_generate_content(self, prompt: str, profile: str = "answer", model_name: Optional[str] = None) -> Optional[str]:
+        """Like generate_content, but None when every attempt failed."""
         response = self.handler.generate_content(
             prompt=prompt,
             model_name=model_name,
-            return_stats=False
+            return_stats=False,
+            profile=profile
+        )
+        return response.get("text") if response.get("success") else None
+
+    async def generate_content_async(self, prompt: str, profile: str = "answer", model_name: Optional[str] = None) -> str:
+        """Async variant of generate_content (ASGI mode)."""
+        return await self.try_generate_content_async(prompt, profile, model_name) or "No response from model"
+
+    async def try_generate_content_async(self, prompt: str, profile: str = "answer", model_name: Optional[str] = None) -> Optional[str]:
+        response = await self.handler.generate_content_async(
+            prompt=prompt,
+            model_name=model_name,
+            return_stats=False,
+            profile=profile
         )
-        return response.get("text", "No response from model")
\ No newline at end of file
+        return response.get("text") if response.get("success") else None
+
+    def saturation_wait(self, profile: str = "answer") -> float:
+        """Seconds until any API key of the profile is usable again (0 if one is free)."""
+        return self.handler.get_key_manager(profile).next_available_in()
+
+    async def saturation_wait_async(self, profile: str = "answer") -> float:
+        """saturation_wait without blocking the event loop on a shared (SQLite) ledger."""
+        return await self.handler.get_key_manager(profile).call_ledger(self.saturation_wait, profile)
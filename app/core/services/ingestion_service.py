@@ -0,0 +1,98 @@
+import logging
+import signal
+import threading
+from typing import Dict, Iterable, List, Optional
+from ..filesystem import try_file_lock
+from ..repositories.index_repository import IndexRepository
+from ...config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionService:
+    def __init__(self, index_repo: IndexRepository, persist: bool = True):
+        self.index_repo = index_repo
+        self.persist = persist
+        self._stop_event = threading.Event()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._watch_thread: Optional[threading.Thread] = None
+        self._compaction_lock = None  # giữ suốt đời process khi nó là process chạy compaction
+
+    def add_documents(self, documents: List[Dict]) -> List[str]:
+        return self.index_repo.add_documents(documents, persist=self.persist)
+
+    def delete_documents(self, doc_ids: Iterable[str]) -> List[str]:
+        return self.index_repo.delete_documents(doc_ids, persist=self.persist)
+
+    def compact(self, force: bool = False) -> int:
+        # Xét tỉ lệ tombstone trên bản mới nhất trên đĩa, trong cùng khóa ghi
+        with self.index_repo.writing():
+            if not force and not self.index_repo.needs_compaction():
+                return 0
+            return self.index_repo.compact(persist=self.persist)
+
+    def _is_compaction_leader(self) -> bool:
+        """Only the process holding ``<INDEX_LOCK_PATH>.compaction`` compacts; another takes over if it exits."""
+        if self._compaction_lock is None:
+            self._compaction_lock = try_file_lock(f"{Config.INDEX_LOCK_PATH}.compaction")
+        return self._compaction_lock is not None
+
+    def start_background_compaction(self, interval: Optional[int] = None) -> None:
+        """Periodically compact tombstones in a daemon thread (interval in seconds), in one process of the deployment."""
+        interval = Config.COMPACTION_INTERVAL if interval is None else interval
+        if interval <= 0 or self._compaction_thread is not None:
+            return
+
+        def _run():
+            while not self._stop_event.wait(interval):
+                if not self._is_compaction_leader():
+                    continue
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Background compaction failed: {e}")
+
+        self._compaction_thread = threading.Thread(target=_run, name="index-compaction", daemon=True)
+        self._compaction_thread.start()
+        logger.info(f"Background compaction every {interval}s")
+
+    def stop_background_compaction(self) -> None:
+        self._stop_event.set()
+
+    def _reload(self, force: bool = False) -> None:
+        try:
+            self.index_repo.reload(force=force)
+        except Exception as e:
+            logger.error(f"Index reload failed, still serving {self.index_repo.get_version()}: {e}")
+
+    def reload_in_background(self, force: bool = False) -> bool:
+        """Start a hot reload in a daemon thread; False if one is already running."""
+        if self.index_repo.is_reloading():
+            return False
+        threading.Thread(target=self._reload, args=(force,), name="index-reload", daemon=True).start()
+        return True
+
+    def start_index_watcher(self, interval: Optional[int] = None) -> None:
+        """Poll the bundle directory (or flat artifact files) and hot-reload when they change."""
+        interval = Config.INDEX_WATCH_INTERVAL if interval is None else interval
+        if interval <= 0 or self._watch_thread is not None:
+            return
+
+        def _run():
+            settling = False
+            while not self._stop_event.wait(interval):
+                # File thường có thể đang được copy dở: chỉ reload khi thay đổi đã ổn định qua một chu kỳ
+                changed = self.index_repo.artifacts_changed()
+                if changed and settling:
+                    self._reload()
+                settling = changed
+
+        self._watch_thread = threading.Thread(target=_run, name="index-watcher", daemon=True)
+        self._watch_thread.start()
+        logger.info(f"Watching index artifacts every {interval}s")
+
+    def install_reload_signal(self) -> None:
+        """``kill -USR2 <pid>`` triggers a hot reload (main thread, POSIX only)."""
+        if not hasattr(signal, "SIGUSR2") or threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.reload_in_background())
@@ -1,23 +1,112 @@
-from typing import List
+import logging
+from typing import Dict, List, Optional
 from ..models.document import Document
+from ..metrics import RESULT_CACHE_LOOKUPS, RETRIEVAL_SERVICE_REQUESTS, stage
+from ..repositories.collection_registry import CollectionRegistry
 from ..repositories.index_repository import IndexRepository
+from ..repositories.shard_pool import ShardPool
+from ..result_cache import ResultCache
+from ..retrieval_client import RetrievalClient, RetrievalUnavailable
+from ...config.settings import Config
 from ...handlers.faiss_handler import FaissHandler
 from ...handlers.bm25_handler import BM25Handler
 from ...handlers.hybrid_handler import HybridHandler
+from ...handlers.sharded_handler import ShardedHandler
+
+logger = logging.getLogger(__name__)
 
 class QueryService:
-    def __init__(self, index_repo: IndexRepository):
+    def __init__(
+        self,
+        index_repo: Optional[IndexRepository],
+        result_cache: Optional[ResultCache] = None,
+        shard_pool: Optional[ShardPool] = None,
+        retrieval_client: Optional[RetrievalClient] = None,
+        collections: Optional[CollectionRegistry] = None
+    ):
+        # index_repo là None khi retrieval chạy ở service riêng (retrieval_client)
         self.index_repo = index_repo
+        self.retrieval_client = retrieval_client
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        if shard_pool is None and Config.RETRIEVAL_SHARDS > 0 and index_repo is not None:
+            shard_pool = ShardPool(index_repo)
+        self.shard_pool = shard_pool
+        self.collections = collections if collections is not None else CollectionRegistry()
+        self._handlers: Dict[str, HybridHandler | FaissHandler | BM25Handler | ShardedHandler] = {}
     
-    def create_query_handler(self, strategy: str) -> HybridHandler | FaissHandler | BM25Handler:
+    def create_query_handler(self, strategy: str, index_repo=None) -> HybridHandler | FaissHandler | BM25Handler:
+        index_repo = index_repo or self.index_repo
         if strategy == "hybrid":
-            return HybridHandler(self.index_repo)
+            return HybridHandler(index_repo)
         elif strategy == "faiss":
-            return FaissHandler(self.index_repo)
+            return FaissHandler(index_repo)
         elif strategy == "bm25":
-            return BM25Handler(self.index_repo)
+            return BM25Handler(index_repo)
         raise ValueError(f"Unknown query strategy: {strategy}")
+
+    def get_query_handler(self, strategy: str) -> HybridHandler | FaissHandler | BM25Handler | ShardedHandler:
+        # Handler không giữ trạng thái theo request nên dùng lại được
+        handler = self._handlers.get(strategy)
+        if handler is None:
+            handler = self.create_query_handler(strategy)
+            if self.shard_pool is not None:
+                # Phân tán truy vấn qua các shard, handler trong process làm dự phòng
+                handler = ShardedHandler(self.index_repo, self.shard_pool, strategy, handler)
+            self._handlers[strategy] = handler
+        return handler
     
+    def get_version(self, doc_type: str = "banan") -> Optional[str]:
+        """Version of the index serving ``doc_type``; None when retrieval is remote."""
+        if self.retrieval_client is not None:
+            return None
+        if self.collections.has(doc_type):
+            return self.collections.get(doc_type).get_version()
+        return self.index_repo.get_version()
+
     def query(self, query: str, k: int = 5, doc_type: str = "banan", strategy: str = "hybrid") -> List[Document]:
-        handler = self.create_query_handler(strategy)
-        return handler.query(query, k, doc_type)
\ No newline at end of file
+        if self.retrieval_client is not None:
+            try:
+                return self.retrieval_client.query(query, k, doc_type, strategy)
+            except RetrievalUnavailable as e:
+                if not self.retrieval_client.local_fallback:
+                    raise
+                logger.warning(f"Retrieval service unavailable, querying locally: {e}")
+                RETRIEVAL_SERVICE_REQUESTS.labels(endpoint="retrieve", outcome="fallback").inc()
+                if self.index_repo is None:
+                    self.index_repo = self.retrieval_client.local_index()
+        return self._query_local(query, k, doc_type, strategy)
+
+    def _query_local(self, query: str, k: int = 5, doc_type: str = "banan", strategy: str = "hybrid") -> List[Document]:
+        self.collections.evict_idle()
+        if self.collections.has(doc_type):
+            # Collection nạp theo yêu cầu: handler tạo mới mỗi lần để không giữ
+            # collection đã bị giải phóng; không đi qua shard
+            with stage("collection"):
+                collection = self.collections.get(doc_type)
+            handler = self.create_query_handler(strategy, collection)
+            return self._query_cached(handler, collection, query, k, collection.spec.doc_type, strategy)
+
+        # Giữ nguyên một version index suốt truy vấn, kể cả khi reload đổi bundle
+        with self.index_repo.pinned():
+            return self._query_cached(self.get_query_handler(strategy), self.index_repo, query, k, doc_type, strategy)
+
+    def _query_cached(self, handler, index_repo, query: str, k: int, doc_type: str, strategy: str) -> List[Document]:
+        if not self.result_cache.enabled:
+            return handler.query(query, k, doc_type)
+
+        # Đọc version trước khi truy vấn: nếu index đổi giữa chừng, kết quả
+        # được lưu dưới version cũ và không bao giờ được đọc lại
+        version = index_repo.get_version()
+        key = ResultCache.make_key(version, query, k, doc_type, strategy)
+        with stage("result_cache"):
+            hits, source = self.result_cache.get(key)
+        RESULT_CACHE_LOOKUPS.labels(strategy=strategy, source=source).inc()
+        if hits is not None:
+            metadata = index_repo.get_metadata(doc_type)
+            return [Document.from_row(metadata, row, score, distance) for row, score, distance in hits]
+
+        results = handler.query(query, k, doc_type)
+        rows = [index_repo.row_of(doc.id) for doc in results]
+        if None not in rows:
+            self.result_cache.set(key, [(row, doc.score, doc.distance) for row, doc in zip(rows, results)])
+        return results
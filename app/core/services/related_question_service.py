@@ -0,0 +1,68 @@
+from typing import Dict, List
+import numpy as np
+from ..metrics import stage
+from ..repositories.index_repository import IndexRepository
+from ..repositories.question_bank_repository import QuestionBankRepository, is_agriculture_question
+from ..text.vietnamese import normalize_text
+
+DEFAULT_QUESTIONS = [
+    {"question": "Cách nhận biết sớm các bệnh phổ biến trên cây cà chua?"},
+    {"question": "Những loại thuốc nào an toàn để trị bệnh trên cây lúa?"},
+    {"question": "Bệnh nhện đỏ trên cây trồng có thể phòng ngừa như thế nào?"},
+    {"question": "Các bệnh nào thường xuất hiện cùng với bệnh nấm trên cây?"},
+    {"question": "Chế độ tưới nước ảnh hưởng thế nào đến bệnh cây trồng?"}
+]
+
+
+class RelatedQuestionService:
+    """Suggest related questions by nearest-neighbour lookup in the question bank (no LLM call)."""
+
+    def __init__(
+        self,
+        index_repo: IndexRepository,
+        question_bank: QuestionBankRepository,
+        candidates: int = 40,
+        duplicate_threshold: float = 0.92,
+        diversity_threshold: float = 0.85
+    ):
+        self.index_repo = index_repo
+        self.question_bank = question_bank
+        self.candidates = candidates
+        self.duplicate_threshold = duplicate_threshold
+        self.diversity_threshold = diversity_threshold
+
+    def is_available(self) -> bool:
+        return self.question_bank.is_available()
+
+    def suggest(self, question: str, n: int = 5) -> List[Dict[str, str]]:
+        # Embedding đã được tính ở bước FAISS nên thường lấy từ cache
+        query_vector = self.index_repo.encode_query(question)
+        with stage("related_questions"):
+            hits = self.question_bank.search(query_vector, self.candidates)
+            folded_query = normalize_text(question)
+
+            picked: List[int] = []
+            for row, score in hits:
+                if len(picked) >= n:
+                    break
+                # Bỏ câu trùng với câu hỏi gốc
+                if score >= self.duplicate_threshold or self.question_bank.folded[row] == folded_query:
+                    continue
+                text = self.question_bank.questions[row]["question"]
+                if not is_agriculture_question(text):
+                    continue
+                # Lọc đa dạng: bỏ ứng viên quá giống câu đã chọn
+                if picked:
+                    similarity = self.question_bank.vectors[picked] @ self.question_bank.vectors[row]
+                    if float(np.max(similarity)) >= self.diversity_threshold:
+                        continue
+                picked.append(row)
+
+        suggestions = [{"question": self.question_bank.questions[row]["question"]} for row in picked]
+        seen = {s["question"] for s in suggestions}
+        for fallback in DEFAULT_QUESTIONS:
+            if len(suggestions) >= n:
+                break
+            if fallback["question"] not in seen:
+                suggestions.append(fallback)
+        return suggestions
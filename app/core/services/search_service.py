@@ -0,0 +1,134 @@
+import base64
+import binascii
+import hashlib
+import json
+from typing import Dict, List, Optional, Sequence
+from .query_service import QueryService
+from ..models.document import Document
+from ...config.settings import Config
+
+STRATEGIES = ("hybrid", "faiss", "bm25")
+# Trường có thể chọn qua ?fields=, mặc định bỏ metadata đầy đủ cho payload gọn
+SEARCH_FIELDS = ("id", "text", "snippet", "source", "page", "type", "score", "distance", "metadata")
+DEFAULT_FIELDS = ("id", "source", "page", "snippet", "score", "distance")
+SNIPPET_CHARS = 200
+
+
+class CursorExpired(Exception):
+    """The index changed since the cursor was issued; the search must restart from page one."""
+
+
+class SearchService:
+    """
+    Retrieval-only search: ranked documents with thresholds, cursor paging and field projection.
+
+    Every page of a search reads the same fixed window of ``Config.SEARCH_WINDOW``
+    results, so after the first page the ranking comes from the result cache and
+    no handler runs. Cursors carry the index version they were issued against.
+    """
+
+    def __init__(self, query_service: QueryService):
+        self.query_service = query_service
+
+    def doc_types(self) -> List[str]:
+        return self.query_service.collections.names()
+
+    def version(self, doc_type: str) -> Optional[str]:
+        return self.query_service.get_version(doc_type)
+
+    @staticmethod
+    def fingerprint(query: str, strategy: str, doc_type: str, min_score: Optional[float], max_distance: Optional[float]) -> str:
+        raw = json.dumps([query, strategy, doc_type, min_score, max_distance], ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+    @staticmethod
+    def encode_cursor(offset: int, version: Optional[str], fingerprint: str) -> str:
+        raw = json.dumps({"o": offset, "v": version, "f": fingerprint}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            data = json.loads(raw)
+            offset = int(data["o"])
+        except (ValueError, TypeError, KeyError, binascii.Error):
+            raise ValueError("Invalid cursor!")
+        if offset < 0:
+            raise ValueError("Invalid cursor!")
+        return {"offset": offset, "version": data.get("v"), "fingerprint": data.get("f")}
+
+    @staticmethod
+    def project(doc: Document, fields: Sequence[str]) -> Dict:
+        values = {
+            "id": lambda: doc.id,
+            "text": lambda: doc.text,
+            "snippet": lambda: doc.text[:SNIPPET_CHARS],
+            "source": lambda: doc.metadata.get("source"),
+            "page": lambda: doc.metadata.get("page"),
+            "type": lambda: doc.metadata.get("type"),
+            "score": lambda: doc.score,
+            "distance": lambda: doc.distance,
+            "metadata": lambda: doc.metadata,
+        }
+        return {field: values[field]() for field in fields}
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        strategy: str = "hybrid",
+        doc_type: str = "banan",
+        min_score: Optional[float] = None,
+        max_distance: Optional[float] = None,
+        fields: Sequence[str] = DEFAULT_FIELDS,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Return one page of ranked documents.
+
+        ``min_score`` applies to the score of the strategy: the fused [0, 1]
+        score for "hybrid", the raw BM25 score for "bm25". ``max_distance``
+        applies to the L2 distance of "faiss" results; "hybrid" rejects it,
+        since BM25-only hits have no distance. Raises ValueError for bad
+        arguments and CursorExpired when the index moved on.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {list(STRATEGIES)}")
+        if strategy == "hybrid" and max_distance is not None:
+            raise ValueError("max_distance is not defined for hybrid search, use min_score on the fused score")
+        if doc_type not in self.doc_types():
+            raise ValueError(f"Unknown doc_type '{doc_type}'")
+        unknown = [field for field in fields if field not in SEARCH_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}, expected any of {list(SEARCH_FIELDS)}")
+
+        fingerprint = self.fingerprint(query, strategy, doc_type, min_score, max_distance)
+        version = self.version(doc_type)
+        offset = 0
+        if cursor:
+            position = self.decode_cursor(cursor)
+            if position["fingerprint"] != fingerprint:
+                raise ValueError("Cursor does not belong to this search!")
+            if version is not None and position["version"] != version:
+                raise CursorExpired(f"Index changed from {position['version']} to {version}")
+            offset = position["offset"]
+
+        # Luôn lấy cùng một cửa sổ kết quả: các trang sau trúng result cache
+        window = self.query_service.query(query, k=Config.SEARCH_WINDOW, doc_type=doc_type, strategy=strategy)
+        matches = [
+            doc for doc in window
+            if (min_score is None or doc.score is None or doc.score >= min_score)
+            and (max_distance is None or doc.distance is None or doc.distance <= max_distance)
+        ]
+        page = matches[offset:offset + k]
+        next_offset = offset + len(page)
+        return {
+            "query": query,
+            "strategy": strategy,
+            "doc_type": doc_type,
+            "version": version,
+            "total": len(matches),
+            "results": [self.project(doc, fields) for doc in page],
+            "next_cursor": self.encode_cursor(next_offset, version, fingerprint) if next_offset < len(matches) else None,
+        }
@@ -0,0 +1,4 @@
+from .vietnamese import fold_accents, normalize_text, simple_tokens
+from .tokenizer import Tokenizer, get_tokenizer, tokenize
+
+__all__ = ["fold_accents", "normalize_text", "simple_tokens", "Tokenizer", "get_tokenizer", "tokenize"]
@@ -0,0 +1,129 @@
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterable, List, Optional, Set
+from .vietnamese import fold_accents
+
+# Âm tiết tiếng Việt / số / dấu câu; biên dịch một lần cho cả lúc index và lúc query.
+# Dấu câu chỉ dùng để ngắt bigram, không được giữ lại làm token.
+_SYLLABLE_PATTERN = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_]+|[^\w\s]", re.UNICODE)
+
+VIETNAMESE_STOPWORDS = frozenset({
+    "và", "của", "là", "có", "các", "những", "được", "cho", "trong", "với",
+    "này", "đó", "thì", "mà", "để", "một", "khi", "như", "từ", "trên",
+    "bị", "ra", "vào", "cũng", "đã", "sẽ", "rất", "nào", "gì", "thế",
+    "làm", "sao", "hay", "hoặc", "nên", "cần", "phải", "về", "theo", "tại",
+    "the", "a", "an", "of", "and", "or", "is", "are", "in", "on", "to", "for",
+})
+
+BIGRAM_SEPARATOR = "_"
+# Tiền tố của trường không dấu; "~" luôn bị regex tách thành dấu câu nên không trùng token thật
+FOLD_PREFIX = "~"
+TOKENIZER_VERSION = 2
+
+
+@lru_cache(maxsize=65536)
+def _fold_token(token: str) -> str:
+    return fold_accents(token)
+
+
+class Tokenizer:
+    """Vietnamese-aware tokenizer shared by BM25 index building and querying.
+
+    Text is NFC-normalized and lowercased, split into syllables with a
+    precompiled regex, stripped of stopwords, and optionally extended with
+    syllable bigrams (``cà_chua``). With ``fold_variants`` documents also index
+    a folded field (``~ca_chua``) for their accented tokens, which only
+    unaccented query tokens look up, so ``cà`` never matches ``cá``.
+    """
+
+    def __init__(
+        self,
+        bigrams: bool = True,
+        fold_variants: bool = True,
+        stopwords: Optional[Iterable[str]] = VIETNAMESE_STOPWORDS
+    ):
+        self.bigrams = bigrams
+        self.fold_variants = fold_variants
+        self.stopwords: Set[str] = set(stopwords or ())
+
+    @staticmethod
+    def _pieces(text: str) -> List[str]:
+        if not text:
+            return []
+        if not text.isascii():
+            text = unicodedata.normalize("NFC", text)
+        return _SYLLABLE_PATTERN.findall(text.lower())
+
+    def syllables(self, text: str) -> List[str]:
+        return [piece for piece in self._pieces(text) if piece[0].isalnum()]
+
+    def _tokens(self, text: str) -> List[str]:
+        tokens: List[str] = []
+        previous: Optional[str] = None
+        stopwords = self.stopwords
+
+        for syllable in self._pieces(text):
+            if syllable in stopwords or not syllable[0].isalnum():
+                previous = None
+                continue
+            tokens.append(syllable)
+            if self.bigrams and previous is not None:
+                tokens.append(previous + BIGRAM_SEPARATOR + syllable)
+            previous = syllable
+        return tokens
+
+    def tokenize(self, text: str) -> List[str]:
+        """Index-side tokens: accented tokens also get a folded ``~`` copy."""
+        tokens = self._tokens(text)
+        if self.fold_variants:
+            folded = [_fold_token(token) for token in tokens]
+            tokens.extend(FOLD_PREFIX + f for f, t in zip(folded, tokens) if f != t)
+        return tokens
+
+    def tokenize_query(self, text: str) -> List[str]:
+        """Query-side tokens: only unaccented tokens also look up the folded field."""
+        tokens = self._tokens(text)
+        if self.fold_variants:
+            tokens.extend([FOLD_PREFIX + t for t in tokens if _fold_token(t) == t])
+        return tokens
+
+    def signature(self) -> dict:
+        """Settings that determine the token stream; artifacts built with another signature are stale."""
+        stopwords_hash = hashlib.md5("\n".join(sorted(self.stopwords)).encode("utf-8")).hexdigest()
+        return {
+            "version": TOKENIZER_VERSION,
+            "bigrams": self.bigrams,
+            "fold_variants": self.fold_variants,
+            "stopwords": stopwords_hash,
+        }
+
+    def tokenize_many(self, texts: Iterable[str]) -> List[List[str]]:
+        return [self.tokenize(text) for text in texts]
+
+    __call__ = tokenize
+
+
+_default_tokenizer: Optional[Tokenizer] = None
+
+
+def get_tokenizer() -> Tokenizer:
+    """Process-wide tokenizer so index-time and query-time tokens always match."""
+    global _default_tokenizer
+    if _default_tokenizer is None:
+        from ...config.settings import Config
+        _default_tokenizer = Tokenizer(
+            bigrams=Config.BM25_BIGRAMS,
+            fold_variants=Config.BM25_FOLD_VARIANTS
+        )
+    return _default_tokenizer
+
+
+def tokenize(text: str) -> List[str]:
+    return get_tokenizer().tokenize(text)
+
+
+def indexed_length(tokens: List[str]) -> int:
+    """Document length for BM25 normalisation; the folded field does not count."""
+    return sum(1 for token in tokens if not token.startswith(FOLD_PREFIX))
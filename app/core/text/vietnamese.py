@@ -0,0 +1,33 @@
+import re
+import unicodedata
+
+# Bảng chuyển đổi "đ/Đ" (không tách được bằng NFD)
+_EXTRA_FOLDS = str.maketrans({"đ": "d", "Đ": "D"})
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fold_accents(text: str) -> str:
+    """Remove Vietnamese diacritics, e.g. "nấm đốm" -> "nam dom"."""
+    if not text:
+        return ""
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFD", text)
+    return _COMBINING_MARKS.sub("", decomposed).translate(_EXTRA_FOLDS)
+
+
+def normalize_text(text: str, fold: bool = True) -> str:
+    """Lowercase, NFC-normalize and collapse whitespace; optionally fold accents."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text).lower()
+    if fold:
+        text = fold_accents(text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def simple_tokens(text: str, fold: bool = True) -> list:
+    """Split normalized text into word tokens."""
+    return _WORD_PATTERN.findall(normalize_text(text, fold=fold))
@@ -2,11 +2,15 @@ from .query_handler import QueryHandler
 from .faiss_handler import FaissHandler
 from .bm25_handler import BM25Handler
 from .hybrid_handler import HybridHandler
+from .sharded_handler import ShardedHandler
 from .gemini_handler import GeminiHandler
+from .catalogue_handler import CatalogueHandler
 __all__ = [
     "QueryHandler",
     "FaissHandler",
     "BM25Handler",
     "HybridHandler",
-    "GeminiHandler"
+    "ShardedHandler",
+    "GeminiHandler",
+    "CatalogueHandler"
 ]
\ No newline at end of file
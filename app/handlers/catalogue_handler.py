@@ -0,0 +1,71 @@
+import heapq
+import math
+from typing import Dict, List
+from ..core.repositories.catalogue_repository import CatalogueRepository
+from ..core.text.vietnamese import simple_tokens
+
+# Hệ số cho token khớp theo tiền tố (gõ dở) so với khớp trọn vẹn
+PREFIX_MATCH_FACTOR = 0.6
+NAME_PREFIX_BONUS = 2.0
+NAME_CONTAINS_BONUS = 1.0
+
+
+class CatalogueHandler:
+    def __init__(self, catalogue_repo: CatalogueRepository, max_expansions: int = 30):
+        self.catalogue_repo = catalogue_repo
+        self.max_expansions = max_expansions
+
+    def _idf(self, token: str) -> float:
+        df = len(self.catalogue_repo.postings.get(token, ()))
+        return math.log(1.0 + len(self.catalogue_repo.entries) / (df or 1))
+
+    def _accumulate(self, scores: Dict[int, float], token: str, factor: float) -> None:
+        postings = self.catalogue_repo.postings.get(token)
+        if not postings:
+            return
+        idf = self._idf(token) * factor
+        for doc_idx, tf in postings.items():
+            scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * (1.0 + math.log(tf))
+
+    def search(self, query: str, k: int = 10, prefix: bool = True) -> List[Dict]:
+        tokens = simple_tokens(query)
+        if not tokens or not self.catalogue_repo.entries:
+            return []
+
+        scores: Dict[int, float] = {}
+        complete_tokens = tokens[:-1] if prefix else tokens
+        for token in complete_tokens:
+            self._accumulate(scores, token, 1.0)
+
+        if prefix:
+            # Token cuối có thể đang gõ dở: mở rộng qua trie, giữ điểm cao nhất mỗi tài liệu
+            last = tokens[-1]
+            best: Dict[int, float] = {}
+            for candidate in self.catalogue_repo.trie.complete(last, self.max_expansions):
+                partial: Dict[int, float] = {}
+                self._accumulate(partial, candidate, 1.0 if candidate == last else PREFIX_MATCH_FACTOR)
+                for doc_idx, score in partial.items():
+                    if score > best.get(doc_idx, 0.0):
+                        best[doc_idx] = score
+            for doc_idx, score in best.items():
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + score
+
+        folded_query = " ".join(tokens)
+        for doc_idx in scores:
+            name = self.catalogue_repo.folded_names[doc_idx]
+            if name.startswith(folded_query):
+                scores[doc_idx] += NAME_PREFIX_BONUS
+            elif folded_query in name:
+                scores[doc_idx] += NAME_CONTAINS_BONUS
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            {"entry": self.catalogue_repo.get_entry(doc_idx), "score": round(score, 4)}
+            for doc_idx, score in top
+        ]
+
+    def suggest(self, prefix: str, k: int = 10) -> List[str]:
+        tokens = simple_tokens(prefix)
+        if not tokens:
+            return []
+        return self.catalogue_repo.trie.complete(tokens[-1], k)
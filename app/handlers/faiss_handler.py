@@ -1,6 +1,7 @@
 import numpy as np
 from .query_handler import QueryHandler
 from ..core.models.document import Document
+from ..core.metrics import stage
 from ..core.repositories.index_repository import IndexRepository
 from typing import List
 
@@ -9,28 +10,21 @@ class FaissHandler(QueryHandler):
         self.index_repo = index_repo
     
     def query(self, query: str, k: int, doc_type: str) -> List[Document]:
-        embeddings = self.index_repo.get_embeddings()
         faiss_index = self.index_repo.get_faiss_index(doc_type)
         metadata = self.index_repo.get_metadata(doc_type)
+        deleted_rows = self.index_repo.get_deleted_rows()
         
-        query_emb = embeddings.encode([query], convert_to_numpy=True)
-        distances, indices = faiss_index.search(query_emb, k)
+        with stage("embedding"):
+            query_emb = self.index_repo.encode_query(query)
+        # Lấy dư để bù cho các tài liệu đã bị xóa (tombstone)
+        with stage("faiss_search"):
+            distances, indices = faiss_index.search(query_emb, k + len(deleted_rows))
         results = []
         
         for dist, i in zip(distances[0], indices[0]):
-            if 0 <= i < len(metadata["ids"]):
+            if 0 <= i < len(metadata["ids"]) and i not in deleted_rows:
                 meta = metadata["metadata"][i]
                 if doc_type is None or meta.get("type") == doc_type:
-                    results.append(Document(
-                        id=metadata["ids"][i],
-                        text=metadata["texts"][i],
-                        metadata=meta,
-                        distance=float(dist),
-                        case_summary=meta.get("case_summary"),
-                        legal_issues=meta.get("legal_issues"),
-                        court_reasoning=meta.get("court_reasoning"),
-                        decision=meta.get("decision"),
-                        relevant_laws=meta.get("relevant_laws")
-                    ))
+                    results.append(Document.from_row(metadata, i, distance=float(dist)))
         
         return results[:k]
\ No newline at end of file
@@ -1,13 +1,20 @@
 from abc import ABC, abstractmethod
+import asyncio
 import google.generativeai as genai
+import hashlib
+from google.ai import generativelanguage as glm
+import threading
 import time
 import os
 import yaml
 from typing import List, Dict, Any, Optional, Tuple, Union
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from itertools import cycle
 from pathlib import Path
+from ..core.admission import current_deadline
+from ..core.metrics import record_gemini_attempt
+from .quota_ledger import KeyStats, MemoryQuotaLedger, QuotaLedger, create_quota_ledger
 
 @dataclass
 class GenerationConfig:
@@ -23,6 +30,12 @@ class GenerationConfig:
         """Convert config to dictionary, excluding None values."""
         return {k: v for k, v in self.__dict__.items() if v is not None}
 
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> 'GenerationConfig':
+        """Build from a config mapping, ignoring unknown keys."""
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in values.items() if k in known})
+
 
 @dataclass
 class ModelResponse:
@@ -34,6 +47,8 @@ class ModelResponse:
     time: float = 0.0
     attempts: int = 1
     api_key_index: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
 
 
 class Strategy(Enum):
@@ -52,12 +67,17 @@ class KeyRotationStrategy(Enum):
 
 
 @dataclass
-class KeyStats:
-    """Track usage statistics for each API key."""
-    uses: int = 0
-    last_used: float = 0
-    failures: int = 0
-    rate_limited_until: float = 0
+class GenerationProfile:
+    """Named generation settings selected per call (e.g. "answer", "related_questions")."""
+    name: str
+    models: List[str]
+    generation_config: GenerationConfig
+    strategy: Optional[Strategy] = None
+    timeout: Optional[float] = None
+    requests_per_minute: int = 60
+    reset_window: int = 60
+    max_retries: int = 3
+    retry_delay: int = 30
 
 
 class ConfigLoader:
@@ -101,11 +121,83 @@ class ConfigLoader:
             "or GEMINI_API_KEY environment variable."
         )
 
+    @staticmethod
+    def load_gemini_section(config_path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+        """Load the ``gemini`` section of the YAML config (empty dict if unavailable)."""
+        if not config_path:
+            return {}
+        try:
+            with open(config_path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+            return config.get('gemini') or {}
+        except Exception as e:
+            print(f"Warning: Failed to load config from {config_path}: {e}")
+            return {}
+
+    @staticmethod
+    def load_endpoint(config_path: Optional[Union[str, Path]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Resolve the API endpoint and transport, so the handler can be pointed
+        at a local stand-in server:
+        1. GEMINI_API_ENDPOINT / GEMINI_TRANSPORT environment variables
+        2. ``api_endpoint`` / ``transport`` in the YAML config
+        A custom endpoint defaults to the REST transport.
+        """
+        section = ConfigLoader.load_gemini_section(config_path)
+        endpoint = os.getenv('GEMINI_API_ENDPOINT') or section.get('api_endpoint')
+        transport = os.getenv('GEMINI_TRANSPORT') or section.get('transport')
+        if endpoint and not transport:
+            transport = "rest"
+        return endpoint, transport
+
+    @staticmethod
+    def load_quota_ledger(config_path: Optional[Union[str, Path]] = None) -> Optional[str]:
+        """
+        Resolve where key quotas are tracked: GEMINI_QUOTA_LEDGER, then
+        ``quota_ledger`` in the YAML config. A file path selects the shared
+        SQLite ledger; unset or "memory" keeps stats per process.
+        """
+        return os.getenv('GEMINI_QUOTA_LEDGER') or ConfigLoader.load_gemini_section(config_path).get('quota_ledger')
+
+    @staticmethod
+    def load_profiles(config_path: Optional[Union[str, Path]] = None) -> Dict[str, 'GenerationProfile']:
+        """
+        Build generation profiles from the YAML config.
+
+        The top-level ``generation``, ``rate_limits`` and ``retry`` sections form
+        the ``default`` profile; each entry under ``profiles`` overrides them and
+        may also set ``models``, ``strategy`` and ``timeout`` (seconds).
+        """
+        section = ConfigLoader.load_gemini_section(config_path)
+        default_models = ModelConfig().models
+
+        def build(name: str, overrides: Dict[str, Any]) -> GenerationProfile:
+            generation = {**(section.get('generation') or {}), **(overrides.get('generation') or {})}
+            rate_limits = {**(section.get('rate_limits') or {}), **(overrides.get('rate_limits') or {})}
+            retry = {**(section.get('retry') or {}), **(overrides.get('retry') or {})}
+            strategy = overrides.get('strategy')
+            return GenerationProfile(
+                name=name,
+                models=list(overrides.get('models') or default_models),
+                generation_config=GenerationConfig.from_dict(generation),
+                strategy=Strategy(strategy) if strategy else None,
+                timeout=overrides.get('timeout'),
+                requests_per_minute=int(rate_limits.get('requests_per_minute', 60)),
+                reset_window=int(rate_limits.get('reset_window', 60)),
+                max_retries=int(retry.get('max_attempts', 3)),
+                retry_delay=int(retry.get('delay', 30))
+            )
+
+        profiles = {"default": build("default", {})}
+        for name, overrides in (section.get('profiles') or {}).items():
+            profiles[name] = build(name, overrides or {})
+        return profiles
+
 
 class ModelConfig:
     """Configuration for model settings."""
-    def __init__(self):
-        self.models = [
+    def __init__(self, models: Optional[List[str]] = None, max_retries: int = 3, retry_delay: int = 30):
+        self.models = models or [
             "gemini-2.0-flash-exp",
             "gemini-1.5-pro",
             "learnlm-1.5-pro-experimental",
@@ -115,9 +207,16 @@ class ModelConfig:
             "gemini-2.0-flash-thinking-exp-1219",
             "gemini-1.5-flash"
         ]
-        self.max_retries = 3
-        self.retry_delay = 30
-        self.default_model = "gemini-2.0-flash-exp"
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.default_model = self.models[0]
+
+
+class KeyPoolExhausted(RuntimeError):
+    """No API key frees up before the request deadline; ``retry_after`` is in seconds."""
+    def __init__(self, retry_after: float):
+        super().__init__(f"All API keys busy for another {retry_after:.1f}s")
+        self.retry_after = retry_after
 
 
 class KeyRotationManager:
@@ -127,7 +226,8 @@ class KeyRotationManager:
         api_keys: List[str],
         strategy: KeyRotationStrategy = KeyRotationStrategy.ROUND_ROBIN,
         rate_limit: int = 60,
-        reset_window: int = 60
+        reset_window: int = 60,
+        ledger: Optional[QuotaLedger] = None
     ):
         if not api_keys:
             raise ValueError("At least one API key must be provided")
@@ -136,130 +236,183 @@ class KeyRotationManager:
         self.strategy = strategy
         self.rate_limit = rate_limit
         self.reset_window = reset_window
+        # Ledger có thể dùng chung giữa các worker: key được định danh bằng
+        # fingerprint (không lưu key thật). Quota Gemini tính theo key, nên mọi
+        # profile dùng chung bộ đếm và cooldown; mỗi profile chỉ có ngưỡng riêng
+        self.ledger = ledger or MemoryQuotaLedger()
+        self.key_ids = [hashlib.sha256(key.encode('utf-8')).hexdigest()[:16] for key in api_keys]
         
         # Initialize tracking
-        self.key_stats = {i: KeyStats() for i in range(len(api_keys))}
         self._key_cycle = cycle(range(len(api_keys)))
         self.current_index = 0
 
-    def _is_key_available(self, key_index: int) -> bool:
+    @property
+    def key_stats(self) -> Dict[int, KeyStats]:
+        """Snapshot of the ledger stats, indexed like ``api_keys``."""
+        snapshot = self.ledger.snapshot(self.key_ids)
+        return {idx: snapshot[key_id] for idx, key_id in enumerate(self.key_ids)}
+
+    def _is_key_available(self, stats: KeyStats, current_time: float) -> bool:
         """Check if a key is available based on rate limits and cooldown."""
-        stats = self.key_stats[key_index]
-        current_time = time.time()
-        
         if current_time < stats.rate_limited_until:
             return False
-            
-        if current_time - stats.last_used > self.reset_window:
-            stats.uses = 0
-            
+        if current_time - stats.window_start >= self.reset_window:
+            return True
         return stats.uses < self.rate_limit
 
-    def _get_sequential_key(self) -> Tuple[str, int]:
-        """Get next key using sequential strategy."""
-        start_index = self.current_index
-        
-        while True:
-            if self._is_key_available(self.current_index):
-                key_index = self.current_index
-                self.current_index = (self.current_index + 1) % len(self.api_keys)
-                return self.api_keys[key_index], key_index
-                
-            self.current_index = (self.current_index + 1) % len(self.api_keys)
-            if self.current_index == start_index:
-                self._handle_all_keys_busy()
-
-    def _get_round_robin_key(self) -> Tuple[str, int]:
-        """Get next key using round-robin strategy."""
-        start_index = next(self._key_cycle)
-        current_index = start_index
-        
-        while True:
-            if self._is_key_available(current_index):
-                return self.api_keys[current_index], current_index
-                
-            current_index = next(self._key_cycle)
-            if current_index == start_index:
-                self._handle_all_keys_busy()
+    def _rotate_from(self, start_index: int, available: List[int]) -> List[int]:
+        n = len(self.api_keys)
+        return sorted(available, key=lambda idx: (idx - start_index) % n)
 
-    def _get_least_used_key(self) -> Tuple[str, int]:
-        """Get key with lowest usage count."""
-        while True:
-            available_keys = [
-                (idx, stats) for idx, stats in self.key_stats.items()
-                if self._is_key_available(idx)
-            ]
-            
-            if available_keys:
-                key_index, _ = min(available_keys, key=lambda x: x[1].uses)
-                return self.api_keys[key_index], key_index
-                
-            self._handle_all_keys_busy()
+    def _get_sequential_keys(self, available: List[int], key_stats: Dict[int, KeyStats]) -> List[int]:
+        """Order keys for the sequential strategy."""
+        return self._rotate_from(self.current_index, available)
 
-    def _get_smart_cooldown_key(self) -> Tuple[str, int]:
-        """Get key using smart cooldown strategy."""
-        while True:
-            current_time = time.time()
-            available_keys = [
-                (idx, stats) for idx, stats in self.key_stats.items()
-                if current_time >= stats.rate_limited_until and self._is_key_available(idx)
-            ]
-            
-            if available_keys:
-                key_index, _ = min(
-                    available_keys,
-                    key=lambda x: (x[1].failures, -(current_time - x[1].last_used))
-                )
-                return self.api_keys[key_index], key_index
-                
-            self._handle_all_keys_busy()
+    def _get_round_robin_keys(self, available: List[int], key_stats: Dict[int, KeyStats]) -> List[int]:
+        """Order keys for the round-robin strategy."""
+        return self._rotate_from(next(self._key_cycle), available)
 
-    def _handle_all_keys_busy(self) -> None:
-        """Handle situation when all keys are busy."""
-        current_time = time.time()
-        any_reset = False
-        
-        for idx, stats in self.key_stats.items():
-            if current_time - stats.last_used > self.reset_window:
-                stats.uses = 0
-                any_reset = True
-                
-        if not any_reset:
-            time.sleep(1)
+    def _get_least_used_keys(self, available: List[int], key_stats: Dict[int, KeyStats]) -> List[int]:
+        """Order keys by lowest usage count."""
+        return sorted(available, key=lambda idx: key_stats[idx].uses)
 
-    def get_next_key(self) -> Tuple[str, int]:
-        """Get next available API key based on selected strategy."""
+    def _get_smart_cooldown_keys(self, available: List[int], key_stats: Dict[int, KeyStats]) -> List[int]:
+        """Order keys by fewest failures, then least recently used."""
+        return sorted(available, key=lambda idx: (key_stats[idx].failures, key_stats[idx].last_used))
+
+    def _wait_for_any_key(self, key_stats: Dict[int, KeyStats], current_time: float) -> float:
+        waits = [
+            0.0 if self._is_key_available(stats, current_time)
+            else max(stats.rate_limited_until, stats.window_start + self.reset_window) - current_time
+            for stats in key_stats.values()
+        ]
+        return max(0.0, min(waits))
+
+    def next_available_in(self) -> float:
+        """Seconds until at least one key can be used (0 if one is free now)."""
+        return self._wait_for_any_key(self.key_stats, time.time())
+
+    def _busy_wait(self, key_stats: Dict[int, KeyStats], current_time: float) -> float:
+        """Seconds to back off until the earliest key leaves its cooldown or usage window (at most 1s)."""
+        wait = self._wait_for_any_key(key_stats, current_time)
+        # Không chờ quá deadline của request (do admission control đặt)
+        deadline = current_deadline()
+        if deadline is not None and time.monotonic() + wait > deadline:
+            raise KeyPoolExhausted(wait)
+        return min(1.0, max(0.05, wait))
+
+    def _handle_all_keys_busy(self, key_stats: Dict[int, KeyStats], current_time: float) -> None:
+        """Wait until the earliest key leaves its cooldown or usage window (at most 1s)."""
+        time.sleep(self._busy_wait(key_stats, current_time))
+
+    def _try_acquire(self) -> Tuple[Optional[Tuple[str, int]], Dict[int, KeyStats], float]:
+        """One non-blocking pass over the candidates; returns the acquired key or None plus the snapshot used."""
         strategy_methods = {
-            KeyRotationStrategy.SEQUENTIAL: self._get_sequential_key,
-            KeyRotationStrategy.ROUND_ROBIN: self._get_round_robin_key,
-            KeyRotationStrategy.LEAST_USED: self._get_least_used_key,
-            KeyRotationStrategy.SMART_COOLDOWN: self._get_smart_cooldown_key
+            KeyRotationStrategy.SEQUENTIAL: self._get_sequential_keys,
+            KeyRotationStrategy.ROUND_ROBIN: self._get_round_robin_keys,
+            KeyRotationStrategy.LEAST_USED: self._get_least_used_keys,
+            KeyRotationStrategy.SMART_COOLDOWN: self._get_smart_cooldown_keys
         }
         
         method = strategy_methods.get(self.strategy)
         if not method:
             raise ValueError(f"Unknown strategy: {self.strategy}")
-            
-        api_key, key_index = method()
-        
-        stats = self.key_stats[key_index]
-        stats.uses += 1
-        stats.last_used = time.time()
-        
-        return api_key, key_index
+
+        current_time = time.time()
+        key_stats = self.key_stats
+        available = [idx for idx, stats in key_stats.items() if self._is_key_available(stats, current_time)]
+        # Ứng viên chọn theo snapshot; acquire trên ledger mới là bước quyết định
+        # (worker khác có thể vừa lấy slot cuối cùng)
+        for key_index in method(available, key_stats):
+            if self.ledger.try_acquire(self.key_ids[key_index], self.rate_limit, self.reset_window):
+                self.current_index = (key_index + 1) % len(self.api_keys)
+                return (self.api_keys[key_index], key_index), key_stats, current_time
+        return None, key_stats, current_time
+
+    def get_next_key(self) -> Tuple[str, int]:
+        """Get next available API key based on selected strategy."""
+        while True:
+            acquired, key_stats, current_time = self._try_acquire()
+            if acquired:
+                return acquired
+            self._handle_all_keys_busy(key_stats, current_time)
+
+    async def call_ledger(self, func, *args):
+        """Run ``func`` (which touches the ledger) off the event loop when the ledger does blocking I/O."""
+        if self.ledger.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def get_next_key_async(self) -> Tuple[str, int]:
+        """Like get_next_key, but backs off with asyncio.sleep instead of blocking the event loop."""
+        while True:
+            acquired, key_stats, current_time = await self.call_ledger(self._try_acquire)
+            if acquired:
+                return acquired
+            await asyncio.sleep(self._busy_wait(key_stats, current_time))
 
     def mark_success(self, key_index: int) -> None:
         """Mark successful API call."""
         if 0 <= key_index < len(self.api_keys):
-            self.key_stats[key_index].failures = 0
+            self.ledger.release(self.key_ids[key_index], success=True)
 
     def mark_rate_limited(self, key_index: int) -> None:
         """Mark API key as rate limited."""
         if 0 <= key_index < len(self.api_keys):
-            stats = self.key_stats[key_index]
-            stats.failures += 1
-            stats.rate_limited_until = time.time() + self.reset_window
-            stats.uses = self.rate_limit
+            self.ledger.release(
+                self.key_ids[key_index], success=False, cooldown=self.reset_window, rate_limit=self.rate_limit
+            )
+
+
+class GeminiClientPool:
+    """
+    Lazily created, reusable transport clients, one per API key.
+
+    Each client keeps its own HTTP session / gRPC channel, so connections are
+    reused across requests, and no call depends on the process-global key set
+    by ``genai.configure``.
+    """
+    def __init__(self, api_endpoint: Optional[str] = None, transport: Optional[str] = None):
+        self.api_endpoint = api_endpoint
+        self.transport = transport
+        self._clients: Dict[str, glm.GenerativeServiceClient] = {}
+        self._async_clients: Dict[str, glm.GenerativeServiceAsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, api_key: str) -> glm.GenerativeServiceClient:
+        client = self._clients.get(api_key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(api_key)
+                if client is None:
+                    client_options: Dict[str, Any] = {"api_key": api_key}
+                    if self.api_endpoint:
+                        client_options["api_endpoint"] = self.api_endpoint
+                    kwargs: Dict[str, Any] = {"client_options": client_options}
+                    if self.transport:
+                        kwargs["transport"] = self.transport
+                    client = self._clients[api_key] = glm.GenerativeServiceClient(**kwargs)
+        return client
+
+    def get_async_client(self, api_key: str) -> Optional[glm.GenerativeServiceAsyncClient]:
+        """
+        Async client for the key, or None when the pool uses the REST transport
+        (the SDK only ships a grpc_asyncio async client).
+        """
+        if self.transport == "rest":
+            return None
+        client = self._async_clients.get(api_key)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(api_key)
+                if client is None:
+                    client_options: Dict[str, Any] = {"api_key": api_key}
+                    if self.api_endpoint:
+                        client_options["api_endpoint"] = self.api_endpoint
+                    client = self._async_clients[api_key] = glm.GenerativeServiceAsyncClient(
+                        client_options=client_options, transport="grpc_asyncio"
+                    )
+        return client
 
 
 class ResponseHandler:
@@ -272,6 +425,9 @@ class ResponseHandler:
         key_index: int
     ) -> ModelResponse:
         """Process and validate model response."""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        response_tokens = getattr(usage, 'candidates_token_count', 0) or 0
         try:
             if hasattr(response, 'candidates') and response.candidates:
                 finish_reason = response.candidates[0].finish_reason
@@ -281,7 +437,9 @@ class ResponseHandler:
                         model=model_name,
                         error='Copyright material detected in response',
                         time=time.time() - start_time,
-                        api_key_index=key_index
+                        api_key_index=key_index,
+                        prompt_tokens=prompt_tokens,
+                        response_tokens=response_tokens
                     )
             
             return ModelResponse(
@@ -289,7 +447,9 @@ class ResponseHandler:
                 model=model_name,
                 text=response.text,
                 time=time.time() - start_time,
-                api_key_index=key_index
+                api_key_index=key_index,
+                prompt_tokens=prompt_tokens,
+                response_tokens=response_tokens
             )
         except Exception as e:
             if "The `response.text` quick accessor requires the response to contain a valid `Part`" in str(e):
@@ -298,7 +458,9 @@ class ResponseHandler:
                     model=model_name,
                     error='No valid response parts available',
                     time=time.time() - start_time,
-                    api_key_index=key_index
+                    api_key_index=key_index,
+                    prompt_tokens=prompt_tokens,
+                    response_tokens=response_tokens
                 )
             raise
 
@@ -310,46 +472,140 @@ class ContentStrategy(ABC):
         config: ModelConfig,
         key_manager: KeyRotationManager,
         system_instruction: Optional[str] = None,
-        generation_config: Optional[GenerationConfig] = None
+        generation_config: Optional[GenerationConfig] = None,
+        api_endpoint: Optional[str] = None,
+        transport: Optional[str] = None,
+        timeout: Optional[float] = None,
+        client_pool: Optional[GeminiClientPool] = None
     ):
         self.config = config
         self.key_manager = key_manager
         self.system_instruction = system_instruction
         self.generation_config = generation_config or GenerationConfig()
+        self.api_endpoint = api_endpoint
+        self.transport = transport
+        self.timeout = timeout
+        self.client_pool = client_pool or GeminiClientPool(api_endpoint, transport)
+
+    def _build_request(self, model_name: str, prompt: str) -> glm.GenerateContentRequest:
+        """Request for one prompt, sent on the key's pooled client through the public generated API."""
+        return glm.GenerateContentRequest(
+            model=model_name if "/" in model_name else f"models/{model_name}",
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            generation_config=glm.GenerationConfig(**self.generation_config.to_dict()),
+            system_instruction=glm.Content(parts=[glm.Part(text=self.system_instruction)]) if self.system_instruction else None
+        )
+
+    @staticmethod
+    def _remaining() -> Optional[float]:
+        """Seconds left before the request deadline (admission or speculative call), None if unbounded."""
+        deadline = current_deadline()
+        return None if deadline is None else deadline - time.monotonic()
+
+    def _request_options(self) -> Dict[str, Any]:
+        # Không để lời gọi HTTP kéo dài quá deadline của request
+        timeout, remaining = self.timeout, self._remaining()
+        if remaining is not None:
+            timeout = min(timeout, remaining) if timeout else remaining
+        return {"timeout": max(0.1, timeout)} if timeout else {}
+
+    def _deadline_exceeded(self, model_name: str, start_time: float) -> Optional[ModelResponse]:
+        remaining = self._remaining()
+        if remaining is None or remaining > 0:
+            return None
+        return ModelResponse(success=False, model=model_name, error='Request deadline exceeded', time=time.time() - start_time)
 
     @abstractmethod
     def generate(self, prompt: str, model_name: str) -> ModelResponse:
         """Generate content using the specific strategy."""
         pass
 
+    @abstractmethod
+    async def generate_async(self, prompt: str, model_name: str) -> ModelResponse:
+        """Async variant of generate; never blocks the event loop."""
+        pass
+
     def _try_generate(self, model_name: str, prompt: str, start_time: float) -> ModelResponse:
         """Helper method for generating content with key rotation."""
+        expired = self._deadline_exceeded(model_name, start_time)
+        if expired:
+            return expired
         api_key, key_index = self.key_manager.get_next_key()
+        attempt_start = time.perf_counter()
+        result = self._attempt(api_key, key_index, model_name, prompt, start_time)
+        self._record_attempt(model_name, key_index, result, attempt_start)
+        return result
+
+    async def _try_generate_async(self, model_name: str, prompt: str, start_time: float) -> ModelResponse:
+        expired = self._deadline_exceeded(model_name, start_time)
+        if expired:
+            return expired
+        api_key, key_index = await self.key_manager.get_next_key_async()
+        attempt_start = time.perf_counter()
+        result = await self._attempt_async(api_key, key_index, model_name, prompt, start_time)
+        self._record_attempt(model_name, key_index, result, attempt_start)
+        return result
+
+    def _record_attempt(self, model_name: str, key_index: int, result: ModelResponse, attempt_start: float) -> None:
+        record_gemini_attempt(
+            model=model_name,
+            key_index=key_index,
+            outcome=self._classify_outcome(result),
+            seconds=time.perf_counter() - attempt_start,
+            prompt_tokens=result.prompt_tokens,
+            response_tokens=result.response_tokens
+        )
+
+    @staticmethod
+    def _classify_outcome(result: ModelResponse) -> str:
+        if result.success:
+            return "ok"
+        if "Copyright" in result.error:
+            return "copyright"
+        if "429" in result.error:
+            return "rate_limited"
+        if "No valid response parts" in result.error:
+            return "empty"
+        return "error"
+
+    def _attempt(self, api_key: str, key_index: int, model_name: str, prompt: str, start_time: float) -> ModelResponse:
+        """Single generation attempt with an already-acquired key."""
         try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config=self.generation_config.to_dict(),
-                system_instruction=self.system_instruction
-            )
-            response = model.generate_content(prompt)
-            
-            result = ResponseHandler.process_response(response, model_name, start_time, key_index)
-            if result.success:
-                self.key_manager.mark_success(key_index)
-            return result
-            
+            client = self.client_pool.get_client(api_key)
+            raw = client.generate_content(self._build_request(model_name, prompt), **self._request_options())
+            response = genai.types.GenerateContentResponse.from_response(raw)
+            return self._on_response(response, key_index, model_name, start_time)
         except Exception as e:
-            if "429" in str(e):
-                self.key_manager.mark_rate_limited(key_index)
-            return ModelResponse(
-                success=False,
-                model=model_name,
-                error=str(e),
-                time=time.time() - start_time,
-                api_key_index=key_index
-            )
+            return self._on_error(e, key_index, model_name, start_time)
 
+    async def _attempt_async(self, api_key: str, key_index: int, model_name: str, prompt: str, start_time: float) -> ModelResponse:
+        async_client = self.client_pool.get_async_client(api_key)
+        if async_client is None:
+            # REST không có client async: chạy lời gọi đồng bộ trong thread riêng
+            return await asyncio.to_thread(self._attempt, api_key, key_index, model_name, prompt, start_time)
+        try:
+            raw = await async_client.generate_content(self._build_request(model_name, prompt), **self._request_options())
+            response = genai.types.AsyncGenerateContentResponse.from_response(raw)
+        except Exception as e:
+            return await self.key_manager.call_ledger(self._on_error, e, key_index, model_name, start_time)
+        return await self.key_manager.call_ledger(self._on_response, response, key_index, model_name, start_time)
+
+    def _on_response(self, response: Any, key_index: int, model_name: str, start_time: float) -> ModelResponse:
+        result = ResponseHandler.process_response(response, model_name, start_time, key_index)
+        if result.success:
+            self.key_manager.mark_success(key_index)
+        return result
+
+    def _on_error(self, error: Exception, key_index: int, model_name: str, start_time: float) -> ModelResponse:
+        if "429" in str(error):
+            self.key_manager.mark_rate_limited(key_index)
+        return ModelResponse(
+            success=False,
+            model=model_name,
+            error=str(error),
+            time=time.time() - start_time,
+            api_key_index=key_index
+        )
 
 class RoundRobinStrategy(ContentStrategy):
     """Round robin implementation of content generation."""
@@ -379,6 +635,21 @@ class RoundRobinStrategy(ContentStrategy):
             time=time.time() - start_time
         )
 
+    async def generate_async(self, prompt: str, _: str) -> ModelResponse:
+        start_time = time.time()
+
+        for _ in range(len(self.config.models)):
+            model_name = self._get_next_model()
+            result = await self._try_generate_async(model_name, prompt, start_time)
+            if result.success or 'Copyright' in result.error:
+                return result
+
+        return ModelResponse(
+            success=False,
+            model='all_models_failed',
+            error='All models failed (rate limited or copyright issues)',
+            time=time.time() - start_time
+        )
 
 class FallbackStrategy(ContentStrategy):
     """Fallback implementation of content generation."""
@@ -407,9 +678,36 @@ class FallbackStrategy(ContentStrategy):
             time=time.time() - start_time
         )
 
+    async def generate_async(self, prompt: str, start_model: str) -> ModelResponse:
+        start_time = time.time()
+
+        if start_model not in self.config.models:
+            return ModelResponse(
+                success=False,
+                model=start_model,
+                error=f"Model {start_model} not found in available models",
+                time=time.time() - start_time
+            )
+
+        for model_name in self.config.models[self.config.models.index(start_model):]:
+            result = await self._try_generate_async(model_name, prompt, start_time)
+            if result.success or 'Copyright' in result.error:
+                return result
+
+        return ModelResponse(
+            success=False,
+            model='all_models_failed',
+            error='All models failed (rate limited or copyright issues)',
+            time=time.time() - start_time
+        )
 
 class RetryStrategy(ContentStrategy):
     """Retry implementation of content generation."""
+    def _retry_past_deadline(self) -> bool:
+        # Lần thử lại sẽ bắt đầu sau deadline: dừng luôn thay vì ngủ rồi gọi Gemini vô ích
+        remaining = self._remaining()
+        return remaining is not None and remaining <= self.config.retry_delay
+
     def generate(self, prompt: str, model_name: str) -> ModelResponse:
         start_time = time.time()
         
@@ -421,6 +719,8 @@ class RetryStrategy(ContentStrategy):
                 return result
                 
             if attempt < self.config.max_retries - 1:
+                if self._retry_past_deadline():
+                    break
                 print(f"Error encountered. Waiting {self.config.retry_delay}s... "
                       f"(Attempt {attempt + 1}/{self.config.max_retries})")
                 time.sleep(self.config.retry_delay)
@@ -433,6 +733,30 @@ class RetryStrategy(ContentStrategy):
             attempts=self.config.max_retries
         )
 
+    async def generate_async(self, prompt: str, model_name: str) -> ModelResponse:
+        start_time = time.time()
+
+        for attempt in range(self.config.max_retries):
+            result = await self._try_generate_async(model_name, prompt, start_time)
+            result.attempts = attempt + 1
+
+            if result.success or 'Copyright' in result.error:
+                return result
+
+            if attempt < self.config.max_retries - 1:
+                if self._retry_past_deadline():
+                    break
+                print(f"Error encountered. Waiting {self.config.retry_delay}s... "
+                      f"(Attempt {attempt + 1}/{self.config.max_retries})")
+                await asyncio.sleep(self.config.retry_delay)
+
+        return ModelResponse(
+            success=False,
+            model=model_name,
+            error='Max retries exceeded',
+            time=time.time() - start_time,
+            attempts=self.config.max_retries
+        )
 
 class GeminiHandler:
     """Main handler class for Gemini API interactions."""
@@ -443,7 +767,9 @@ class GeminiHandler:
         content_strategy: Strategy = Strategy.ROUND_ROBIN,
         key_strategy: KeyRotationStrategy = KeyRotationStrategy.ROUND_ROBIN,
         system_instruction: Optional[str] = None,
-        generation_config: Optional[GenerationConfig] = None
+        generation_config: Optional[GenerationConfig] = None,
+        api_endpoint: Optional[str] = None,
+        transport: Optional[str] = None
     ):
         """
         Initialize GeminiHandler with flexible configuration options.
@@ -455,22 +781,46 @@ class GeminiHandler:
             key_strategy: Strategy for key rotation
             system_instruction: Optional system instruction
             generation_config: Optional generation configuration
+            api_endpoint: Optional API endpoint override (e.g. a local fake server)
+            transport: Optional transport ("rest", "grpc", "grpc_asyncio")
         """
         # Load API keys from provided list or config sources
         self.api_keys = api_keys or ConfigLoader.load_api_keys(config_path)
+        config_endpoint, config_transport = ConfigLoader.load_endpoint(config_path)
+        self.api_endpoint = api_endpoint or config_endpoint
+        self.transport = transport or config_transport or ("rest" if self.api_endpoint else None)
         
-        self.config = ModelConfig()
-        self.key_manager = KeyRotationManager(
-            api_keys=self.api_keys,
-            strategy=key_strategy,
-            rate_limit=60,
-            reset_window=60
-        )
+        self.content_strategy = content_strategy
+        self.key_strategy = key_strategy
         self.system_instruction = system_instruction
-        self.generation_config = generation_config
-        self._strategy = self._create_strategy(content_strategy)
+        self.profiles = ConfigLoader.load_profiles(config_path)
+        self.client_pool = GeminiClientPool(self.api_endpoint, self.transport)
+        self.quota_ledger = create_quota_ledger(ConfigLoader.load_quota_ledger(config_path))
+        if generation_config is not None:
+            self.profiles["default"].generation_config = generation_config
+
+        # Mỗi profile có strategy và ngưỡng rate limit riêng, tạo khi dùng lần đầu
+        self._strategies: Dict[str, ContentStrategy] = {}
+        self._strategy = self._get_strategy("default")
+        self.config = self._strategy.config
+        self.key_manager = self._strategy.key_manager
+
+    def _get_strategy(self, profile_name: str) -> ContentStrategy:
+        strategy = self._strategies.get(profile_name)
+        if strategy is None:
+            profile = self.profiles.get(profile_name)
+            if profile is None:
+                print(f"Warning: Generation profile '{profile_name}' not configured, using default")
+                profile = self.profiles["default"]
+            strategy = self._strategies[profile_name] = self._create_strategy(
+                profile.strategy or self.content_strategy, profile
+            )
+        return strategy
+
+    def get_key_manager(self, profile_name: str = "default") -> KeyRotationManager:
+        return self._get_strategy(profile_name).key_manager
 
-    def _create_strategy(self, strategy: Strategy) -> ContentStrategy:
+    def _create_strategy(self, strategy: Strategy, profile: GenerationProfile) -> ContentStrategy:
         """Factory method to create appropriate strategy."""
         strategies = {
             Strategy.ROUND_ROBIN: RoundRobinStrategy,
@@ -483,35 +833,67 @@ class GeminiHandler:
             raise ValueError(f"Unknown strategy: {strategy}")
             
         return strategy_class(
-            config=self.config,
-            key_manager=self.key_manager,
+            config=ModelConfig(profile.models, profile.max_retries, profile.retry_delay),
+            key_manager=KeyRotationManager(
+                api_keys=self.api_keys,
+                strategy=self.key_strategy,
+                rate_limit=profile.requests_per_minute,
+                reset_window=profile.reset_window,
+                ledger=self.quota_ledger
+            ),
             system_instruction=self.system_instruction,
-            generation_config=self.generation_config
+            generation_config=profile.generation_config,
+            api_endpoint=self.api_endpoint,
+            transport=self.transport,
+            timeout=profile.timeout,
+            client_pool=self.client_pool
         )
 
     def generate_content(
         self,
         prompt: str,
         model_name: Optional[str] = None,
-        return_stats: bool = False
+        return_stats: bool = False,
+        profile: str = "default"
     ) -> Dict[str, Any]:
         """
         Generate content using the selected strategies.
         
         Args:
             prompt: The input prompt for content generation
-            model_name: Optional specific model to use (default: None)
+            model_name: Optional specific model to use (default: the profile's first model)
             return_stats: Whether to include key usage statistics (default: False)
+            profile: Name of the generation profile from config (default: "default")
             
         Returns:
             Dictionary containing generation results and optionally key statistics
         """
+        strategy = self._get_strategy(profile)
         if not model_name:
-            model_name = self.config.default_model
+            model_name = strategy.config.default_model
             
-        response = self._strategy.generate(prompt, model_name)
+        response = strategy.generate(prompt, model_name)
+        return self._format_result(response, strategy, return_stats)
+
+    async def generate_content_async(
+        self,
+        prompt: str,
+        model_name: Optional[str] = None,
+        return_stats: bool = False,
+        profile: str = "default"
+    ) -> Dict[str, Any]:
+        """Async variant of generate_content for ASGI serving (same arguments and result)."""
+        strategy = self._get_strategy(profile)
+        if not model_name:
+            model_name = strategy.config.default_model
+
+        response = await strategy.generate_async(prompt, model_name)
+        return self._format_result(response, strategy, return_stats)
+
+    @staticmethod
+    def _format_result(response: ModelResponse, strategy: ContentStrategy, return_stats: bool) -> Dict[str, Any]:
         result = response.__dict__
-        
+
         if return_stats:
             result["key_stats"] = {
                 idx: {
@@ -520,9 +902,9 @@ class GeminiHandler:
                     "failures": stats.failures,
                     "rate_limited_until": stats.rate_limited_until
                 }
-                for idx, stats in self.key_manager.key_stats.items()
+                for idx, stats in strategy.key_manager.key_stats.items()
             }
-            
+
         return result
 
     def get_key_stats(self, key_index: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
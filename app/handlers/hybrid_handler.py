@@ -1,12 +1,18 @@
 from .query_handler import QueryHandler
 from .faiss_handler import FaissHandler
 from .bm25_handler import BM25Handler
+from ..config.settings import Config
+from ..core.diversity import mmr_select
 from ..core.models.document import Document
 from ..core.repositories.index_repository import IndexRepository
-from typing import List, Dict
+from ..core.metrics import stage
+from dataclasses import replace
+from typing import List, Dict, Optional
+import numpy as np
 
 class HybridHandler(QueryHandler):
     def __init__(self, index_repo: IndexRepository, faiss_weight: float = 0.9, bm25_weight: float = 0.1):
+        self.index_repo = index_repo
         self.faiss_handler = FaissHandler(index_repo)
         self.bm25_handler = BM25Handler(index_repo)
         self.faiss_weight = faiss_weight
@@ -14,44 +20,77 @@ class HybridHandler(QueryHandler):
 
     def query(self, query: str, k: int, doc_type: str) -> List[Document]:
         # Lấy kết quả từ cả hai phương pháp
-        faiss_results = self.faiss_handler.query(query, k * 2, doc_type)  # Lấy thêm để dự phòng
-        bm25_results = self.bm25_handler.query(query, k * 2, doc_type)
-
-        # Tạo dictionary ánh xạ ID -> Document
-        document_map: Dict[str, Document] = {}
-        for res in faiss_results + bm25_results:
-            if res.id not in document_map:
-                document_map[res.id] = res
-
-        # Chuẩn hóa điểm Faiss về [0, 1]
-        faiss_scores = {}
-        for res in faiss_results:
-            if res.distance is not None:
-                similarity = 1.0 - res.distance  # Giả sử sử dụng cosine similarity
-                normalized_score = (similarity + 1) / 2  # Đưa về khoảng [0, 1]
-                faiss_scores[res.id] = normalized_score
-
-        # Chuẩn hóa điểm BM25 và xử lý chia cho 0
-        bm25_scores = {res.id: res.score for res in bm25_results if res.score is not None}
-        max_bm25 = max(bm25_scores.values(), default=0)
-        max_bm25_score = max_bm25 if max_bm25 > 0 else 1.0
-
-        # Kết hợp điểm số
-        combined_scores: Dict[str, float] = {}
-        all_ids = set(faiss_scores.keys()).union(bm25_scores.keys())
-        
-        for doc_id in all_ids:
-            faiss_score = faiss_scores.get(doc_id, 0.0)
-            bm25_score = (bm25_scores.get(doc_id, 0.0) / max_bm25_score) if max_bm25_score != 0 else 0.0
-            combined_score = (self.faiss_weight * faiss_score) + (self.bm25_weight * bm25_score)
-            combined_scores[doc_id] = combined_score
-
-        # Sắp xếp và chọn top k
-        sorted_ids = sorted(combined_scores, key=lambda x: combined_scores[x], reverse=True)[:k]
+        fetch = self.candidate_count(k)
+        faiss_results = self.faiss_handler.query(query, fetch, doc_type)  # Lấy thêm để dự phòng
+        bm25_results = self.bm25_handler.query(query, fetch, doc_type)
+        return self.fuse(faiss_results, bm25_results, k)
+
+    @staticmethod
+    def candidate_count(k: int) -> int:
+        """Results to fetch from each method; MMR needs a wider pool than the final ``k``."""
+        if Config.MMR_ENABLED:
+            return max(k * 2, Config.MMR_CANDIDATES // 2)
+        return k * 2
+
+    def fuse(self, faiss_results: List[Document], bm25_results: List[Document], k: int) -> List[Document]:
+        """
+        Weighted fusion of normalized FAISS and BM25 scores, top ``k`` (diversified with MMR if enabled).
+
+        Returned documents carry the fused score in ``score``; ``distance`` stays the FAISS distance, if any.
+        """
+        with stage("fusion"):
+            # Tạo dictionary ánh xạ ID -> Document
+            document_map: Dict[str, Document] = {}
+            for res in faiss_results + bm25_results:
+                if res.id not in document_map:
+                    document_map[res.id] = res
+
+            # Chuẩn hóa điểm Faiss về [0, 1]
+            faiss_scores = {}
+            for res in faiss_results:
+                if res.distance is not None:
+                    similarity = 1.0 - res.distance  # Giả sử sử dụng cosine similarity
+                    normalized_score = (similarity + 1) / 2  # Đưa về khoảng [0, 1]
+                    faiss_scores[res.id] = normalized_score
+
+            # Chuẩn hóa điểm BM25 và xử lý chia cho 0
+            bm25_scores = {res.id: res.score for res in bm25_results if res.score is not None}
+            max_bm25 = max(bm25_scores.values(), default=0)
+            max_bm25_score = max_bm25 if max_bm25 > 0 else 1.0
+
+            # Kết hợp điểm số
+            combined_scores: Dict[str, float] = {}
+            all_ids = set(faiss_scores.keys()).union(bm25_scores.keys())
         
-        # Tạo kết quả cuối cùng
-        results = []
-        for doc_id in sorted_ids:
-            results.append(document_map[doc_id])
-            
-        return results
\ No newline at end of file
+            for doc_id in all_ids:
+                faiss_score = faiss_scores.get(doc_id, 0.0)
+                bm25_score = (bm25_scores.get(doc_id, 0.0) / max_bm25_score) if max_bm25_score != 0 else 0.0
+                combined_score = (self.faiss_weight * faiss_score) + (self.bm25_weight * bm25_score)
+                combined_scores[doc_id] = combined_score
+
+            # Sắp xếp theo điểm kết hợp
+            sorted_ids = sorted(combined_scores, key=lambda x: combined_scores[x], reverse=True)
+
+        if Config.MMR_ENABLED and len(sorted_ids) > 1:
+            candidates = sorted_ids[:max(k, Config.MMR_CANDIDATES)]
+            picked = self.diversify(candidates, combined_scores, document_map, k)
+            if picked is not None:
+                return [replace(document_map[doc_id], score=combined_scores[doc_id]) for doc_id in picked]
+        return [replace(document_map[doc_id], score=combined_scores[doc_id]) for doc_id in sorted_ids[:k]]
+
+    def diversify(self, candidates: List[str], scores: Dict[str, float], document_map: Dict[str, Document], k: int) -> Optional[List[str]]:
+        """MMR over the fused candidates; None if some candidate has no stored vector."""
+        rows = [self.index_repo.row_of(doc_id) for doc_id in candidates]
+        if any(row is None for row in rows):
+            return None
+        with stage("mmr"):
+            picks = mmr_select(
+                np.array([scores[doc_id] for doc_id in candidates], dtype=np.float32),
+                self.index_repo.get_vectors(rows),
+                k,
+                lambda_mult=Config.MMR_LAMBDA,
+                groups=[document_map[doc_id].metadata.get("source") for doc_id in candidates],
+                per_group=Config.MMR_SOURCE_CAP,
+                duplicate_threshold=Config.MMR_DUPLICATE_THRESHOLD
+            )
+        return [candidates[i] for i in picks]
@@ -0,0 +1,66 @@
+import json
+import logging
+from typing import Dict, List
+import numpy as np
+from ..core.imaging import IMAGENET_MEAN, IMAGENET_STD
+
+logger = logging.getLogger(__name__)
+
+
+class LeafClassifier:
+    """
+    CPU leaf-disease classifier: an ONNX model (onnxruntime) or a TorchScript file.
+
+    The labels file is either a JSON list of class names or an object with
+    ``labels`` (names, or ``{"name", "catalogue_id", "class"}`` objects, where
+    ``class`` is the training folder name) and optional ``input_size``,
+    ``mean``, ``std`` matching the model's training and ``outputs``
+    ("logits", the default, or "probabilities"). ``app.cli.export_classifier``
+    writes both files from a trained PyTorch model.
+    """
+
+    def __init__(self, model_path: str, labels_path: str, threads: int = 0):
+        with open(labels_path, "r", encoding="utf-8") as f:
+            card = json.load(f)
+        if isinstance(card, list):
+            card = {"labels": card}
+        self.labels: List[Dict] = [
+            label if isinstance(label, dict) else {"name": label} for label in card["labels"]
+        ]
+        self.input_size = int(card.get("input_size", 224))
+        self.mean = tuple(card.get("mean", IMAGENET_MEAN))
+        self.std = tuple(card.get("std", IMAGENET_STD))
+        self.softmax = card.get("outputs", "logits") == "logits"
+
+        if model_path.endswith(".onnx"):
+            import onnxruntime  # tùy chọn: `pip install onnxruntime`
+            options = onnxruntime.SessionOptions()
+            if threads > 0:
+                options.intra_op_num_threads = threads
+                options.inter_op_num_threads = 1
+            self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            self.input_name = self.session.get_inputs()[0].name
+            self.model = None
+        else:
+            import torch
+            self.session = None
+            self.model = torch.jit.load(model_path, map_location="cpu").eval()
+
+        outputs = self.predict(np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32)).shape[1]
+        if outputs != len(self.labels):
+            raise ValueError(f"Classifier has {outputs} outputs but {labels_path} lists {len(self.labels)} labels")
+        logger.info(f"Leaf classifier loaded: {model_path} ({len(self.labels)} classes, {self.input_size}px)")
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Class probabilities, shape (n, classes), for a float32 NCHW batch."""
+        if self.session is not None:
+            logits = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            import torch
+            with torch.inference_mode():
+                logits = self.model(torch.from_numpy(batch)).numpy()
+        if not self.softmax:
+            return logits
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
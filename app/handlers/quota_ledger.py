@@ -0,0 +1,234 @@
+from abc import ABC, abstractmethod
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class KeyStats:
+    """Track usage statistics for each API key."""
+    uses: int = 0
+    last_used: float = 0
+    failures: int = 0
+    rate_limited_until: float = 0
+    window_start: float = 0
+
+
+class QuotaLedger(ABC):
+    """
+    Shared record of per-key usage windows, cooldowns and failure counts.
+
+    ``try_acquire`` must be atomic across every process sharing the ledger,
+    so N workers together stay within one key's rate limit. ``blocking``
+    ledgers do I/O and must not be called on an event loop.
+    """
+
+    blocking = True
+
+    @abstractmethod
+    def snapshot(self, key_ids: List[str]) -> Dict[str, KeyStats]:
+        """Current stats for the given keys (missing keys read as fresh)."""
+
+    @abstractmethod
+    def try_acquire(self, key_id: str, rate_limit: int, window: float) -> bool:
+        """Take one request slot for ``key_id`` if it is not cooling down or exhausted."""
+
+    @abstractmethod
+    def release(self, key_id: str, success: bool, cooldown: float = 0, rate_limit: int = 0) -> None:
+        """
+        Record the outcome of an acquired slot: success clears the failure count;
+        ``cooldown > 0`` marks the key rate limited for that many seconds.
+        """
+
+    @staticmethod
+    def _apply_acquire(stats: KeyStats, now: float, rate_limit: int, window: float) -> bool:
+        if now < stats.rate_limited_until:
+            return False
+        if now - stats.window_start >= window:
+            stats.window_start = now
+            stats.uses = 0
+        if stats.uses >= rate_limit:
+            return False
+        stats.uses += 1
+        stats.last_used = now
+        return True
+
+    @staticmethod
+    def _apply_release(stats: KeyStats, now: float, success: bool, cooldown: float, rate_limit: int) -> None:
+        if success:
+            stats.failures = 0
+        if cooldown > 0:
+            stats.failures += 1
+            stats.rate_limited_until = now + cooldown
+            stats.uses = max(stats.uses, rate_limit)
+
+
+class MemoryQuotaLedger(QuotaLedger):
+    """In-process ledger (per worker, lost on restart)."""
+
+    blocking = False
+
+    def __init__(self):
+        self._stats: Dict[str, KeyStats] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self, key_ids: List[str]) -> Dict[str, KeyStats]:
+        with self._lock:
+            return {key_id: KeyStats(**self._stats.get(key_id, KeyStats()).__dict__) for key_id in key_ids}
+
+    def try_acquire(self, key_id: str, rate_limit: int, window: float) -> bool:
+        with self._lock:
+            stats = self._stats.setdefault(key_id, KeyStats())
+            return self._apply_acquire(stats, time.time(), rate_limit, window)
+
+    def release(self, key_id: str, success: bool, cooldown: float = 0, rate_limit: int = 0) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(key_id, KeyStats())
+            self._apply_release(stats, time.time(), success, cooldown, rate_limit)
+
+
+class SQLiteQuotaLedger(QuotaLedger):
+    """
+    Ledger in a SQLite file shared by every worker on the host.
+
+    Writes run inside ``BEGIN IMMEDIATE`` so check-and-increment is atomic
+    across processes; state also survives restarts. If the file stays locked
+    past ``busy_timeout`` (or is otherwise unusable) the ledger logs a warning
+    instead of failing the request: ``try_acquire`` fails closed so the
+    caller backs off, ``release`` outcomes are queued and written with the
+    next transaction, and ``snapshot`` returns the last stats it read.
+    """
+
+    _COLUMNS = ("uses", "last_used", "failures", "rate_limited_until", "window_start")
+    _WARN_INTERVAL = 60.0  # seconds giữa hai cảnh báo fallback
+
+    def __init__(self, path: str, busy_timeout: float = 2.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        # Kết quả release chưa ghi được (file bị khóa) và snapshot đọc được gần nhất
+        self._pending: List[tuple] = []
+        self._pending_lock = threading.Lock()
+        self._last_stats: Dict[str, KeyStats] = {}
+        self._warned_at = 0.0
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS key_quota ("
+            "key_id TEXT PRIMARY KEY, uses INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL DEFAULT 0, "
+            "failures INTEGER NOT NULL DEFAULT 0, rate_limited_until REAL NOT NULL DEFAULT 0, "
+            "window_start REAL NOT NULL DEFAULT 0)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connection không dùng chung giữa các thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn: sqlite3.Connection, key_id: str) -> KeyStats:
+        row = conn.execute(
+            f"SELECT {', '.join(self._COLUMNS)} FROM key_quota WHERE key_id = ?", (key_id,)
+        ).fetchone()
+        return KeyStats(*row) if row else KeyStats()
+
+    def _write(self, conn: sqlite3.Connection, key_id: str, stats: KeyStats) -> None:
+        conn.execute(
+            f"INSERT OR REPLACE INTO key_quota (key_id, {', '.join(self._COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            (key_id, stats.uses, stats.last_used, stats.failures, stats.rate_limited_until, stats.window_start)
+        )
+
+    def _degraded(self, error: sqlite3.Error, fallback: Callable):
+        now = time.monotonic()
+        if now - self._warned_at >= self._WARN_INTERVAL:
+            self._warned_at = now
+            logger.warning(f"Quota ledger {self.path} unavailable ({error}), backing off until it is writable")
+        return fallback()
+
+    def _take_pending(self) -> List[tuple]:
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def _requeue(self, pending: List[tuple]) -> None:
+        with self._pending_lock:
+            self._pending[:0] = pending
+
+    def _update(self, key_id: str, apply: Callable[[KeyStats], bool], fallback: Callable) -> bool:
+        try:
+            conn = self._connection()
+            # Chờ tối đa busy_timeout nếu worker khác đang giữ khóa ghi
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            return self._degraded(e, fallback)
+        pending = self._take_pending()
+        try:
+            # Ghi bù các release bị hoãn trước, theo thời điểm chúng xảy ra
+            for pending_key, now, success, cooldown, rate_limit in pending:
+                stats = self._read(conn, pending_key)
+                self._apply_release(stats, now, success, cooldown, rate_limit)
+                self._write(conn, pending_key, stats)
+            stats = self._read(conn, key_id)
+            result = apply(stats)
+            self._write(conn, key_id, stats)
+            conn.execute("COMMIT")
+            return result
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._requeue(pending)
+            return self._degraded(e, fallback)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._requeue(pending)
+            raise
+
+    def snapshot(self, key_ids: List[str]) -> Dict[str, KeyStats]:
+        try:
+            conn = self._connection()
+            stats = {key_id: self._read(conn, key_id) for key_id in key_ids}
+        except sqlite3.Error as e:
+            return self._degraded(
+                e, lambda: {key_id: KeyStats(**self._last_stats.get(key_id, KeyStats()).__dict__) for key_id in key_ids}
+            )
+        self._last_stats.update(stats)
+        return stats
+
+    def try_acquire(self, key_id: str, rate_limit: int, window: float) -> bool:
+        # Không thấy bộ đếm chung thì không cấp slot: caller lùi lại rồi thử tiếp
+        return self._update(
+            key_id,
+            lambda stats: self._apply_acquire(stats, time.time(), rate_limit, window),
+            lambda: False
+        )
+
+    def release(self, key_id: str, success: bool, cooldown: float = 0, rate_limit: int = 0) -> None:
+        def defer() -> None:
+            with self._pending_lock:
+                self._pending.append((key_id, time.time(), success, cooldown, rate_limit))
+
+        self._update(
+            key_id,
+            lambda stats: self._apply_release(stats, time.time(), success, cooldown, rate_limit),
+            defer
+        )
+
+
+def create_quota_ledger(spec: Optional[str]) -> QuotaLedger:
+    """``None``/"memory" -> in-process ledger; anything else is a SQLite file path."""
+    if not spec or spec == "memory":
+        return MemoryQuotaLedger()
+    return SQLiteQuotaLedger(spec)
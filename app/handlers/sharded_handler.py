@@ -0,0 +1,88 @@
+import faiss
+import logging
+from typing import Dict, List, Tuple
+from .query_handler import QueryHandler
+from ..core.models.document import Document
+from ..core.metrics import SHARD_FALLBACKS, stage
+from ..core.repositories.index_repository import IndexRepository
+from ..core.repositories.shard_pool import ShardPool, ShardUnavailable
+from ..core.text.tokenizer import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedHandler(QueryHandler):
+    """
+    Scatter-gather retrieval over a ShardPool for the "faiss", "bm25" or "hybrid" strategy.
+
+    The query is embedded and tokenized once here; BM25 IDF and average
+    document length are sent with it so every shard scores against global
+    statistics. While shards are (re)building or any shard fails, the
+    in-process ``fallback`` handler answers instead.
+    """
+
+    def __init__(self, index_repo: IndexRepository, pool: ShardPool, strategy: str, fallback: QueryHandler):
+        self.index_repo = index_repo
+        self.pool = pool
+        self.strategy = strategy
+        self.fallback = fallback
+
+    def query(self, query: str, k: int, doc_type: str) -> List[Document]:
+        if not self.pool.ensure_ready():
+            SHARD_FALLBACKS.labels(reason="not_ready").inc()
+            return self.fallback.query(query, k, doc_type)
+        try:
+            return self._scatter_gather(query, k, doc_type)
+        except ShardUnavailable as e:
+            logger.warning(f"Sharded query failed, answering in-process: {e}")
+            SHARD_FALLBACKS.labels(reason="shard_failed").inc()
+            return self.fallback.query(query, k, doc_type)
+
+    def _scatter_gather(self, query: str, k: int, doc_type: str) -> List[Document]:
+        # Hybrid lấy dư ứng viên từ mỗi phương pháp, giống HybridHandler
+        fetch = self.fallback.candidate_count(k) if self.strategy == "hybrid" else k
+        request: Dict = {"doc_type": doc_type, "faiss_k": fetch, "bm25_k": fetch}
+        if self.strategy in ("faiss", "hybrid"):
+            with stage("embedding"):
+                request["vector"] = self.index_repo.encode_query(query)
+        if self.strategy in ("bm25", "hybrid"):
+            bm25 = self.index_repo.get_bm25_index(doc_type)
+            terms = get_tokenizer().tokenize_query(query)
+            request.update(
+                terms=terms,
+                idf={term: bm25.idf.get(term) or 0.0 for term in set(terms)},
+                avgdl=bm25.avgdl,
+                k1=bm25.k1,
+                b=bm25.b
+            )
+
+        with stage("shard_gather"):
+            replies = self.pool.search(request)
+
+        metadata = self.index_repo.get_metadata(doc_type)
+        faiss_hits = [hit for reply in replies for hit in reply["faiss"]]
+        bm25_hits = [hit for reply in replies for hit in reply["bm25"]]
+        # L2: khoảng cách nhỏ hơn là gần hơn; inner product thì ngược lại
+        ascending = self.index_repo.get_faiss_index(doc_type).metric_type == faiss.METRIC_L2
+        faiss_results = [
+            Document.from_row(metadata, row, distance=dist)
+            for row, dist in self._top(faiss_hits, fetch, metadata, doc_type, descending=not ascending)
+        ]
+        bm25_results = [
+            Document.from_row(metadata, row, score=score)
+            for row, score in self._top(bm25_hits, fetch, metadata, doc_type, descending=True)
+        ]
+
+        if self.strategy == "faiss":
+            return faiss_results
+        if self.strategy == "bm25":
+            return bm25_results
+        return self.fallback.fuse(faiss_results, bm25_results, k)
+
+    @staticmethod
+    def _top(hits: List[Tuple[int, float]], k: int, metadata: Dict, doc_type: str, descending: bool) -> List[Tuple[int, float]]:
+        hits = sorted(hits, key=lambda hit: -hit[1] if descending else hit[1])[:k]
+        return [
+            (row, value) for row, value in hits
+            if row < len(metadata["ids"]) and (doc_type is None or metadata["metadata"][row].get("type") == doc_type)
+        ]
@@ -0,0 +1,175 @@
+"""Standalone retrieval service: embedding model, FAISS and BM25 behind a small JSON API.
+
+Ví dụ:
+    gunicorn -w 2 -b 0.0.0.0:5100 "app.retrieval_service:create_retrieval_app()"
+    RETRIEVAL_SERVICE_URL=http://127.0.0.1:5100 gunicorn -w 8 "app:create_app()"
+
+Web worker khi đó không nạp torch/FAISS và khởi động rất nhanh; hai tầng scale độc lập.
+
+    POST /retrieve         {"queries": [{"query", "k", "doc_type", "strategy"}, ...]}
+    POST /encode           {"texts": [...]} -> {"vectors": {"shape", "data": base64 float32}}
+    GET  /health           version và số tài liệu
+    GET  /metrics          Prometheus (header X-Admin-Token hoặc Authorization: Bearer <ADMIN_TOKEN>)
+    POST/DELETE /admin/documents, POST /admin/compact, POST /admin/reload   (header X-Admin-Token)
+"""
+import logging
+import time
+from flask import Blueprint, Flask, Response, g, jsonify, request
+
+from .config.logging_config import configure_logging
+from .config.resources import configure_threads, effective_threads
+from .config.settings import Config
+from .core.metrics import REQUEST_SECONDS, render_metrics, scrape_authorized, start_request_timings
+from .core.repositories.index_repository import IndexRepository
+from .core.retrieval_client import encode_vectors
+from .core.services.ingestion_service import IngestionService
+from .core.services.query_service import QueryService
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("hybrid", "faiss", "bm25")
+MAX_BATCH = 64
+
+
+def create_retrieval_blueprint(index_repo: IndexRepository) -> Blueprint:
+    bp = Blueprint("retrieval", __name__)
+    query_service = QueryService(index_repo)
+    ingestion_service = IngestionService(index_repo)
+    ingestion_service.start_background_compaction()
+    ingestion_service.start_index_watcher()
+    ingestion_service.install_reload_signal()
+
+    def is_admin_request() -> bool:
+        token = request.headers.get("X-Admin-Token", "")
+        return bool(Config.ADMIN_TOKEN) and token == Config.ADMIN_TOKEN
+
+    @bp.route("/health", methods=["GET"])
+    def health():
+        return jsonify({
+            "status": "ok",
+            "version": index_repo.get_version(),
+            "bundle": index_repo.get_bundle_version(),
+            "documents": index_repo.get_faiss_index("banan").ntotal
+        })
+
+    @bp.route("/metrics", methods=["GET"])
+    def metrics():
+        if not scrape_authorized(request.headers):
+            return jsonify({"error": "Forbidden"}), 403
+        body, content_type = render_metrics()
+        return Response(body, content_type=content_type)
+
+    @bp.route("/retrieve", methods=["POST"])
+    def retrieve():
+        queries = (request.get_json(silent=True) or {}).get("queries")
+        if not isinstance(queries, list) or not queries or len(queries) > MAX_BATCH:
+            return jsonify({"error": f"'queries' must be a list of 1..{MAX_BATCH} items!"}), 400
+        ks = []
+        for item in queries:
+            if not isinstance(item, dict) or not str(item.get("query", "")).strip():
+                return jsonify({"error": "Each query requires a non-empty 'query'!"}), 400
+            if item.get("strategy", "hybrid") not in STRATEGIES:
+                return jsonify({"error": f"Unknown strategy: {item.get('strategy')}"}), 400
+            try:
+                ks.append(min(max(int(item.get("k", 5)), 1), 50))
+            except (TypeError, ValueError):
+                return jsonify({"error": f"Invalid k: {item.get('k')!r}"}), 400
+
+        # Embed cả batch một lần; các handler lấy lại từ cache embedding
+        index_repo.encode_queries([item["query"] for item in queries])
+        results = [
+            [
+                doc.to_dict() for doc in query_service.query(
+                    item["query"],
+                    k=k,
+                    doc_type=item.get("doc_type", "banan"),
+                    strategy=item.get("strategy", "hybrid")
+                )
+            ]
+            for item, k in zip(queries, ks)
+        ]
+        return jsonify({"version": index_repo.get_version(), "results": results})
+
+    @bp.route("/encode", methods=["POST"])
+    def encode():
+        texts = (request.get_json(silent=True) or {}).get("texts")
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return jsonify({"error": "'texts' must be a non-empty list of strings!"}), 400
+        # Câu hỏi đơn lẻ: dùng chung cache embedding với /retrieve
+        vectors = index_repo.encode_query(texts[0]) if len(texts) == 1 else index_repo.encode(texts)
+        return jsonify({"vectors": encode_vectors(vectors)})
+
+    @bp.route("/admin/documents", methods=["POST"])
+    def ingest_documents():
+        if not is_admin_request():
+            return jsonify({"error": "Forbidden"}), 403
+
+        documents = (request.get_json(silent=True) or {}).get("documents", [])
+        if not isinstance(documents, list) or not documents:
+            return jsonify({"error": "'documents' must be a non-empty list!"}), 400
+        try:
+            doc_ids = ingestion_service.add_documents(documents)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"added": doc_ids, "total": index_repo.get_faiss_index("banan").ntotal}), 201
+
+    @bp.route("/admin/documents", methods=["DELETE"])
+    def delete_documents():
+        if not is_admin_request():
+            return jsonify({"error": "Forbidden"}), 403
+
+        doc_ids = (request.get_json(silent=True) or {}).get("ids", [])
+        if not isinstance(doc_ids, list) or not doc_ids:
+            return jsonify({"error": "'ids' must be a non-empty list!"}), 400
+        deleted = ingestion_service.delete_documents(doc_ids)
+        return jsonify({"deleted": deleted, "pending_compaction": len(index_repo.get_deleted_rows())})
+
+    @bp.route("/admin/compact", methods=["POST"])
+    def compact_index():
+        if not is_admin_request():
+            return jsonify({"error": "Forbidden"}), 403
+        return jsonify({"removed": ingestion_service.compact(force=True)})
+
+    @bp.route("/admin/reload", methods=["POST"])
+    def reload_index():
+        if not is_admin_request():
+            return jsonify({"error": "Forbidden"}), 403
+        force = bool((request.get_json(silent=True) or {}).get("force", False))
+        if not ingestion_service.reload_in_background(force=force):
+            return jsonify({"error": "A reload is already in progress"}), 409
+        return jsonify({"reloading": True, "version": index_repo.get_version()}), 202
+
+    return bp
+
+
+def create_retrieval_app() -> Flask:
+    configure_logging()
+    # torch/FAISS/numpy đã nạp khi import module này: ngân sách được đặt trực tiếp
+    configure_threads()
+    logger.info(f"Thread budget: {effective_threads()}")
+    app = Flask(__name__)
+    app.register_blueprint(create_retrieval_blueprint(IndexRepository()))
+
+    # Không dùng init_request_timing: import app.routes sẽ nạp cả api.py (MongoDB, Gemini)
+    @app.before_request
+    def _start_timings():
+        g.request_timings = start_request_timings()
+
+    @app.after_request
+    def _finish_timings(response):
+        timings = getattr(g, "request_timings", None)
+        if timings is None or request.endpoint == "retrieval.metrics":
+            return response
+        response.headers["Server-Timing"] = timings.server_timing()
+        REQUEST_SECONDS.labels(
+            endpoint=request.endpoint or "unknown",
+            method=request.method,
+            status=str(response.status_code)
+        ).observe(time.perf_counter() - timings.start)
+        return response
+
+    logger.info(f"Retrieval service ready: {IndexRepository().get_faiss_index('banan').ntotal} documents")
+    return app
+
+
+__all__ = ["create_retrieval_app"]
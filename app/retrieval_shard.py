@@ -0,0 +1,123 @@
+"""Retrieval shard process: one FAISS + BM25 slice of the corpus.
+
+Module này cố ý chỉ dùng faiss/numpy (không import app.core) để process con
+được spawn không phải nạp torch và model embedding.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+class BM25Slice:
+    """
+    BM25 scoring for a subset of documents with inverted postings.
+
+    IDF and average document length come with each request, computed over
+    the whole corpus, so scores equal those of the unsharded index.
+    """
+
+    def __init__(self, rows: np.ndarray, doc_freqs: List[Dict[str, int]], doc_len: np.ndarray, deleted: set):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.doc_len = np.asarray(doc_len, dtype=np.float64)
+        self.deleted_mask = np.isin(self.rows, np.fromiter(deleted, dtype=np.int64, count=len(deleted)))
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for position, freqs in enumerate(doc_freqs):
+            for term, freq in freqs.items():
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(position)
+                entry[1].append(freq)
+        self.postings = {
+            term: (np.array(positions, dtype=np.int64), np.array(freqs, dtype=np.float64))
+            for term, (positions, freqs) in postings.items()
+        }
+
+    def scores(self, terms: List[str], idf: Dict[str, float], avgdl: float, k1: float, b: float) -> np.ndarray:
+        score = np.zeros(len(self.rows))
+        norm = k1 * (1 - b + b * self.doc_len / avgdl)
+        # Term lặp lại được cộng nhiều lần, giống BM25Okapi.get_scores
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            positions, freqs = posting
+            score[positions] += idf.get(term, 0.0) * freqs * (k1 + 1) / (freqs + norm[positions])
+        score[self.deleted_mask] = -1.0
+        return score
+
+    def top_k(self, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self.rows[i]), float(scores[i])) for i in top if scores[i] >= 0.0]
+
+
+class IndexShard:
+    """FAISS ID map and BM25 slices for the rows assigned to one shard (row ids are global)."""
+
+    def __init__(self, payload: Dict):
+        self.shard_id = payload["shard_id"]
+        self.deleted = set(payload["deleted"])
+        self.faiss_index = faiss.IndexIDMap2(faiss.IndexFlat(payload["dim"], payload["metric_type"]))
+        if len(payload["faiss_rows"]):
+            self.faiss_index.add_with_ids(payload["vectors"], payload["faiss_rows"])
+        self.bm25 = {
+            name: BM25Slice(part["rows"], part["doc_freqs"], part["doc_len"], self.deleted)
+            for name, part in payload["bm25"].items()
+        }
+
+    @property
+    def size(self) -> int:
+        return int(self.faiss_index.ntotal)
+
+    def search(self, request: Dict) -> Dict:
+        start = time.perf_counter()
+        reply: Dict = {"faiss": [], "bm25": []}
+
+        if request.get("vector") is not None and self.faiss_index.ntotal:
+            fetch = min(request["faiss_k"] + len(self.deleted), self.faiss_index.ntotal)
+            distances, rows = self.faiss_index.search(request["vector"], fetch)
+            reply["faiss"] = [
+                (int(row), float(dist)) for dist, row in zip(distances[0], rows[0])
+                if row >= 0 and row not in self.deleted
+            ][:request["faiss_k"]]
+
+        if request.get("terms") is not None:
+            bm25 = self.bm25.get(request["doc_type"]) or self.bm25["banan"]
+            scores = bm25.scores(request["terms"], request["idf"], request["avgdl"], request["k1"], request["b"])
+            reply["bm25"] = bm25.top_k(scores, request["bm25_k"])
+
+        reply["seconds"] = time.perf_counter() - start
+        return reply
+
+
+def run_shard(conn, threads: int = 0) -> None:
+    """Serve ("build" | "search" | "stop") requests from the coordinator until the pipe closes."""
+    if threads > 0:
+        # Các shard của một worker tìm song song: chia nhau phần thread FAISS của worker
+        faiss.omp_set_num_threads(threads)
+    shard: Optional[IndexShard] = None
+    while True:
+        try:
+            request_id, op, payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if op == "build":
+                shard = IndexShard(payload)
+                value = shard.size
+            elif op == "search":
+                if shard is None:
+                    raise RuntimeError("shard not built")
+                value = shard.search(payload)
+            elif op == "stop":
+                conn.send((request_id, True, None))
+                return
+            else:
+                raise ValueError(f"Unknown shard op: {op}")
+            conn.send((request_id, True, value))
+        except Exception as e:
+            conn.send((request_id, False, repr(e)))
@@ -1,3 +1,5 @@
 from .api import api_bp
+from .assets import assets_bp, load_built_templates
+from .metrics import metrics_bp, init_request_timing
 
-__all__ = ["api_bp"]
\ No newline at end of file
+__all__ = ["api_bp", "assets_bp", "load_built_templates", "metrics_bp", "init_request_timing"]
\ No newline at end of file
@@ -1,17 +1,40 @@
-from flask import Blueprint, request, jsonify, redirect, url_for, session, render_template
+from flask import Blueprint, request, jsonify, redirect, url_for, session, g
 from datetime import datetime
 from langchain.memory import ConversationBufferMemory
+import hashlib
 import json
-from typing import List, Dict
+import math
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextvars import copy_context
+from functools import wraps
+from typing import List, Dict, Tuple
 import re
 import bcrypt
+import time
 from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError
 
 # Giả định các service/repository đã được định nghĩa
 from ..core.services.query_service import QueryService
 from ..core.services.gemini_service import GeminiService
+from ..core.services.catalogue_service import CatalogueService
+from ..core.services.search_service import SearchService, CursorExpired, DEFAULT_FIELDS
+from ..core.services.diagnosis_service import DiagnosisService, ClassifierFailed, ClassifierUnavailable
+from ..core.services.ingestion_service import IngestionService
+from ..core.services.related_question_service import RelatedQuestionService, DEFAULT_QUESTIONS
+from ..core.services.extractive_answer_service import ExtractiveAnswerService
+from ..config.settings import Config
+from ..core.metrics import record_stage
+from ..core.prompts import build_query_prompt, build_query_related_prompt, build_related_questions_prompt
+from ..core.batching import BatcherBusy
+from ..core.imaging import read_limited
+from ..core.admission import AdmissionController, AdmissionRejected, PRIORITY_ANONYMOUS, PRIORITY_AUTHENTICATED, deadline_scope
+from ..core.recording import RequestRecorder
+from ..core.retrieval_client import RetrievalClient
 from ..core.repositories.index_repository import IndexRepository
+from ..core.repositories.question_bank_repository import QuestionBankRepository
+from ..handlers.gemini_handler import KeyPoolExhausted
+from .assets import render_page
 
 api_bp = Blueprint('api', __name__)
 
@@ -22,9 +45,26 @@ users_collection = db['users']
 users_collection.create_index('email', unique=True)
 
 # Khởi tạo các service/repository
-index_repo = IndexRepository()
-query_service = QueryService(index_repo)
+# Có RETRIEVAL_SERVICE_URL: retrieval chạy ở service riêng, web worker không nạp torch/FAISS
+retrieval_client = RetrievalClient() if Config.RETRIEVAL_SERVICE_URL else None
+index_repo = None if retrieval_client else IndexRepository()
+encoder = retrieval_client or index_repo
+query_service = QueryService(index_repo, retrieval_client=retrieval_client)
 gemini_service = GeminiService()
+catalogue_service = CatalogueService()
+search_service = SearchService(query_service)
+diagnosis_service = DiagnosisService(catalogue_service, query_service)
+ingestion_service = IngestionService(index_repo) if index_repo else None
+if ingestion_service:
+    ingestion_service.start_background_compaction()
+    # Hot reload bundle index: file watcher cho mọi worker, SIGUSR2 cho từng worker
+    ingestion_service.start_index_watcher()
+    ingestion_service.install_reload_signal()
+request_recorder = RequestRecorder()
+related_question_service = RelatedQuestionService(encoder, QuestionBankRepository())
+admission_controller = AdmissionController()
+extractive_answer_service = ExtractiveAnswerService(encoder)
+llm_executor = ThreadPoolExecutor(max_workers=Config.LLM_MAX_CONCURRENT * 2, thread_name_prefix="llm")
 
 # Khởi tạo ConversationBufferMemory
 memory = ConversationBufferMemory(
@@ -33,6 +73,8 @@ memory = ConversationBufferMemory(
     max_message_limit=10,
     max_token_limit=1000
 )
+# Lưu vào lịch sử thay cho câu trả lời trích xuất: prompt sau không coi nó là lời của mô hình
+EXTRACTIVE_MEMORY_NOTE = "(Không có câu trả lời từ mô hình; người dùng đã nhận trích đoạn tài liệu tham khảo.)"
 
 def preprocess_related_questions(related_questions_input: str | List[Dict[str, str]]) -> List[Dict[str, str]]:
     fallback_questions = [
@@ -96,10 +138,30 @@ def format_chat_history(memory):
         formatted.append(f"{role.capitalize()}: {content}")
     return "\n".join(formatted)
 
+def top_documents(results: List) -> List[Dict]:
+    return [
+        {"source": r.metadata["source"], "text": r.text, "distance": r.distance, **r.__dict__}
+        for r in results if r.distance is not None and r.distance != 0
+    ]
+
+def generate_related_questions(question: str) -> List[Dict[str, str]]:
+    # Ưu tiên ngân hàng câu hỏi (tra cứu láng giềng gần, không gọi LLM)
+    if Config.RELATED_QUESTIONS_SOURCE == "bank" and related_question_service.is_available():
+        return related_question_service.suggest(question)
+    if g.get("llm_unavailable"):
+        return DEFAULT_QUESTIONS
+
+    related_questions_prompt = build_related_questions_prompt(question)
+    try:
+        related_questions = gemini_service.generate_content(related_questions_prompt, profile="related_questions")
+        return preprocess_related_questions(related_questions)
+    except Exception:
+        return DEFAULT_QUESTIONS
+
 @api_bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "GET":
-        return render_template("register.html")
+        return render_page("register.html")
     
     data = request.form if request.form else request.get_json(silent=True) or {}
     email = data.get("email", "").strip()
@@ -108,7 +170,7 @@ def register():
 
     if not email or not password or not name:
         if request.form:
-            return render_template("register.html", error="Email, password, and name are required!")
+            return render_page("register.html", error="Email, password, and name are required!")
         return jsonify({"error": "Email, password, and name are required!"}), 400
 
     hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
@@ -122,17 +184,17 @@ def register():
         })
     except DuplicateKeyError:
         if request.form:
-            return render_template("register.html", error="Email already exists!")
+            return render_page("register.html", error="Email already exists!")
         return jsonify({"error": "Email already exists!"}), 400
 
     if request.form:
-        return render_template("register.html", message="Registration successful! Please log in.")
+        return render_page("register.html", message="Registration successful! Please log in.")
     return jsonify({"message": "Registration successful! Please log in."}), 201
 
 @api_bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "GET":
-        return render_template("login.html")
+        return render_page("login.html")
     
     data = request.form if request.form else request.get_json(silent=True) or {}
     email = data.get("email", "").strip()
@@ -140,13 +202,13 @@ def login():
 
     if not email or not password:
         if request.form:
-            return render_template("login.html", error="Email and password are required!")
+            return render_page("login.html", error="Email and password are required!")
         return jsonify({"error": "Email and password are required!"}), 400
 
     user = users_collection.find_one({"email": email})
     if not user:
         if request.form:
-            return render_template("login.html", error="Invalid email or password!")
+            return render_page("login.html", error="Invalid email or password!")
         return jsonify({"error": "Invalid email or password!"}), 401
 
     if bcrypt.checkpw(password.encode('utf-8'), user["password"]):
@@ -156,7 +218,7 @@ def login():
         return jsonify({"message": "Login successful!", "user": session["user"]}), 200
     else:
         if request.form:
-            return render_template("login.html", error="Invalid email or password!")
+            return render_page("login.html", error="Invalid email or password!")
         return jsonify({"error": "Invalid email or password!"}), 401
 
 @api_bp.route("/logout", methods=["GET", "POST"])
@@ -166,7 +228,235 @@ def logout():
         return redirect(url_for("home.home"))
     return jsonify({"message": "Logged out successfully"}), 200
 
+@api_bp.route("/catalogue/search", methods=["GET"])
+def catalogue_search():
+    question = request.args.get("q", "").strip()
+    if not question:
+        return jsonify({"error": "Missing query parameter 'q'!"}), 400
+
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "Invalid limit!"}), 400
+    prefix = request.args.get("prefix", "1").lower() not in ("0", "false", "no")
+    full = request.args.get("full", "0").lower() in ("1", "true", "yes")
+
+    return jsonify(catalogue_service.search(question, k=limit, prefix=prefix, full=full))
+
+def optional_float(name: str):
+    value = request.args.get(name, "").strip()
+    return float(value) if value else None
+
+@api_bp.route("/search", methods=["GET"])
+def search():
+    # Chỉ retrieval, không gọi LLM nên không qua admission control
+    question = request.args.get("q", "").strip()
+    if not question:
+        return jsonify({"error": "Missing query parameter 'q'!"}), 400
+    strategy = request.args.get("strategy", "hybrid").lower()
+    doc_type = request.args.get("doc_type", "banan")
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()] or DEFAULT_FIELDS
+    try:
+        k = min(max(int(request.args.get("k", 10)), 1), 50)
+        min_score = optional_float("min_score")
+        max_distance = optional_float("max_distance")
+    except ValueError:
+        return jsonify({"error": "Invalid k, min_score or max_distance!"}), 400
+
+    try:
+        # Cùng tham số + cùng version index thì kết quả không đổi: trả 304 trước khi truy vấn.
+        # Trong try: lấy version có thể nạp collection, và collection lỗi là doc_type không hợp lệ
+        version = search_service.version(doc_type) if doc_type in search_service.doc_types() else None
+        etag = hashlib.sha1(f"{version}?{request.query_string.decode('utf-8', 'replace')}".encode("utf-8")).hexdigest()[:20]
+        if version is not None and etag in request.if_none_match:
+            return "", 304, {"ETag": f'"{etag}"'}
+        result = search_service.search(
+            question, k=k, strategy=strategy, doc_type=doc_type, min_score=min_score,
+            max_distance=max_distance, fields=fields, cursor=request.args.get("cursor")
+        )
+    except CursorExpired as e:
+        return jsonify({"error": f"Cursor expired, restart the search: {e}"}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = jsonify(result)
+    if version is not None:
+        response.set_etag(etag)
+    return response
+
+@api_bp.route("/diagnose", methods=["POST"])
+def diagnose():
+    # Phân loại ảnh lá trên CPU, không gọi LLM
+    upload = request.files.get("image")
+    if upload is None:
+        return jsonify({"error": "Missing image file 'image'!"}), 400
+    try:
+        top_k = min(max(int(request.form.get("top_k", 3)), 1), 10)
+        context_k = min(max(int(request.form.get("context_k", 3)), 0), 10)
+    except ValueError:
+        return jsonify({"error": "Invalid top_k or context_k!"}), 400
+
+    try:
+        data = read_limited(upload.stream, Config.CLASSIFIER_MAX_IMAGE_MB * 1024 * 1024)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    try:
+        return jsonify(diagnosis_service.diagnose(data, top_k=top_k, context_k=context_k))
+    except ClassifierUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except ClassifierFailed:
+        # Chi tiết đã được ghi log trong batcher, không lộ lỗi nội bộ ra ngoài
+        return jsonify({"error": "Không thể chẩn đoán ảnh lúc này, vui lòng thử lại sau."}), 503
+    except (BatcherBusy, FutureTimeout):
+        response = jsonify({"error": "Hệ thống đang quá tải, vui lòng thử lại sau ít phút.", "retry_after": 1})
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def is_admin_request() -> bool:
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(Config.ADMIN_TOKEN) and token == Config.ADMIN_TOKEN
+
+def remote_index_response():
+    """Index writes go to the retrieval service when one is configured."""
+    return jsonify({"error": f"Index is managed by the retrieval service at {Config.RETRIEVAL_SERVICE_URL}"}), 409
+
+def login_required(view):
+    """401 before the view (and before admission control) when nobody is logged in."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if "user" not in session:
+            return jsonify({"error": "Please log in first!"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def admission_controlled(view):
+    """Run an LLM-backed view under admission control; shed overload as 503 + Retry-After."""
+    def overloaded(retry_after: float):
+        retry_after = max(1, math.ceil(retry_after))
+        response = jsonify({
+            "error": "Hệ thống đang quá tải, vui lòng thử lại sau ít phút.",
+            "retry_after": retry_after
+        })
+        response.status_code = 503
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        priority = PRIORITY_AUTHENTICATED if "user" in session else PRIORITY_ANONYMOUS
+        try:
+            with admission_controller.admit(priority, saturation_wait=gemini_service.saturation_wait()):
+                return view(*args, **kwargs)
+        except (AdmissionRejected, KeyPoolExhausted) as e:
+            if getattr(e, "reason", None) != "keys_cooling_down" or not Config.ANSWER_FALLBACK:
+                return overloaded(e.retry_after)
+        # Hết quota key nhưng CPU còn rảnh: trả lời trích xuất thay vì 503,
+        # vẫn giữ một slot để fallback không vượt giới hạn đồng thời
+        g.llm_unavailable = True
+        try:
+            with admission_controller.admit(priority, saturation_wait=0):
+                return view(*args, **kwargs)
+        except AdmissionRejected as e:
+            return overloaded(e.retry_after)
+    return wrapper
+
+def generate_answer(question: str, main_prompt: str, results: List) -> Tuple[str, str]:
+    """Return ``(answer, source)``: Gemini's answer, or the extractive fallback when the LLM is unavailable or slow."""
+    if g.get("llm_unavailable"):
+        return extractive_answer_service.answer(question, results), "extractive"
+
+    if Config.ANSWER_SPECULATIVE_TIMEOUT > 0 and Config.ANSWER_FALLBACK:
+        # Gọi LLM song song, trong lúc đó dựng sẵn câu trả lời trích xuất. Thread
+        # không hủy được: deadline riêng giới hạn timeout HTTP và chặn retry, nên
+        # lời gọi bị bỏ dở cũng kết thúc cùng lúc thay vì tiếp tục tiêu quota
+        def speculative_answer():
+            with deadline_scope(Config.ANSWER_SPECULATIVE_TIMEOUT):
+                return gemini_service.try_generate_content(main_prompt)
+        future = llm_executor.submit(copy_context().run, speculative_answer)
+        draft = extractive_answer_service.draft(question, results)
+        reason = "unavailable"
+        try:
+            answer = future.result(timeout=Config.ANSWER_SPECULATIVE_TIMEOUT)
+        except FutureTimeout:
+            answer, reason = None, "timeout"
+        except KeyPoolExhausted:
+            answer, reason = None, "overloaded"
+        return (answer, "llm") if answer else (extractive_answer_service.with_note(draft, reason), "extractive")
+
+    reason = "unavailable"
+    try:
+        answer = gemini_service.try_generate_content(main_prompt)
+    except KeyPoolExhausted:
+        answer, reason = None, "overloaded"
+    if answer:
+        return answer, "llm"
+    if Config.ANSWER_FALLBACK:
+        return extractive_answer_service.answer(question, results, reason), "extractive"
+    return "No response from model", "llm"
+
+def remember(question: str, answer: str, answer_source: str) -> None:
+    """Save the exchange to the chat memory; an extractive fallback is stored as a marker, not as the model's answer."""
+    memory.save_context({"question": question}, {"answer": answer if answer_source == "llm" else EXTRACTIVE_MEMORY_NOTE})
+
+@api_bp.route("/admin/documents", methods=["POST"])
+def ingest_documents():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    if ingestion_service is None:
+        return remote_index_response()
+
+    data = request.get_json(silent=True) or {}
+    documents = data.get("documents", [])
+    if not isinstance(documents, list) or not documents:
+        return jsonify({"error": "'documents' must be a non-empty list!"}), 400
+
+    try:
+        doc_ids = ingestion_service.add_documents(documents)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"added": doc_ids, "total": index_repo.get_faiss_index("banan").ntotal}), 201
+
+@api_bp.route("/admin/documents", methods=["DELETE"])
+def delete_documents():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    if ingestion_service is None:
+        return remote_index_response()
+
+    data = request.get_json(silent=True) or {}
+    doc_ids = data.get("ids", [])
+    if not isinstance(doc_ids, list) or not doc_ids:
+        return jsonify({"error": "'ids' must be a non-empty list!"}), 400
+
+    deleted = ingestion_service.delete_documents(doc_ids)
+    return jsonify({"deleted": deleted, "pending_compaction": len(index_repo.get_deleted_rows())})
+
+@api_bp.route("/admin/compact", methods=["POST"])
+def compact_index():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    if ingestion_service is None:
+        return remote_index_response()
+    return jsonify({"removed": ingestion_service.compact(force=True)})
+
+@api_bp.route("/admin/reload", methods=["POST"])
+def reload_index():
+    """Hot-reload this worker's index in the background (other workers pick it up via the watcher)."""
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    if ingestion_service is None:
+        return remote_index_response()
+
+    force = bool((request.get_json(silent=True) or {}).get("force", False))
+    if not ingestion_service.reload_in_background(force=force):
+        return jsonify({"error": "A reload is already in progress"}), 409
+    return jsonify({"reloading": True, "version": index_repo.get_version(), "bundle": index_repo.get_bundle_version()}), 202
+
 @api_bp.route("/query", methods=["POST"])
+@admission_controlled
 def query():
     data = request.get_json(silent=True) or {}
     question = data.get("question", "").strip()
@@ -176,128 +466,38 @@ def query():
     # Query dữ liệu tham khảo
     results = query_service.query(question, k=5, doc_type="banan", strategy="hybrid")
 
-    top_pdf_docs = [
-        {"source": r.metadata["source"], "text": r.text, "distance": r.distance, **r.__dict__}
-        for r in results if r.distance is not None and r.distance != 0
-    ]
+    top_pdf_docs = top_documents(results)
 
+    prompt_start = time.perf_counter()
     chat_history_str = format_chat_history(memory)
 
     # Prompt for main answer
-    main_prompt = f"""
-Dưới đây là lịch sử hội thoại trước đó:
-{chat_history_str}
-
-Bạn là chuyên gia nông nghiệp với hơn 30 năm kinh nghiệm trong lĩnh vực bệnh cây trồng tại Việt Nam. Bạn sẽ phân tích câu hỏi về bệnh nông nghiệp theo các bước chi tiết dưới đây để cung cấp câu trả lời chính xác, rõ ràng, dễ áp dụng, trích dẫn thông tin từ dữ liệu tham khảo nếu có.
-
-**Câu hỏi:**  
-{question}
-
-**Thông tin tham khảo:**  
-{top_pdf_docs if top_pdf_docs else "Không tìm thấy thông tin từ PDF. Phân tích dựa trên dữ liệu bệnh và kiến thức nông nghiệp."}
-
-
-**Hướng dẫn trả lời chi tiết:**
-** Chú ý nếu xác định đầu vào là câu hỏi thì tập trung vào trả lời câu hỏi liên quan. ngược lại nếu đầu vào là  tên bệnh thì trả lời theo các bước sau: **
-
-1. **Tên bệnh:**  
-   - Xác định và nêu rõ tên bệnh liên quan đến câu hỏi (nếu có trong dữ liệu tham khảo).
-   - Nếu không có dữ liệu cụ thể, đề xuất bệnh có thể liên quan dựa trên triệu chứng hoặc cây trồng được nhắc đến.
-
-2. **Triệu chứng:**  
-   - Mô tả rõ các triệu chứng của bệnh, dựa trên dữ liệu tham khảo hoặc kiến thức chung.
-   - Nêu các dấu hiệu nhận biết trên cây trồng (lá, thân, quả, v.v.).
-
-3. **Cách điều trị:**  
-   - Đề xuất phương pháp điều trị cụ thể, bao gồm thuốc trừ sâu, biện pháp sinh học, hoặc kỹ thuật canh tác.
-   - Trích dẫn từ dữ liệu tham khảo nếu có (thuốc, liều lượng, thời điểm phun).
-
-4. **Bệnh liên quan:**  
-   - Liệt kê các bệnh khác thường xuất hiện cùng hoặc có triệu chứng tương tự trên cùng loại cây trồng.
-   - Giải thích ngắn gọn mối liên hệ giữa các bệnh này.
-
-6. **Lưu ý quan trọng:**
-   - Không được phép đề cập đến án lệ, bản án, hoặc các vấn đề pháp lý.
-   - Không cần giới thiệu bản thân, không đề cập đến kinh nghiệm tư vấn.
-   - Không cần đề cập đến nguồn tài liệu tham khảo.
-   - Tập trung trả lời câu hỏi của nông dân.
-   - Trả lời ngắn gọn, súc tích, đúng trọng tâm.
-   - Nêu các lưu ý khi áp dụng phương pháp điều trị (thời điểm, an toàn lao động, môi trường).
-   - Đảm bảo trả lời ngắn gọn, súc tích, đúng trọng tâm.
-   - Không sử dụng từ "giả sử" hoặc "ví dụ".
-   - Trình bày rõ ràng, sử dụng định dạng danh sách (-), in đậm (**text**) cho các tiêu đề và điểm quan trọng.
-
-**Định dạng trả lời:**
-- **Tên bệnh**: [Tên bệnh]
-- **Triệu chứng**: [Mô tả triệu chứng]
-- **Cách điều trị**: [Phương pháp điều trị]
-- **Bệnh liên quan**: [Danh sách bệnh liên quan]
-- **Lưu ý quan trọng**: [Các lưu ý]
-"""
+    main_prompt = build_query_prompt(question, top_pdf_docs, chat_history_str)
+    record_stage("prompt_build", time.perf_counter() - prompt_start)
     # Generate the main answer
-    answer = gemini_service.generate_content(main_prompt)
-
-    # Prompt cho câu hỏi liên quan
-    related_questions_prompt = f"""
-Bạn là chuyên gia nông nghiệp Việt Nam. Dựa trên câu hỏi về bệnh cây trồng được cung cấp, hãy sinh ra 5 câu hỏi liên quan, đảm bảo các câu hỏi:
-
-- Liên quan chặt chẽ đến chủ đề bệnh cây trồng trong câu hỏi gốc.
-- Phù hợp với nông nghiệp Việt Nam hiện hành.
-- Ngắn gọn, rõ ràng, và mang tính ứng dụng thực tế.
-- Tập trung vào tên bệnh, triệu chứng, cách điều trị, hoặc bệnh liên quan.
-- Được trình bày dưới dạng danh sách JSON, mỗi câu hỏi là một đối tượng với key `question`.
-
-**Câu hỏi gốc:**  
-{question}
-
-**Hướng dẫn thêm:**
-- Nếu câu hỏi gốc đề cập đến một cây trồng cụ thể (ví dụ: cà chua, lúa), sinh ra các câu hỏi liên quan đến cây đó.
-- Nếu câu hỏi không rõ cây trồng, sinh ra các câu hỏi liên quan đến bệnh phổ biến trong nông nghiệp Việt Nam.
-- Không sử dụng từ "giả sử" hoặc "ví dụ".
-- Không lặp lại câu hỏi gốc.
-- Đảm bảo các câu hỏi không trùng lặp nội dung.
-
-**Định dạng đầu ra (JSON):**  
-[
-  {{"question": "Câu hỏi 1"}},
-  {{"question": "Câu hỏi 2"}},
-  {{"question": "Câu hỏi 3"}},
-  {{"question": "Câu hỏi 4"}},
-  {{"question": "Câu hỏi 5"}}
-]
-"""
-
-    # Parse related_questions to ensure it's a valid JSON list (assuming gemini_service returns a JSON string)
-    try:
-        related_questions = gemini_service.generate_content(related_questions_prompt)
-        # Preprocess the questions (handles both string and list inputs)
-        related_questions = preprocess_related_questions(related_questions)
-    except (json.JSONDecodeError, ValueError, Exception) as e:        # Fallback to default questions if generation fails
-        related_questions = [
-            {"question": "Cách nhận biết sớm các bệnh phổ biến trên cây cà chua?"},
-            {"question": "Những loại thuốc nào an toàn để trị bệnh trên cây lúa?"},
-            {"question": "Bệnh nhện đỏ trên cây trồng có thể phòng ngừa như thế nào?"},
-            {"question": "Các bệnh nào thường xuất hiện cùng với bệnh nấm trên cây?"},
-            {"question": "Chế độ tưới nước ảnh hưởng thế nào đến bệnh cây trồng?"}
-        ]
+    answer, answer_source = generate_answer(question, main_prompt, results)
+
+    related_questions = generate_related_questions(question)
 
     # Save context to memory
-    memory.save_context({"question": question}, {"answer": answer})
+    remember(question, answer, answer_source)
+    request_recorder.record("/api/query", question, "hybrid", 5, "banan", [r.id for r in results])
 
     # Return JSON response with related questions included
     return jsonify({
         "final_response": answer,
+        "answer_source": answer_source,
         "top_banan_documents": top_pdf_docs,
+        "retrieved_ids": [r.id for r in results],
         "chat_history": chat_history_str,
         "related_questions": related_questions
     })
 
 
 @api_bp.route("/query_related", methods=["POST"])
+@login_required
+@admission_controlled
 def query_related():
-    if "user" not in session:
-        return jsonify({"error": "Please log in first!"}), 401
-
     user_info = session["user"]
     data = request.get_json(silent=True) or {}
     question = data.get("question", "").strip()
@@ -305,85 +505,25 @@ def query_related():
         return jsonify({"error": "Invalid question!"}), 400
 
     results = query_service.query(question, k=5, doc_type="banan", strategy="hybrid")
-    top_pdf_docs = [
-        {"source": r.metadata["source"], "text": r.text, "distance": r.distance, **r.__dict__}
-        for r in results if r.distance is not None and r.distance != 0
-    ]
+    top_pdf_docs = top_documents(results)
 
+    prompt_start = time.perf_counter()
     chat_history_str = format_chat_history(memory)
 
-    main_prompt = f"""
-Dưới đây là lịch sử hội thoại trước đó:
-{chat_history_str}
-
-Bạn là chuyên gia nông nghiệp với hơn 30 năm kinh nghiệm. 
-Người dùng: {user_info.get('name', 'Anonymous')} (Email: {user_info.get('email', 'N/A')})
-**Câu hỏi:**  
-{question}
-
-**Thông tin tham khảo (từ PDF):**  
-{top_pdf_docs if top_pdf_docs else "Không có thông tin từ PDF. Phân tích dựa trên kiến thức nông nghiệp."}
-
-Trả lời cần:  
-- Tập trung trả lời câu hỏi của nông dân.
-- Đưa ra nguyên nhân gây bệnh.
-- Đề xuất phương pháp điều trị/phòng ngừa hiệu quả.
-
-**Lưu ý quan trọng:**
-- Không cần giới thiệu bản thân, không đề cập đến kinh nghiệm tư vấn.
-- Trả lời ngắn gọn, súc tích, đúng trọng tâm.
-- Nêu các lưu ý khi áp dụng phương pháp điều trị (thời điểm, an toàn lao động, môi trường).
-- Đảm bảo trả lời ngắn gọn, súc tích, đúng trọng tâm.
-- Không sử dụng từ "giả sử" hoặc "ví dụ".
-- Trình bày rõ ràng, sử dụng định dạng danh sách (-), in đậm (**text**) cho các tiêu đề và điểm quan trọng.
-"""
-    answer = gemini_service.generate_content(main_prompt)
-
-    related_questions_prompt = f"""
-Bạn là chuyên gia nông nghiệp Việt Nam. Dựa trên câu hỏi về bệnh cây trồng được cung cấp, hãy sinh ra 5 câu hỏi liên quan, đảm bảo các câu hỏi:
-
-- Liên quan chặt chẽ đến chủ đề bệnh cây trồng trong câu hỏi gốc.
-- Phù hợp với nông nghiệp Việt Nam hiện hành.
-- Ngắn gọn, rõ ràng, và mang tính ứng dụng thực tế.
-- Tập trung vào tên bệnh, triệu chứng, cách điều trị, hoặc bệnh liên quan.
-- Được trình bày dưới dạng danh sách JSON, mỗi câu hỏi là một đối tượng với key `question`.
-
-**Câu hỏi gốc:**  
-{question}
-
-**Hướng dẫn thêm:**
-- Nếu câu hỏi gốc đề cập đến một cây trồng cụ thể (ví dụ: cà chua, lúa), sinh ra các câu hỏi liên quan đến cây đó.
-- Nếu câu hỏi không rõ cây trồng, sinh ra các câu hỏi liên quan đến bệnh phổ biến trong nông nghiệp Việt Nam.
-- Không sử dụng từ "giả sử" hoặc "ví dụ".
-- Không lặp lại câu hỏi gốc.
-- Đảm bảo các câu hỏi không trùng lặp nội dung.
-
-**Định dạng đầu ra (JSON):**  
-[
-  {{"question": "Câu hỏi 1"}},
-  {{"question": "Câu hỏi 2"}},
-  {{"question": "Câu hỏi 3"}},
-  {{"question": "Câu hỏi 4"}},
-  {{"question": "Câu hỏi 5"}}
-]
-"""
-    try:
-        related_questions = gemini_service.generate_content(related_questions_prompt)
-        related_questions = preprocess_related_questions(related_questions)
-    except (json.JSONDecodeError, ValueError, Exception):
-        related_questions = [
-            {"question": "Cách nhận biết sớm các bệnh phổ biến trên cây cà chua?"},
-            {"question": "Những loại thuốc nào an toàn để trị bệnh trên cây lúa?"},
-            {"question": "Bệnh nhện đỏ trên cây trồng có thể phòng ngừa như thế nào?"},
-            {"question": "Các bệnh nào thường xuất hiện cùng với bệnh nấm trên cây?"},
-            {"question": "Chế độ tưới nước ảnh hưởng thế nào đến bệnh cây trồng?"}
-        ]
-
-    memory.save_context({"question": question}, {"answer": answer})
+    main_prompt = build_query_related_prompt(question, top_pdf_docs, chat_history_str, user_info)
+    record_stage("prompt_build", time.perf_counter() - prompt_start)
+    answer, answer_source = generate_answer(question, main_prompt, results)
+
+    related_questions = generate_related_questions(question)
+
+    remember(question, answer, answer_source)
+    request_recorder.record("/api/query_related", question, "hybrid", 5, "banan", [r.id for r in results])
 
     return jsonify({
         "final_response": answer,
+        "answer_source": answer_source,
         "top_banan_documents": top_pdf_docs,
+        "retrieved_ids": [r.id for r in results],
         "chat_history": chat_history_str,
         "related_questions": related_questions,
         "user_info": user_info
@@ -0,0 +1,207 @@
+"""Async (ASGI) variants of the LLM-backed endpoints /api/query and /api/query_related.
+
+Mounted in front of the Flask app by ``app.asgi``: while a request waits on
+Gemini the event loop keeps serving others instead of pinning a worker thread.
+Retrieval and the extractive fallback are CPU work and run on a bounded thread pool.
+"""
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from itsdangerous import BadSignature
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from .api import (
+    DEFAULT_QUESTIONS, admission_controller, extractive_answer_service, format_chat_history, gemini_service, memory,
+    preprocess_related_questions, query_service, related_question_service, remember, request_recorder, top_documents
+)
+from ..config.settings import Config
+from ..core.admission import AdmissionRejected, PRIORITY_ANONYMOUS, PRIORITY_AUTHENTICATED
+from ..core.metrics import REQUEST_SECONDS, record_stage, start_request_timings
+from ..core.prompts import build_query_prompt, build_query_related_prompt, build_related_questions_prompt
+from ..handlers.gemini_handler import KeyPoolExhausted
+
+retrieval_executor = ThreadPoolExecutor(max_workers=Config.RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound work on the retrieval pool, keeping the request's timings and deadline context."""
+    context = copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(retrieval_executor, lambda: context.run(func, *args, **kwargs))
+
+
+def session_user(request: Request) -> Optional[Dict]:
+    """Logged-in user from the Flask session cookie (same secret key and serializer as Flask)."""
+    flask_app = request.app.state.flask_app
+    cookie = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if not cookie:
+        return None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return data.get("user")
+
+
+def timed(endpoint: str):
+    """Server-Timing header and request histogram, labelled like the Flask endpoints."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request: Request) -> JSONResponse:
+            timings = start_request_timings()
+            response = await view(request)
+            response.headers["Server-Timing"] = timings.server_timing()
+            REQUEST_SECONDS.labels(
+                endpoint=endpoint,
+                method=request.method,
+                status=str(response.status_code)
+            ).observe(time.perf_counter() - timings.start)
+            return response
+        return wrapper
+    return decorator
+
+
+def overloaded(retry_after: float) -> JSONResponse:
+    retry_after = max(1, math.ceil(retry_after))
+    return JSONResponse(
+        {"error": "Hệ thống đang quá tải, vui lòng thử lại sau ít phút.", "retry_after": retry_after},
+        status_code=503,
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+async def admission_controlled(request: Request, view: Callable, user: Optional[Dict]) -> JSONResponse:
+    """Async counterpart of api.admission_controlled: waiting for a slot suspends the task, not a thread."""
+    priority = PRIORITY_AUTHENTICATED if user else PRIORITY_ANONYMOUS
+    try:
+        async with admission_controller.admit_async(priority, saturation_wait=await gemini_service.saturation_wait_async()):
+            return await view(request, user, llm_unavailable=False)
+    except (AdmissionRejected, KeyPoolExhausted) as e:
+        if getattr(e, "reason", None) != "keys_cooling_down" or not Config.ANSWER_FALLBACK:
+            return overloaded(e.retry_after)
+    # Hết quota key nhưng CPU còn rảnh: trả lời trích xuất thay vì 503,
+    # vẫn giữ một slot để fallback không vượt giới hạn đồng thời
+    try:
+        async with admission_controller.admit_async(priority, saturation_wait=0):
+            return await view(request, user, llm_unavailable=True)
+    except AdmissionRejected as e:
+        return overloaded(e.retry_after)
+
+
+async def generate_answer(question: str, main_prompt: str, results: List, llm_unavailable: bool) -> Tuple[str, str]:
+    """Same contract as api.generate_answer: ``(answer, source)``."""
+    if llm_unavailable:
+        return await run_blocking(extractive_answer_service.answer, question, results), "extractive"
+
+    if Config.ANSWER_SPECULATIVE_TIMEOUT > 0 and Config.ANSWER_FALLBACK:
+        llm_call = asyncio.ensure_future(gemini_service.try_generate_content_async(main_prompt))
+        draft = await run_blocking(extractive_answer_service.draft, question, results)
+        reason = "unavailable"
+        try:
+            # Hết thời gian thì hủy lời gọi LLM, không giữ tài nguyên nào
+            answer = await asyncio.wait_for(llm_call, Config.ANSWER_SPECULATIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            answer, reason = None, "timeout"
+        except KeyPoolExhausted:
+            answer, reason = None, "overloaded"
+        return (answer, "llm") if answer else (extractive_answer_service.with_note(draft, reason), "extractive")
+
+    reason = "unavailable"
+    try:
+        answer = await gemini_service.try_generate_content_async(main_prompt)
+    except KeyPoolExhausted:
+        answer, reason = None, "overloaded"
+    if answer:
+        return answer, "llm"
+    if Config.ANSWER_FALLBACK:
+        return await run_blocking(extractive_answer_service.answer, question, results, reason), "extractive"
+    return "No response from model", "llm"
+
+
+async def generate_related_questions(question: str, llm_unavailable: bool) -> List[Dict[str, str]]:
+    if Config.RELATED_QUESTIONS_SOURCE == "bank" and related_question_service.is_available():
+        return await run_blocking(related_question_service.suggest, question)
+    if llm_unavailable:
+        return DEFAULT_QUESTIONS
+
+    try:
+        related_questions = await gemini_service.generate_content_async(
+            build_related_questions_prompt(question), profile="related_questions"
+        )
+        return preprocess_related_questions(related_questions)
+    except Exception:
+        return DEFAULT_QUESTIONS
+
+
+async def answer_question(request: Request, user: Optional[Dict], llm_unavailable: bool, endpoint: str) -> JSONResponse:
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    question = (data.get("question", "") if isinstance(data, dict) else "").strip()
+    if not question:
+        return JSONResponse({"error": "Invalid question!"}, status_code=400)
+
+    results = await run_blocking(query_service.query, question, k=5, doc_type="banan", strategy="hybrid")
+    top_pdf_docs = top_documents(results)
+
+    prompt_start = time.perf_counter()
+    chat_history_str = format_chat_history(memory)
+    if endpoint == "/api/query_related":
+        main_prompt = build_query_related_prompt(question, top_pdf_docs, chat_history_str, user)
+    else:
+        main_prompt = build_query_prompt(question, top_pdf_docs, chat_history_str)
+    record_stage("prompt_build", time.perf_counter() - prompt_start)
+
+    # Câu trả lời chính và câu hỏi liên quan độc lập với nhau: chạy đồng thời
+    (answer, answer_source), related_questions = await asyncio.gather(
+        generate_answer(question, main_prompt, results, llm_unavailable),
+        generate_related_questions(question, llm_unavailable)
+    )
+
+    remember(question, answer, answer_source)
+    request_recorder.record(endpoint, question, "hybrid", 5, "banan", [r.id for r in results])
+
+    payload = {
+        "final_response": answer,
+        "answer_source": answer_source,
+        "top_banan_documents": top_pdf_docs,
+        "retrieved_ids": [r.id for r in results],
+        "chat_history": chat_history_str,
+        "related_questions": related_questions
+    }
+    if endpoint == "/api/query_related":
+        payload["user_info"] = user
+    return JSONResponse(payload)
+
+
+@timed("api.query")
+async def query(request: Request) -> JSONResponse:
+    async def view(request, user, llm_unavailable):
+        return await answer_question(request, user, llm_unavailable, "/api/query")
+    return await admission_controlled(request, view, session_user(request))
+
+
+@timed("api.query_related")
+async def query_related(request: Request) -> JSONResponse:
+    user = session_user(request)
+    if not user:
+        return JSONResponse({"error": "Please log in first!"}, status_code=401)
+
+    async def view(request, user, llm_unavailable):
+        return await answer_question(request, user, llm_unavailable, "/api/query_related")
+    return await admission_controlled(request, view, user)
+
+
+routes = [
+    Route("/api/query", query, methods=["POST"]),
+    Route("/api/query_related", query_related, methods=["POST"]),
+]
@@ -0,0 +1,55 @@
+import logging
+import mimetypes
+import os
+from typing import Dict
+from flask import Blueprint, abort, render_template, request, send_from_directory
+from ..config.settings import Config
+from ..core.assets import DIST_DIR, DIST_TEMPLATE_DIR, read_manifest, stale_templates
+
+logger = logging.getLogger(__name__)
+
+assets_bp = Blueprint('assets', __name__)
+
+# Tên file chứa hash nội dung nên không bao giờ đổi: cache vĩnh viễn
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Bản nén sẵn theo thứ tự ưu tiên
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+_built_templates: Dict[str, str] = {}
+
+
+def load_built_templates() -> None:
+    """Use ``templates/dist/<name>`` for every template whose build is current; stale ones render from source."""
+    _built_templates.clear()
+    if not Config.ASSETS_ENABLED:
+        return
+    manifest = read_manifest()
+    stale = set(stale_templates())
+    for name in manifest:
+        if name in stale:
+            logger.warning(f"Built template {name} is stale, rendering the source; run python -m app.cli.build_assets")
+        elif os.path.exists(os.path.join(DIST_TEMPLATE_DIR, name)):
+            _built_templates[name] = f"dist/{name}"
+    if _built_templates:
+        logger.info(f"Serving {len(_built_templates)} built templates with fingerprinted assets")
+
+
+def render_page(name: str, **context) -> str:
+    return render_template(_built_templates.get(name, name), **context)
+
+
+@assets_bp.route("/assets/<path:filename>")
+def asset(filename):
+    if filename.endswith((".gz", ".br")) or filename == "manifest.json":
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in request.accept_encodings and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
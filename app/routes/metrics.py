@@ -0,0 +1,31 @@
+import time
+from flask import Blueprint, Response, g, jsonify, request
+from ..core.metrics import REQUEST_SECONDS, render_metrics, scrape_authorized, start_request_timings
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route("/metrics")
+def metrics():
+    if not scrape_authorized(request.headers):
+        return jsonify({"error": "Forbidden"}), 403
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+def init_request_timing(app):
+    """Collect per-stage timings for every request and expose them as Server-Timing."""
+    @app.before_request
+    def _start_timings():
+        g.request_timings = start_request_timings()
+
+    @app.after_request
+    def _finish_timings(response):
+        timings = getattr(g, "request_timings", None)
+        if timings is None or request.endpoint in ("static", "assets.asset", "metrics.metrics"):
+            return response
+        response.headers["Server-Timing"] = timings.server_timing()
+        REQUEST_SECONDS.labels(
+            endpoint=request.endpoint or "unknown",
+            method=request.method,
+            status=str(response.status_code)
+        ).observe(time.perf_counter() - timings.start)
+        return response
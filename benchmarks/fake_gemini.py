@@ -0,0 +1,268 @@
+"""Máy chủ giả lập endpoint generateContent của Gemini (REST) cho load test.
+
+Không tốn quota thật; độ trễ, tỉ lệ 429, finish reason bản quyền và streaming
+đều cấu hình được.
+
+Ví dụ:
+    python -m benchmarks.fake_gemini --port 8089 --latency lognormal:1.5,0.5 --rate-429 0.05
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089 gunicorn -w 4 "app:create_app()"
+
+GET /stats trả về thống kê theo key/model; POST /reset xóa thống kê.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+_PATH_PATTERN = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$")
+
+DEFAULT_ANSWER = (
+    "- **Tên bệnh**: Bệnh đạo ôn lúa\n"
+    "- **Triệu chứng**: Vết bệnh hình thoi trên lá, tâm xám, viền nâu.\n"
+    "- **Cách điều trị**: Phun Tricyclazole khi bệnh chớm xuất hiện, giảm bón đạm.\n"
+    "- **Bệnh liên quan**: Khô vằn, bạc lá.\n"
+    "- **Lưu ý quan trọng**: Phun vào sáng sớm hoặc chiều mát, mang bảo hộ."
+)
+RELATED_ANSWER = json.dumps([{"question": f"Cách phòng bệnh đạo ôn trên lúa số {i}?"} for i in range(1, 6)], ensure_ascii=False)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """``fixed:0.5`` | ``uniform:0.2,2`` | ``lognormal:<median>,<sigma>`` | ``exp:<mean>`` (seconds)."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        import math
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeGeminiState:
+    def __init__(
+        self,
+        latency: Callable[[], float],
+        rate_429: float = 0.0,
+        copyright_rate: float = 0.0,
+        per_key_rpm: int = 0,
+        stream_chunks: int = 4
+    ):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.copyright_rate = copyright_rate
+        self.per_key_rpm = per_key_rpm
+        self.stream_chunks = stream_chunks
+        self._lock = threading.Lock()
+        self._windows: Dict[str, deque] = defaultdict(deque)
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            self._windows.clear()
+
+    def record(self, key: str, model: str, outcome: str) -> None:
+        with self._lock:
+            self.counters[f"key:{key[-6:]}"][outcome] += 1
+            self.counters[f"model:{model}"][outcome] += 1
+            self.counters["total"][outcome] += 1
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def over_quota(self, key: str) -> bool:
+        if not self.per_key_rpm:
+            return False
+        now = time.time()
+        with self._lock:
+            window = self._windows[key]
+            while window and now - window[0] > 60:
+                window.popleft()
+            if len(window) >= self.per_key_rpm:
+                return True
+            window.append(now)
+            return False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "counters": {name: dict(values) for name, values in self.counters.items()},
+            }
+
+
+def _prompt_text(body: Dict) -> str:
+    parts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+
+def _response_payload(text: str, finish_reason: str, prompt_tokens: int) -> Dict:
+    candidate = {"finishReason": finish_reason, "index": 0}
+    if text:
+        candidate["content"] = {"parts": [{"text": text}], "role": "model"}
+    completion_tokens = len(text.split())
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": completion_tokens,
+            "totalTokenCount": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def make_handler(state: FakeGeminiState):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+            pass
+
+        def _send_json(self, status: int, payload: Dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urlparse(self.path).path == "/stats":
+                return self._send_json(200, state.snapshot())
+            return self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+        def do_POST(self):
+            parsed = urlparse(self.path)
+            if parsed.path == "/reset":
+                state.reset()
+                return self._send_json(200, {"ok": True})
+
+            match = _PATH_PATTERN.match(parsed.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            if not match:
+                return self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {parsed.path}"}})
+
+            query = parse_qs(parsed.query)
+            key = self.headers.get("x-goog-api-key") or (query.get("key") or [""])[0]
+            model = match.group("model")
+            state.enter()
+            try:
+                time.sleep(max(0.0, state.latency()))
+                if state.over_quota(key) or random.random() < state.rate_429:
+                    state.record(key, model, "429")
+                    return self._send_json(429, {"error": {
+                        "code": 429,
+                        "message": "Resource has been exhausted (e.g. check quota).",
+                        "status": "RESOURCE_EXHAUSTED",
+                    }})
+
+                body = json.loads(raw or b"{}")
+                prompt = _prompt_text(body)
+                prompt_tokens = len(prompt.split())
+                if random.random() < state.copyright_rate:
+                    state.record(key, model, "recitation")
+                    return self._send_json(200, _response_payload("", "RECITATION", prompt_tokens))
+
+                text = RELATED_ANSWER if '"question"' in prompt else DEFAULT_ANSWER
+                state.record(key, model, "ok")
+                if match.group("method") == "streamGenerateContent":
+                    return self._stream(text, prompt_tokens, (query.get("alt") or [""])[0] == "sse")
+                return self._send_json(200, _response_payload(text, "STOP", prompt_tokens))
+            finally:
+                state.leave()
+
+        def _stream(self, text: str, prompt_tokens: int, sse: bool) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            size = max(1, len(text) // state.stream_chunks)
+            pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+            def write_chunk(data: bytes) -> None:
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            # alt=sse: server-sent events; mặc định: một mảng JSON được stream dần
+            if not sse:
+                write_chunk(b"[")
+            for i, piece in enumerate(pieces):
+                finish = "STOP" if i == len(pieces) - 1 else None
+                payload = _response_payload(piece, finish, prompt_tokens)
+                if finish is None:
+                    payload["candidates"][0].pop("finishReason")
+                data = json.dumps(payload, ensure_ascii=False)
+                if sse:
+                    write_chunk(f"data: {data}\r\n\r\n".encode("utf-8"))
+                else:
+                    write_chunk(((",\n" if i else "") + data).encode("utf-8"))
+                time.sleep(min(0.05, state.latency() / 10))
+            if not sse:
+                write_chunk(b"]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return FakeGeminiHandler
+
+
+def serve(host: str, port: int, state: FakeGeminiState) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini generateContent API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="lognormal:1.5,0.5", help="fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of a random 429")
+    parser.add_argument("--copyright-rate", type=float, default=0.0, help="Probability of finishReason=RECITATION")
+    parser.add_argument("--per-key-rpm", type=int, default=0, help="Simulated per-key quota (0 = unlimited)")
+    parser.add_argument("--stream-chunks", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    state = FakeGeminiState(
+        latency=parse_latency(args.latency),
+        rate_429=args.rate_429,
+        copyright_rate=args.copyright_rate,
+        per_key_rpm=args.per_key_rpm,
+        stream_chunks=args.stream_chunks
+    )
+    server = serve(args.host, args.port, state)
+    print(f"Fake Gemini listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
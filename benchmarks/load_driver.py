@@ -0,0 +1,204 @@
+"""Load test end-to-end cho /api/query với máy chủ Gemini giả lập.
+
+Khởi động (tùy chọn) fake Gemini trong tiến trình và ứng dụng Flask dưới gunicorn,
+sau đó bắn request đồng thời và báo cáo throughput, phân vị độ trễ và lỗi.
+
+Ví dụ:
+    python -m benchmarks.load_driver --start-app --workers 4 --threads 8 \\
+        --concurrency 32 --duration 60 --fake-latency lognormal:1.5,0.5 --fake-rate-429 0.05
+    python -m benchmarks.load_driver --target http://127.0.0.1:5000 --concurrency 8 --requests 200
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from benchmarks.fake_gemini import FakeGeminiState, parse_latency, serve
+
+DEFAULT_QUESTIONS = [
+    "Bệnh đạo ôn trên lúa điều trị thế nào?",
+    "Lá cà chua bị vàng và héo là bệnh gì?",
+    "Cách phòng trừ nhện đỏ trên cây có múi?",
+    "Bệnh gỉ sắt trên cây ngô có triệu chứng gì?",
+    "Thối rễ do Pythium xử lý bằng thuốc gì?",
+]
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ms = np.array(values) * 1000
+    stats = {f"p{p}_ms": round(float(np.percentile(ms, p)), 1) for p in (50, 90, 95, 99)}
+    stats["mean_ms"] = round(float(ms.mean()), 1)
+    stats["max_ms"] = round(float(ms.max()), 1)
+    return stats
+
+
+def wait_until_ready(base_url: str, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=2):
+                return
+        except urllib.error.HTTPError as e:
+            if e.code < 500:
+                return
+            time.sleep(1)
+        except Exception:
+            time.sleep(1)
+    raise RuntimeError(f"App at {base_url} did not become ready within {timeout}s")
+
+
+def start_gunicorn(bind: str, workers: int, threads: int, env: Dict[str, str]) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+        "-b", bind, "--timeout", "120", "app:create_app()",
+    ]
+    # WEB_CONCURRENCY: app chia ngân sách thread theo đúng số worker của lệnh này
+    return subprocess.Popen(cmd, env={**os.environ, "WEB_CONCURRENCY": str(workers), **env})
+
+
+class LoadDriver:
+    def __init__(self, base_url: str, endpoint: str, questions: List[str], timeout: float = 120.0):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.endpoint = endpoint
+        self.questions = questions
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.results: List[Tuple[float, str]] = []
+
+    def _worker(self, deadline: float, remaining: List[int], worker_id: int) -> None:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        i = worker_id
+        while time.time() < deadline:
+            with self._lock:
+                if remaining[0] == 0:
+                    break
+                remaining[0] -= 1
+            body = json.dumps({"question": self.questions[i % len(self.questions)]})
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request("POST", self.endpoint, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                payload = response.read()
+                outcome = str(response.status)
+                if response.status == 200 and b"No response from model" in payload:
+                    outcome = "200_no_model_response"
+            except Exception as e:
+                outcome = type(e).__name__
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            with self._lock:
+                self.results.append((time.perf_counter() - start, outcome))
+        conn.close()
+
+    def run(self, concurrency: int, duration: float, requests: int) -> Dict:
+        deadline = time.time() + (duration if duration > 0 else 10 ** 9)
+        remaining = [requests if requests > 0 else -1]
+        threads = [
+            threading.Thread(target=self._worker, args=(deadline, remaining, n), daemon=True)
+            for n in range(concurrency)
+        ]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+
+        outcomes = Counter(outcome for _, outcome in self.results)
+        ok_latencies = [lat for lat, outcome in self.results if outcome == "200"]
+        return {
+            "concurrency": concurrency,
+            "elapsed_s": round(elapsed, 2),
+            "requests": len(self.results),
+            "throughput_rps": round(len(self.results) / elapsed, 2) if elapsed else 0.0,
+            "ok_throughput_rps": round(len(ok_latencies) / elapsed, 2) if elapsed else 0.0,
+            "latency_ok": _percentiles(ok_latencies),
+            "latency_all": _percentiles([lat for lat, _ in self.results]),
+            "outcomes": dict(outcomes),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load test against a fake Gemini backend")
+    parser.add_argument("--target", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", default="/api/query")
+    parser.add_argument("--start-app", action="store_true", help="Run the app under gunicorn at --target")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds (0 = until --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests (0 = until --duration)")
+    parser.add_argument("--questions", help="File with one question per line")
+    parser.add_argument("--no-fake", action="store_true", help="Do not start the fake Gemini server")
+    parser.add_argument("--fake-port", type=int, default=8089)
+    parser.add_argument("--fake-latency", default="lognormal:1.5,0.5")
+    parser.add_argument("--fake-rate-429", type=float, default=0.0)
+    parser.add_argument("--fake-copyright-rate", type=float, default=0.0)
+    parser.add_argument("--fake-per-key-rpm", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    fake_state, fake_server = None, None
+    if not args.no_fake:
+        fake_state = FakeGeminiState(
+            latency=parse_latency(args.fake_latency),
+            rate_429=args.fake_rate_429,
+            copyright_rate=args.fake_copyright_rate,
+            per_key_rpm=args.fake_per_key_rpm
+        )
+        fake_server = serve("127.0.0.1", args.fake_port, fake_state)
+        threading.Thread(target=fake_server.serve_forever, daemon=True).start()
+
+    app_proc = None
+    try:
+        if args.start_app:
+            env = {"GEMINI_API_ENDPOINT": f"http://127.0.0.1:{args.fake_port}", "GEMINI_TRANSPORT": "rest"}
+            bind = urlparse(args.target).netloc
+            app_proc = start_gunicorn(bind, args.workers, args.threads, env)
+        wait_until_ready(args.target, args.ready_timeout)
+        if fake_state is not None:
+            fake_state.reset()
+
+        report = LoadDriver(args.target, args.endpoint, questions).run(args.concurrency, args.duration, args.requests)
+        report["config"] = {k: v for k, v in vars(args).items() if k not in ("output",)}
+        if fake_state is not None:
+            report["upstream"] = fake_state.snapshot()
+    finally:
+        if app_proc is not None:
+            app_proc.terminate()
+            app_proc.wait(timeout=30)
+        if fake_server is not None:
+            fake_server.shutdown()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Phát lại các request đã ghi (RequestRecorder, JSONL) vào một instance đang chạy.
+
+Giữ nguyên khoảng cách thời gian giữa các request gốc, chia cho --speed
+(2.0 = nhanh gấp đôi), hoặc bắn theo tốc độ cố định với --rate.
+
+Ví dụ:
+    python -m benchmarks.replay logs/requests.jsonl.* --target http://127.0.0.1:5000 --speed 4
+    python -m benchmarks.replay logs/requests.jsonl.* --rate 20 --limit 500 --output replay.json
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from benchmarks.load_driver import _percentiles
+
+
+def read_records(paths: List[str], endpoints: Optional[List[str]] = None) -> Iterator[Dict]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if endpoints and record.get("endpoint") not in endpoints:
+                    continue
+                yield record
+
+
+class Replayer:
+    def __init__(self, target: str, cookie: Optional[str] = None, timeout: float = 120.0):
+        parsed = urlparse(target)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.cookie = cookie
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.samples: List[Dict] = []
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def send(self, record: Dict) -> None:
+        headers = {"Content-Type": "application/json"}
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        body = json.dumps({"question": record["question"]})
+        start = time.perf_counter()
+        sample = {"recorded_ms": record.get("total_ms"), "overlap": None}
+        try:
+            conn = self._connection()
+            conn.request("POST", record.get("endpoint", "/api/query"), body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            sample["outcome"] = str(response.status)
+            if response.status == 200 and record.get("retrieved_ids"):
+                # So cùng một tập: mọi kết quả hybrid (top_banan_documents bỏ các hit chỉ có BM25)
+                replayed = json.loads(payload).get("retrieved_ids")
+                if replayed is not None:
+                    recorded = set(record["retrieved_ids"])
+                    sample["overlap"] = len(set(replayed) & recorded) / len(recorded)
+        except Exception as e:
+            sample["outcome"] = type(e).__name__
+            self._local.conn = None
+        sample["latency"] = time.perf_counter() - start
+        with self._lock:
+            self.samples.append(sample)
+
+    def report(self, elapsed: float) -> Dict:
+        ok = [s["latency"] for s in self.samples if s["outcome"] == "200"]
+        recorded = [s["recorded_ms"] / 1000 for s in self.samples if s.get("recorded_ms")]
+        overlaps = [s["overlap"] for s in self.samples if s["overlap"] is not None]
+        return {
+            "requests": len(self.samples),
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(len(self.samples) / elapsed, 2) if elapsed else 0.0,
+            "latency_ok": _percentiles(ok),
+            "latency_recorded": _percentiles(recorded),
+            "retrieval_overlap_mean": round(sum(overlaps) / len(overlaps), 3) if overlaps else None,
+            "outcomes": dict(Counter(s["outcome"] for s in self.samples)),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded production requests")
+    parser.add_argument("paths", nargs="+", help="Recorded JSONL files (one per worker and rotation; merged by timestamp)")
+    parser.add_argument("--target", default="http://127.0.0.1:5000")
+    parser.add_argument("--speed", type=float, default=1.0, help="Scale recorded inter-arrival gaps by 1/speed")
+    parser.add_argument("--rate", type=float, default=0.0, help="Fixed requests/second instead of recorded timing")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max in-flight requests")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--endpoint", action="append", help="Only replay these endpoints (repeatable)")
+    parser.add_argument("--cookie", help="Cookie header, e.g. a session for /api/query_related")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    records = list(read_records(args.paths, args.endpoint))
+    records.sort(key=lambda r: r.get("ts", 0))
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("No records to replay")
+        return 1
+
+    replayer = Replayer(args.target, args.cookie)
+    first_ts = records[0].get("ts", 0)
+    start = time.perf_counter()
+    # Open-loop: lịch gửi không phụ thuộc vào độ trễ phản hồi
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for i, record in enumerate(records):
+            offset = i / args.rate if args.rate > 0 else (record.get("ts", first_ts) - first_ts) / args.speed
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(replayer.send, record)
+    report = replayer.report(time.perf_counter() - start)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""Microbenchmark cho FaissHandler, BM25Handler, HybridHandler và thời gian khởi động index.
+
+Mỗi quy mô corpus chạy trong một tiến trình riêng để đo peak RSS độc lập.
+
+Ví dụ:
+    python -m benchmarks.retrieval_benchmark --scales 10000,100000 --queries 200 --threads 8
+    python -m benchmarks.retrieval_benchmark --scales 1000000 --queries 50 --output bench_1m.json
+    python -m benchmarks.retrieval_benchmark --check benchmarks/thresholds.json --baseline old.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import queue
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import faiss
+import numpy as np
+
+from app.core.repositories.bm25_index import IncrementalBM25
+from app.handlers.bm25_handler import BM25Handler
+from app.handlers.faiss_handler import FaissHandler
+from app.handlers.hybrid_handler import HybridHandler
+from benchmarks.synthetic import (
+    RandomEncoder, SyntheticRepository, build_bm25, make_embeddings, make_queries, make_texts
+)
+
+STRATEGIES = {
+    "faiss": FaissHandler,
+    "bm25": BM25Handler,
+    "hybrid": HybridHandler,
+}
+
+
+def _timed(fn: Callable) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    ms = np.array(latencies) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss: KB trên Linux, byte trên macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _startup_costs(texts: List[str], vectors: np.ndarray, bm25: IncrementalBM25, faiss_index) -> Dict[str, float]:
+    """Time the artifact loads IndexRepository performs at boot."""
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = os.path.join(tmp, "index.faiss")
+        metadata_path = os.path.join(tmp, "metadata.pkl")
+        bm25_path = os.path.join(tmp, "bm25.pkl")
+        faiss.write_index(faiss_index, index_path)
+        with open(metadata_path, "wb") as f:
+            pickle.dump({"ids": list(range(len(texts))), "metadata": [{}] * len(texts), "texts": texts}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(bm25_path, "wb") as f:
+            pickle.dump(bm25, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        def load_pickle(path):
+            with open(path, "rb") as f:
+                return pickle.load(f)
+
+        return {
+            "faiss_load_s": round(_timed(lambda: faiss.read_index(index_path)), 4),
+            "metadata_load_s": round(_timed(lambda: load_pickle(metadata_path)), 4),
+            "bm25_bundle_load_s": round(_timed(lambda: load_pickle(bm25_path)), 4),
+            "faiss_index_mb": round(os.path.getsize(index_path) / 2 ** 20, 1),
+            "bm25_bundle_mb": round(os.path.getsize(bm25_path) / 2 ** 20, 1),
+        }
+
+
+def run_scale(n_docs: int, n_queries: int, k: int, threads: int, dim: int) -> Dict:
+    result: Dict = {"n_docs": n_docs, "n_queries": n_queries, "k": k, "threads": threads}
+
+    start = time.perf_counter()
+    texts = make_texts(n_docs)
+    vectors = make_embeddings(n_docs, dim)
+    queries = make_queries(texts, n_queries)
+    result["generate_s"] = round(time.perf_counter() - start, 3)
+
+    faiss_index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    build = {"faiss_build_s": _timed(lambda: faiss_index.add_with_ids(vectors, np.arange(n_docs, dtype=np.int64)))}
+    bm25_holder = {}
+    build["bm25_build_s"] = _timed(lambda: bm25_holder.setdefault("bm25", build_bm25(texts)))
+    result["build"] = {key: round(value, 3) for key, value in build.items()}
+
+    bm25 = bm25_holder["bm25"]
+    result["startup"] = _startup_costs(texts, vectors, bm25, faiss_index)
+
+    repo = SyntheticRepository(texts, faiss_index, bm25, RandomEncoder(dim))
+    result["strategies"] = {}
+    for name, handler_cls in STRATEGIES.items():
+        handler = handler_cls(repo)
+        handler.query(queries[0], k, "banan")  # warm-up
+
+        latencies = []
+        for query in queries:
+            latencies.append(_timed(lambda: handler.query(query, k, "banan")))
+        stats = _percentiles(latencies)
+        stats["qps_1_thread"] = round(len(queries) / sum(latencies), 2)
+
+        if threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                elapsed = _timed(lambda: list(pool.map(lambda q: handler.query(q, k, "banan"), queries)))
+            stats[f"qps_{threads}_threads"] = round(len(queries) / elapsed, 2)
+        result["strategies"][name] = stats
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _run_scale_in_child(result_queue, *args) -> None:
+    try:
+        result_queue.put(run_scale(*args))
+    except Exception as e:
+        result_queue.put({"n_docs": args[0], "error": repr(e)})
+
+
+def _wait_for_result(proc, result_queue, n_docs: int) -> Dict:
+    """Collect a child's result; a child killed by OOM or a crash yields an error entry."""
+    while True:
+        try:
+            result = result_queue.get(timeout=1.0)
+            proc.join()
+            return result
+        except queue.Empty:
+            if not proc.is_alive():
+                return {"n_docs": n_docs, "error": f"benchmark process exited with code {proc.exitcode}"}
+
+
+def check_thresholds(results: Dict, thresholds: Dict, baseline: Dict = None, tolerance: float = 0.2) -> List[str]:
+    """Return human-readable regressions: absolute thresholds and relative to a baseline run."""
+    failures = []
+    baseline_by_scale = {str(r["n_docs"]): r for r in (baseline or {}).get("scales", [])}
+    for scale in results["scales"]:
+        key = str(scale["n_docs"])
+        if "error" in scale:
+            failures.append(f"{key}: run failed: {scale['error']}")
+            continue
+        for strategy, limits in thresholds.get(key, {}).items():
+            stats = scale["strategies"].get(strategy, scale.get("startup", {}) if strategy == "startup" else {})
+            for metric, limit in limits.items():
+                value = stats.get(metric)
+                if value is not None and value > limit:
+                    failures.append(f"{key}/{strategy}/{metric}: {value} > {limit}")
+        previous = baseline_by_scale.get(key)
+        if previous and "strategies" in previous:
+            for strategy, stats in scale["strategies"].items():
+                old = previous["strategies"].get(strategy, {}).get("p95_ms")
+                if old and stats["p95_ms"] > old * (1 + tolerance):
+                    failures.append(f"{key}/{strategy}/p95_ms: {stats['p95_ms']} vs baseline {old} (+{tolerance:.0%})")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Retrieval microbenchmarks on synthetic corpora")
+    parser.add_argument("--scales", default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--check", help="Thresholds JSON file; exit 1 on regression")
+    parser.add_argument("--baseline", help="Previous results JSON to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "scales": [],
+    }
+    ctx = multiprocessing.get_context("spawn")
+    for n_docs in (int(s) for s in args.scales.split(",")):
+        result_queue = ctx.Queue()
+        proc = ctx.Process(target=_run_scale_in_child, args=(result_queue, n_docs, args.queries, args.k, args.threads, args.dim))
+        proc.start()
+        scale_result = _wait_for_result(proc, result_queue, n_docs)
+        results["scales"].append(scale_result)
+        summary = {name: stats["p95_ms"] for name, stats in scale_result.get("strategies", {}).items()}
+        print(f"{n_docs:>9} docs  p95_ms={summary}  rss={scale_result.get('peak_rss_mb')}MB  "
+              f"{scale_result.get('error', '')}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.check:
+        with open(args.check, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        failures = check_thresholds(results, thresholds, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
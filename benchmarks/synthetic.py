@@ -0,0 +1,123 @@
+"""Sinh corpus và embedding tổng hợp cho benchmark truy vấn."""
+import zlib
+from typing import Dict, List, Optional, Set
+import numpy as np
+
+from app.core.repositories.bm25_index import IncrementalBM25
+from app.core.text.tokenizer import get_tokenizer
+
+_ONSETS = ["b", "c", "ch", "d", "đ", "g", "h", "kh", "l", "m", "n", "ng", "nh", "ph", "qu", "r", "s", "t", "th", "tr", "v", "x"]
+_RHYMES = ["a", "á", "à", "ả", "ã", "ạ", "ai", "an", "ang", "anh", "ao", "âm", "ân", "ây", "e", "em", "ên", "ênh",
+           "i", "inh", "iêu", "o", "ói", "ong", "ô", "ôi", "ơn", "u", "ua", "uông", "ư", "ức", "ương", "y"]
+
+
+def make_vocabulary(size: int = 5000, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    syllables = [o + r for o in _ONSETS for r in _RHYMES]
+    vocab = set()
+    while len(vocab) < size:
+        n = rng.integers(1, 3)
+        vocab.add(" ".join(rng.choice(syllables, size=n)))
+    return sorted(vocab)
+
+
+def make_texts(n_docs: int, words_per_doc: int = 60, vocab_size: int = 5000, seed: int = 0) -> List[str]:
+    """Zipf-distributed word frequencies, like a real corpus."""
+    rng = np.random.default_rng(seed)
+    vocab = make_vocabulary(vocab_size, seed)
+    ranks = np.arange(1, vocab_size + 1)
+    probs = 1.0 / ranks
+    probs /= probs.sum()
+    texts: List[str] = []
+    block = 50_000
+    for start in range(0, n_docs, block):
+        rows = min(block, n_docs - start)
+        word_ids = rng.choice(vocab_size, size=(rows, words_per_doc), p=probs).astype(np.int32)
+        texts.extend(" ".join(vocab[w] for w in row) for row in word_ids)
+    return texts
+
+
+def make_queries(texts: List[str], n_queries: int, words: int = 5, seed: int = 1) -> List[str]:
+    rng = np.random.default_rng(seed)
+    queries = []
+    for idx in rng.integers(0, len(texts), size=n_queries):
+        tokens = texts[idx].split()
+        start = rng.integers(0, max(1, len(tokens) - words))
+        queries.append(" ".join(tokens[start:start + words]))
+    return queries
+
+
+def make_embeddings(n_docs: int, dim: int = 384, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n_docs, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+class RandomEncoder:
+    """Stand-in for SentenceTransformer: deterministic per-text random unit vectors."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            out[i] = rng.standard_normal(self.dim, dtype=np.float32)
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+class SyntheticRepository:
+    """In-memory object exposing the IndexRepository interface used by the handlers."""
+
+    def __init__(self, texts: List[str], faiss_index, bm25: IncrementalBM25, encoder, doc_type: str = "banan"):
+        self.metadata = {
+            "ids": [f"{doc_type}_{i}" for i in range(len(texts))],
+            "metadata": [{"source": f"synthetic_{i // 50}.pdf", "page": i % 50, "type": doc_type} for i in range(len(texts))],
+            "texts": texts,
+        }
+        self.faiss_index = faiss_index
+        self.bm25 = bm25
+        self.encoder = encoder
+        self.deleted_rows: Set[int] = set()
+        self.row_by_id = {doc_id: row for row, doc_id in enumerate(self.metadata["ids"])}
+
+    def get_embeddings(self):
+        return self.encoder
+
+    def get_faiss_index(self, doc_type: str):
+        return self.faiss_index
+
+    def get_bm25_index(self, doc_type: str):
+        return self.bm25
+
+    def get_metadata(self, doc_type: str) -> Dict:
+        return self.metadata
+
+    def get_deleted_rows(self) -> Set[int]:
+        return self.deleted_rows
+
+    def get_version(self) -> str:
+        return "synthetic"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.ascontiguousarray(self.encoder.encode(texts, convert_to_numpy=True), dtype=np.float32)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        # Không memo như IndexRepository: benchmark đo cả chi phí encode
+        return self.encode([query])
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        return self.row_by_id.get(doc_id)
+
+    def get_vectors(self, rows: List[int]) -> np.ndarray:
+        return self.faiss_index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+
+def build_bm25(texts: List[str]) -> IncrementalBM25:
+    return IncrementalBM25(get_tokenizer().tokenize_many(texts))
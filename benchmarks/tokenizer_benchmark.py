@@ -0,0 +1,64 @@
+"""So sánh tốc độ Tokenizer mới với đường NLTK word_tokenize cũ.
+
+Chạy: python -m benchmarks.tokenizer_benchmark [--metadata source/metadata_anle.pkl] [--repeat 5]
+"""
+import argparse
+import pickle
+import statistics
+import time
+from typing import Callable, List
+
+from app.core.text.tokenizer import Tokenizer
+
+
+def _time_run(fn: Callable[[str], List[str]], texts: List[str], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(name: str, timings: List[float], texts: List[str], tokens: int) -> None:
+    best = min(timings)
+    chars = sum(len(t) for t in texts)
+    print(f"{name:<28} best={best * 1000:9.2f} ms  median={statistics.median(timings) * 1000:9.2f} ms  "
+          f"{chars / best / 1e6:7.2f} MB/s  tokens={tokens}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--metadata", default="source/metadata_anle.pkl")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=0, help="Benchmark short query strings instead of documents")
+    args = parser.parse_args()
+
+    with open(args.metadata, "rb") as f:
+        texts = pickle.load(f)["texts"]
+    if args.queries:
+        texts = [" ".join(t.split()[:12]) for t in texts][: args.queries]
+    print(f"Corpus: {len(texts)} texts, {sum(len(t) for t in texts)} chars")
+
+    variants = {
+        "tokenizer (unigram)": Tokenizer(bigrams=False, fold_variants=False),
+        "tokenizer (+bigram)": Tokenizer(bigrams=True, fold_variants=False),
+        "tokenizer (+bigram+fold)": Tokenizer(bigrams=True, fold_variants=True),
+    }
+    for name, tokenizer in variants.items():
+        tokens = sum(len(tokenizer.tokenize(t)) for t in texts)
+        _report(name, _time_run(tokenizer.tokenize, texts, args.repeat), texts, tokens)
+
+    try:
+        from nltk.tokenize import word_tokenize
+    except ImportError:
+        print("nltk not installed, skipping baseline")
+        return
+    nltk_fn = lambda text: word_tokenize(text.lower())
+    tokens = sum(len(nltk_fn(t)) for t in texts)
+    _report("nltk word_tokenize", _time_run(nltk_fn, texts, args.repeat), texts, tokens)
+
+
+if __name__ == "__main__":
+    main()